@@ -0,0 +1,110 @@
+import time
+
+import numpy as np
+
+from GravNN.Analysis.ExperimentBase import ExperimentBase
+from GravNN.Support.Statistics import mean_std_median
+
+
+class PrecisionExperiment(ExperimentBase):
+    def __init__(self, model, reference_model, points, r_min, r_max, seed=0):
+        """Accuracy and speed of a reduced precision gravity model (e.g. one
+        constructed with dtype=np.float32) relative to its float64 counterpart.
+
+        Args:
+            model (GravityModelBase): reduced precision model
+            reference_model (GravityModelBase): identical model in float64
+            points (int): number of test positions
+            r_min (float): minimum radius of the test positions [m]
+            r_max (float): maximum radius of the test positions [m]
+            seed (int, optional): seed of the test positions. Defaults to 0.
+        """
+        super().__init__(model, reference_model, points, r_min, r_max, seed)
+        self.model = model
+        self.reference_model = reference_model
+        self.points = points
+        self.r_min = r_min
+        self.r_max = r_max
+        self.seed = seed
+        self.x_test = self.get_test_data()
+
+    def get_test_data(self):
+        rng = np.random.default_rng(self.seed)
+        random_unit = rng.normal(size=(self.points, 3))
+        random_unit /= np.linalg.norm(random_unit, axis=1, keepdims=True)
+        random_radius = rng.uniform(self.r_min, self.r_max, size=(self.points, 1))
+        return random_unit * random_radius
+
+    def timed_values(self, model, x):
+        # warm start (compiles the kernels of the model's dtype)
+        _ = model.compute_all(x[0:1, :])
+
+        start_time = time.time()
+        accelerations, potentials = model.compute_all(x)
+        dt = time.time() - start_time
+        return accelerations, potentials, dt
+
+    def compare(self):
+        a_true, u_true, dt_true = self.timed_values(self.reference_model, self.x_test)
+        a, u, dt = self.timed_values(self.model, self.x_test)
+
+        a_error = (
+            np.linalg.norm(a.astype(np.float64) - a_true, axis=1)
+            / np.linalg.norm(a_true, axis=1)
+            * 100
+        )
+        u_error = np.abs(u.astype(np.float64) - u_true) / np.abs(u_true) * 100
+
+        metrics = {
+            "dtype": self.model.dtype.name,
+            "time": dt,
+            "reference_time": dt_true,
+            "speedup": dt_true / dt,
+        }
+        for name, error in [("a", a_error), ("u", u_error)]:
+            metrics.update(mean_std_median(error, prefix=f"{name}_percent_error"))
+            metrics.update(
+                {
+                    f"{name}_percent_error_99": [np.percentile(error, 99)],
+                    f"{name}_percent_error_max": [np.max(error)],
+                },
+            )
+        return metrics
+
+    def generate_data(self):
+        data = self.compare()
+        return data
+
+
+def main():
+    from GravNN.CelestialBodies.Asteroids import Eros
+    from GravNN.CelestialBodies.Planets import Earth
+    from GravNN.GravityModels.Polyhedral import Polyhedral
+    from GravNN.GravityModels.SphericalHarmonics import SphericalHarmonics
+
+    planet = Earth()
+    for degree in [100, 1000]:
+        experiment = PrecisionExperiment(
+            SphericalHarmonics(planet.sh_file, degree, dtype=np.float32),
+            SphericalHarmonics(planet.sh_file, degree),
+            10000,
+            planet.radius,
+            planet.radius * 2,
+        )
+        data = experiment.run()
+        print(data)
+
+    asteroid = Eros()
+    experiment = PrecisionExperiment(
+        Polyhedral(asteroid, asteroid.obj_8k, dtype=np.float32),
+        Polyhedral(asteroid, asteroid.obj_8k),
+        10000,
+        asteroid.radius,
+        asteroid.radius * 3,
+    )
+    data = experiment.run()
+    print(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -80,9 +80,21 @@ class TimeEvaluationExperiment(ExperimentBase):
         metrics = {
             "a_batch_time": self.dt_a_batch,
             "a_single_time": self.dt_a_single,
+            "a_single_latency": self.dt_a_single / len(self.x_test),
             # "u_batch_time": self.dt_u_batch,
             # "u_single_time": self.dt_u_single,
         }
+
+        # pre-traced single position path of the PINN
+        if hasattr(self.model, "compute_acceleration_single"):
+            a_fcn = self.model.compute_acceleration_single
+            self.dt_a_traced = self.single_test(a_fcn, self.x_test)
+            metrics.update(
+                {
+                    "a_single_traced_time": self.dt_a_traced,
+                    "a_single_traced_latency": self.dt_a_traced / len(self.x_test),
+                },
+            )
         return metrics
 
     def generate_data(self):
@@ -10,6 +10,7 @@ from GravNN.CelestialBodies.Asteroids import Eros
 from GravNN.GravityModels.HeterogeneousPoly import generate_heterogeneous_model
 from GravNN.GravityModels.Polyhedral import Polyhedral
 from GravNN.Networks.Model import load_config_and_model
+from GravNN.Support.BatchIntegrator import solve_ivp_batch
 from GravNN.Support.ProgressBar import ProgressBar
 from GravNN.Support.RigidBodyKinematics import euler1232C
 
@@ -69,6 +70,13 @@ class TrajectoryPropagator(ExperimentBase):
         np.random.seed(random_seed)
 
     def generate_trajectory(self, model, X0, t_eval):
+        # PINNs provide a pre-traced path for one position per call
+        compute_acceleration = getattr(
+            model,
+            "compute_acceleration_single",
+            model.compute_acceleration,
+        )
+
         def fun(t, y, IC=None):
             "Return the first-order system"
             R = y[0:3]
@@ -77,7 +85,7 @@ class TrajectoryPropagator(ExperimentBase):
             BN = compute_BN(t, self.omega_vec).squeeze()
             x_pos_B = BN @ R
             x_pos_B = x_pos_B.reshape((1, -1))
-            a_B = model.compute_acceleration(x_pos_B)
+            a_B = compute_acceleration(x_pos_B)
             a_B = np.array(a_B).squeeze()
             a_N = BN.T @ a_B
 
@@ -101,7 +109,7 @@ class TrajectoryPropagator(ExperimentBase):
         fun.pbar = ProgressBar(t_eval[-1], self.pbar)
 
         # avoid the first call to fun() to avoid a duplicate call to compute_acceleration
-        model.compute_acceleration(np.array([[100.0, 100.0, 100.0]]))
+        compute_acceleration(np.array([[100.0, 100.0, 100.0]]))
         fun.start_time = time.time()
 
         try:
@@ -147,6 +155,101 @@ class TrajectoryPropagator(ExperimentBase):
         return data
 
 
+class BatchTrajectoryPropagator(ExperimentBase):
+    def __init__(
+        self,
+        model,
+        initial_states,
+        period,
+        t_mesh_density=100,
+        tol=1e-10,
+        method="DOP853",
+        omega_vec=np.array([0.0, 0.0, 0.0]).reshape((3, 1)),
+    ):
+        """Propagate M initial states at once (e.g. a Monte Carlo study) with
+        `solve_ivp_batch`, evaluating the gravity model on the positions of all
+        M trajectories in a single call per integrator stage.
+
+        Args:
+            model (GravityModelBase or PINNGravityModel): gravity model
+            initial_states (np.array): [M x 6] initial states in the inertial frame
+            period (float): propagation time [s]
+            t_mesh_density (int, optional): number of output times. Defaults to 100.
+            tol (float, optional): relative and absolute tolerance. Defaults to 1e-10.
+            method (str, optional): "RK45" or "DOP853". Defaults to "DOP853".
+            omega_vec (np.array, optional): angular velocity of the body frame.
+                Defaults to no rotation.
+        """
+        super().__init__(
+            model,
+            initial_states=initial_states,
+            period=period,
+            t_mesh_density=t_mesh_density,
+            tol=tol,
+            method=method,
+            omega_vec=omega_vec,
+        )
+        self.model = model
+        self.x0 = np.reshape(initial_states, (-1, 6))
+        self.period = period
+        self.t_mesh_density = t_mesh_density
+        self.tol = tol
+        self.method = method
+        self.omega_vec = omega_vec
+
+    def generate_trajectories(self, model, X0, t_eval):
+        rotating = np.any(self.omega_vec != 0.0)
+
+        def fun(t, y):
+            "Return the first-order system of all trajectories"
+            R = y[:, 0:3]
+            V = y[:, 3:6]
+            if rotating:
+                BN = compute_BN(t, self.omega_vec)
+                x_pos_B = np.einsum("mij,mj->mi", BN, R)
+            else:
+                x_pos_B = R
+            a_B = np.reshape(np.array(model.compute_acceleration(x_pos_B)), (-1, 3))
+            if rotating:
+                a_N = np.einsum("mji,mj->mi", BN, a_B)
+            else:
+                a_N = a_B
+            return np.hstack((V, a_N))
+
+        start_time = time.time()
+        sol = solve_ivp_batch(
+            fun,
+            [0, t_eval[-1]],
+            X0,
+            method=self.method,
+            t_eval=t_eval,
+            atol=self.tol,
+            rtol=self.tol,
+        )
+        dt = time.time() - start_time
+        return sol, dt
+
+    def generate_data(self):
+        if not hasattr(self, "solution"):
+            self.t_mesh = np.linspace(
+                0,
+                self.period,
+                self.t_mesh_density,
+                endpoint=True,
+            )
+            self.solution, self.elapsed_time = self.generate_trajectories(
+                self.model,
+                self.x0,
+                self.t_mesh,
+            )
+        data = {
+            "solution": self.solution,
+            "elapsed_time": self.elapsed_time,
+            "t_mesh": self.t_mesh,
+        }
+        return data
+
+
 class TrajectoryExperiment:
     def __init__(
         self,
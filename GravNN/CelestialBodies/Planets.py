@@ -7,6 +7,7 @@ import pooch
 import shutil
 
 import GravNN
+from GravNN.Support.SHFiles import convert_sh_file, get_binary_file
 
 
 class Planet:
@@ -38,6 +39,8 @@ class Earth(Planet):
             unzipped = unpack(fname, action, "EGM96")
             new_name = fname.split("_raw")[0] + ".txt"
             if os.path.exists(new_name):
+                if not os.path.exists(get_binary_file(new_name)):
+                    convert_sh_file(new_name)
                 return new_name
 
             with open(unzipped, "rb") as f:
@@ -61,12 +64,15 @@ class Earth(Planet):
                         for line in data
                     ],
                 )
+            convert_sh_file(new_name)
             return new_name
 
         def format_EGM2008_sh(fname, action, pooch_inst):
             unzipped = unpack(fname, action, "EGM2008_to2190_TideFree")
             new_name = fname.split("_raw")[0] + ".txt"
             if os.path.exists(new_name):
+                if not os.path.exists(get_binary_file(new_name)):
+                    convert_sh_file(new_name)
                 return new_name
 
             with open(unzipped, "rb") as f:
@@ -95,6 +101,7 @@ class Earth(Planet):
                         for line in data
                     ],
                 )
+            convert_sh_file(new_name)
             return new_name
 
 
@@ -123,7 +130,8 @@ class Earth(Planet):
         src += fname
         dst = os.path.dirname(GravNN.__file__) + "/Files/GravityModels/Earth/"
         dst += fname
-        shutil.copy(src, dst)
+        # preserve the modification time, which keeps the binary counterpart valid
+        shutil.copy2(src, dst)
         self.EGM2008 = dst
         # pooch.retrieve(
         #     url="https://earth-info.nga.mil/php/download.php?file=egm-08spherical",
@@ -70,6 +70,26 @@ class ELM(GravityModelBase):
 
         return y.T  # (N, 3)
 
+    def compute_dU_dxdx(self, x):
+        """Jacobian [N x 3 x 3] of the predicted accelerations with respect to
+        the positions, i.e. the gradient of the acceleration"""
+        x = np.reshape(x, (-1, self.n_input_nodes))
+        N_samples = len(x)
+        dydx = np.zeros((N_samples, self.n_output_nodes, self.n_input_nodes))
+        for i in range(0, N_samples, self.max_pred_batch):
+            x_nd = self.input_scaler.transform(x[i : i + self.max_pred_batch])
+            H = self.activation(self.w @ x_nd.T + self.bias).T  # (batch, hidden)
+
+            # chain rule through the sigmoid and both min-max scalers
+            dH = H * (1.0 - H)
+            dy_nd = np.einsum("oh,nh,hi->noi", self.beta, dH, self.w)
+            dydx[i : i + self.max_pred_batch] = (
+                dy_nd
+                * self.input_scaler.scale_[None, None, :]
+                / self.output_scaler.scale_[None, :, None]
+            )
+        return dydx
+
     def compute_potential(self, x):
         return np.zeros((len(x), 1)) * np.nan
 
@@ -0,0 +1,383 @@
+import json
+import os
+
+import numpy as np
+from scipy.special import erf
+
+from GravNN.GravityModels.GravityModelBase import GravityModelBase
+
+
+class Jet:
+    def __init__(self, v, d=None, h=None):
+        """Values of a layer together with their first and second derivatives
+        with respect to the three network inputs, propagated forward through the
+        network (i.e. hand-written differentiation of each layer). With only
+        three inputs, the forward propagation of the derivatives is cheaper than
+        reverse mode, and yields the Hessian in the same pass.
+
+        Args:
+            v (np.array): [N x k] values
+            d (np.array, optional): [3 x N x k] first derivatives
+            h (np.array, optional): [3 x 3 x N x k] second derivatives
+        """
+        self.v = v
+        self.d = d
+        self.h = h
+
+    @classmethod
+    def variable(cls, x, order):
+        """Seed the [N x 3] inputs with derivatives up to the given order"""
+        d, h = None, None
+        if order >= 1:
+            d = np.zeros((3,) + x.shape, dtype=x.dtype)
+            for i in range(3):
+                d[i, :, i] = 1.0
+        if order >= 2:
+            h = np.zeros((3, 3) + x.shape, dtype=x.dtype)
+        return cls(x, d, h)
+
+    def map(self, f, f1=None, f2=None):
+        """Elementwise function with first (f1) and second (f2) derivatives"""
+        d, h = None, None
+        if self.d is not None:
+            d = f1 * self.d
+        if self.h is not None:
+            h = f1 * self.h + f2 * self.d[:, None] * self.d[None, :]
+        return Jet(f, d, h)
+
+    def __getitem__(self, columns):
+        return Jet(
+            self.v[:, columns],
+            None if self.d is None else self.d[..., columns],
+            None if self.h is None else self.h[..., columns],
+        )
+
+    def __add__(self, other):
+        if not isinstance(other, Jet):
+            return Jet(self.v + other, self.d, self.h)
+        d, h = None, None
+        if self.d is not None:
+            d = self.d + other.d
+        if self.h is not None:
+            h = self.h + other.h
+        return Jet(self.v + other.v, d, h)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return self * -1.0
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __rsub__(self, other):
+        return (-self) + other
+
+    def __mul__(self, other):
+        if not isinstance(other, Jet):
+            d, h = None, None
+            if self.d is not None:
+                d = self.d * other
+            if self.h is not None:
+                h = self.h * other
+            return Jet(self.v * other, d, h)
+        d, h = None, None
+        if self.d is not None:
+            d = self.d * other.v + self.v * other.d
+        if self.h is not None:
+            cross = self.d[:, None] * other.d[None, :]
+            h = self.h * other.v + self.v * other.h + cross + np.swapaxes(cross, 0, 1)
+        return Jet(self.v * other.v, d, h)
+
+    __rmul__ = __mul__
+
+    def dense(self, kernel, bias):
+        return Jet(
+            self.v @ kernel + bias,
+            None if self.d is None else self.d @ kernel,
+            None if self.h is None else self.h @ kernel,
+        )
+
+    def sum(self):
+        """Sum over the columns"""
+        return Jet(
+            np.sum(self.v, axis=-1, keepdims=True),
+            None if self.d is None else np.sum(self.d, axis=-1, keepdims=True),
+            None if self.h is None else np.sum(self.h, axis=-1, keepdims=True),
+        )
+
+    def sqrt(self):
+        f = np.sqrt(self.v)
+        return self.map(f, 0.5 / f, -0.25 / f**3)
+
+    def reciprocal(self):
+        f = 1.0 / self.v
+        return self.map(f, -(f**2), 2.0 * f**3)
+
+    def pow(self, p):
+        x = self.v
+        return self.map(x**p, p * x ** (p - 1), p * (p - 1) * x ** (p - 2))
+
+    def clip(self, lower, upper):
+        # the derivatives vanish where the values are clipped
+        inside = ((self.v > lower) & (self.v < upper)).astype(self.v.dtype)
+        return self.map(np.clip(self.v, lower, upper), inside, 0.0 * inside)
+
+    def tanh(self):
+        f = np.tanh(self.v)
+        f1 = 1.0 - f**2
+        return self.map(f, f1, -2.0 * f * f1)
+
+    def sin(self):
+        f = np.sin(self.v)
+        return self.map(f, np.cos(self.v), -f)
+
+    def cos(self):
+        f = np.cos(self.v)
+        return self.map(f, -np.sin(self.v), -f)
+
+    def activation(self, name):
+        x = self.v
+        if name == "linear":
+            return self
+        if name == "tanh":
+            return self.tanh()
+        if name in ("sin", "sine"):
+            return self.sin()
+        if name == "sigmoid":
+            f = 1.0 / (1.0 + np.exp(-x))
+            f1 = f * (1.0 - f)
+            return self.map(f, f1, f1 * (1.0 - 2.0 * f))
+        if name in ("swish", "silu"):
+            s = 1.0 / (1.0 + np.exp(-x))
+            s1 = s * (1.0 - s)
+            return self.map(x * s, s + x * s1, 2.0 * s1 + x * s1 * (1.0 - 2.0 * s))
+        if name == "softplus":
+            s = 1.0 / (1.0 + np.exp(-x))
+            return self.map(np.logaddexp(0.0, x), s, s * (1.0 - s))
+        if name == "gelu":
+            # exact (erf) form, the default of tf.keras.activations.gelu
+            cdf = 0.5 * (1.0 + erf(x / np.sqrt(2.0)))
+            pdf = np.exp(-0.5 * x**2) / np.sqrt(2.0 * np.pi)
+            return self.map(x * cdf, cdf + x * pdf, pdf * (2.0 - x**2))
+        raise ValueError(f"Unsupported activation {name}")
+
+
+def concat(jets):
+    return Jet(
+        np.concatenate([jet.v for jet in jets], axis=-1),
+        None if jets[0].d is None else np.concatenate([j.d for j in jets], axis=-1),
+        None if jets[0].h is None else np.concatenate([j.h for j in jets], axis=-1),
+    )
+
+
+def where(mask, a, b):
+    return Jet(
+        np.where(mask, a.v, b.v),
+        None if a.d is None else np.where(mask, a.d, b.d),
+        None if a.h is None else np.where(mask, a.h, b.h),
+    )
+
+
+def r_safety_set(r, clip=1.0):
+    r_inv_cap = r.reciprocal().clip(0.0, clip)
+    r_cap = r.clip(0.0, clip)
+    return r_cap, r_inv_cap
+
+
+def H(x, r, k):
+    # assuming k > 0 this goes from 0 -> 1 as x->inf
+    return 0.5 + 0.5 * ((x - r) * k).tanh()
+
+
+class ExportedPINN(GravityModelBase):
+    def __init__(self, file, trajectory=None, dtype=np.float64):
+        """PINN gravity model evaluated from a file written by
+        `GravNN.Networks.Export.export_model`, without TensorFlow. The network
+        (preprocessing layers, dense layers, analytic model, potential scaling
+        and fusion) is evaluated with NumPy, and the acceleration and gravity
+        gradient tensor are computed by differentiating each layer by hand.
+
+        Args:
+            file (str): path of the exported network (.npz)
+            trajectory (TrajectoryBase, optional): trajectory for which gravity
+            measurements must be produced. Defaults to None.
+            dtype (np.dtype, optional): precision of the evaluation, see
+            `GravityModelBase`. Defaults to np.float64.
+        """
+        super().__init__(file, trajectory=trajectory, dtype=dtype)
+        self.file = file
+        with np.load(file, allow_pickle=False) as data:
+            self.spec = json.loads(str(data["spec"]))
+            self.weights = {
+                key: data[key].astype(self.dtype) for key in data.files if key != "spec"
+            }
+        self.configure(trajectory)
+
+    def generate_full_file_directory(self):
+        self.file_directory += (
+            os.path.splitext(os.path.basename(__file__))[0]
+            + "_"
+            + os.path.splitext(os.path.basename(self.file))[0]
+            + "/"
+        )
+
+    def preprocess(self, x):
+        """Apply the preprocessing layers, returning the network inputs and the
+        spherical features [r, s, t, u] used by the analytic model"""
+        features = None
+        for i, layer in enumerate(self.spec["preprocessing"]):
+            kind = layer["type"]
+            if kind == "pines":
+                r = (x * x).sum().sqrt()
+                x = concat([r, x * r.reciprocal()])
+                features = x
+            elif kind == "r_scale":
+                x = concat([x[0:1] * (1.0 / layer["ref_radius_max"]), x[1:4]])
+            elif kind == "r_normalize":
+                x = concat([x[0:1] * layer["scale"] + layer["min"], x[1:4]])
+            elif kind == "r_inv":
+                r_cap, r_inv_cap = r_safety_set(x[0:1])
+                x = concat([r_cap, r_inv_cap, x[1:2]])
+            elif kind == "fourier":
+                x = self.fourier_features(x, layer, f"preprocessing_{i}")
+            else:
+                raise ValueError(f"Unsupported preprocessing layer {kind}")
+        return x, features
+
+    def fourier_features(self, x, layer, prefix):
+        r = x[0:1]
+        projections = []
+        for i in range(3):
+            freq = self.weights[f"{prefix}/freq_{i}"]  # [1 x M]
+            offset = self.weights[f"{prefix}/phase_{i}"]  # [M]
+            # angle mapped from [-1, 1] onto [0, 2pi]
+            x_mod = (x[i + 1 : i + 2] + 1.0) * np.pi
+            x_FF = x_mod.dense(freq, offset)
+            x_sin, x_cos = x_FF.sin(), x_FF.cos()
+            if layer["freq_decay"]:
+                x_r_scale = r.pow(freq[0])
+                x_sin, x_cos = x_r_scale * x_sin, x_r_scale * x_cos
+            projections.append((x_sin, x_cos))
+        features = [x[0:4]] + [sin for sin, _ in projections]
+        if layer["sine_and_cosine"]:
+            features += [cos for _, cos in projections]
+        return concat(features)
+
+    def dense(self, x, i, activation):
+        kernel = self.weights[f"dense_{i}/kernel"]
+        bias = self.weights[f"dense_{i}/bias"]
+        return x.dense(kernel, bias).activation(activation)
+
+    def network(self, x):
+        """Dense layers of the network_arch used by `Networks.get_network_fcn`"""
+        arch = self.spec["network_arch"]
+        activation = self.spec["activation"]
+        N_dense = self.spec["dense_layers"]
+        if arch == "traditional":
+            for i in range(N_dense - 1):
+                x = self.dense(x, i, activation)
+        elif arch == "residual":
+            encoding_layers = self.spec["encoding_layers"]
+            for i in range(encoding_layers):
+                x = self.dense(x, i, activation)
+            for i in range(1, N_dense - encoding_layers):
+                shortcut = x
+                x = self.dense(x, encoding_layers + i - 1, activation)
+                # skip connection
+                if i % 3 == 0:
+                    x = x + shortcut
+        elif arch == "transformer":
+            encoder_1 = self.dense(x, 0, activation)
+            encoder_2 = self.dense(x, 1, activation)
+            for i in range(2, N_dense - 1):
+                x = self.dense(x, i, activation)
+                x = x * encoder_1 + (1.0 - x) * encoder_2
+        else:
+            raise ValueError(f"Unsupported network_arch {arch}")
+        return self.dense(x, N_dense - 1, "linear")
+
+    def analytic_model(self, features):
+        """Point mass and C20 potential of the `AnalyticModelLayer`"""
+        spec = self.spec["analytic"]
+        mu, a, C20 = spec["mu"], spec["a"], spec["C20"]
+        c1, c2 = spec["c1"], spec["c2"]
+        r = features[0:1]
+        u = features[3:4]
+        r_cap, r_inv_cap = r_safety_set(r)
+
+        u_pm_external = r_inv_cap * mu
+        u_C20 = (r_inv_cap * a).pow(2) * u_pm_external * (u * u * c1 - c2) * C20
+        u_external_full = -(u_pm_external + u_C20)
+
+        u_external_pm_boundary = mu / a
+        u_boundary = -((u * u * c1 - c2) * (u_external_pm_boundary * C20))
+        u_boundary = u_boundary - u_external_pm_boundary
+        u_internal = r_cap * r_cap * (mu / a**3) + 2.0 * u_boundary
+
+        u_analytic = where(r.v < a, u_internal, u_external_full)
+        k_external = self.weights["analytic/k_external"]
+        r_external = self.weights["analytic/r_external"]
+        return u_analytic * H(r, r_external, k_external)
+
+    def network_potential(self, x_input, order=0):
+        """Potential of the network for the [N x 3] normalized inputs, with its
+        derivatives with respect to the inputs up to the given order"""
+        x = Jet.variable(x_input, order)
+        x, features = self.preprocess(x)
+        u_nn = self.network(x)
+        if "analytic" not in self.spec:
+            return u_nn
+
+        u_analytic = self.analytic_model(features)
+        if self.spec["scale_potential"]:
+            _, r_inv_cap = r_safety_set(features[0:1])
+            u_nn = u_nn * r_inv_cap.pow(self.spec["power"])
+        u = u_nn + u_analytic * self.spec["fuse"]
+        if self.spec["enforce_bc"]:
+            h = H(features[0:1], self.weights["bc/radius"], self.spec["k"])
+            u = (1.0 - h) * u + h * u_analytic
+        return u
+
+    def evaluate(self, positions, order):
+        if positions is None:
+            positions = self.trajectory.positions
+        positions = np.reshape(positions, (-1, 3)).astype(self.dtype, copy=False)
+        x_input = positions * self.weights["x_scale"] + self.weights["x_min"]
+        return self.network_potential(x_input, order)
+
+    def potential(self, u):
+        return ((u.v - self.weights["u_min"]) / self.weights["u_scale"])[:, 0]
+
+    def acceleration(self, u):
+        a_pred = -u.d[:, :, 0].T
+        return (a_pred - self.weights["a_min"]) / self.weights["a_scale"]
+
+    def gradient(self, u):
+        jacobian = -np.moveaxis(u.h[:, :, :, 0], -1, 0)
+        x_star = self.weights["x_scale"]
+        a_star = self.weights["a_scale"]
+        l_star = 1 / x_star
+        t_star = np.sqrt(a_star * l_star)
+        return jacobian / t_star**2
+
+    def compute_all(self, positions=None, gradient=False):
+        u = self.evaluate(positions, 2 if gradient else 1)
+        self.accelerations = self.acceleration(u)
+        self.potentials = self.potential(u)
+        if gradient:
+            return self.accelerations, self.potentials, self.gradient(u)
+        return self.accelerations, self.potentials
+
+    def compute_acceleration(self, positions=None):
+        self.accelerations = self.acceleration(self.evaluate(positions, 1))
+        return self.accelerations
+
+    def compute_potential(self, positions=None):
+        self.potentials = self.potential(self.evaluate(positions, 0))
+        return self.potentials
+
+    def compute_dU_dxdx(self, positions=None):
+        """Compute the [N x 3 x 3] gradient of the acceleration for an existing
+        trajectory or provided set of positions"""
+        return self.gradient(self.evaluate(positions, 2))
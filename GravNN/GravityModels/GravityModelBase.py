@@ -3,9 +3,18 @@ import inspect
 import json
 import logging
 import os
-import pickle
 from abc import ABC, abstractmethod
 
+import numpy as np
+
+from GravNN.Support.storage import (
+    append_arrays,
+    array_exists,
+    hash_array,
+    load_array,
+    save_arrays,
+)
+
 
 class SkipNonSerializable(json.JSONEncoder):
     def default(self, obj):
@@ -19,11 +28,25 @@ class GravityModelBase(ABC):
     verbose = True
 
     def __init__(self, *args, **kwargs):
-        """Base class responsible for generating the accelerations for a given trajectory / distribution"""
+        """Base class responsible for generating the accelerations for a given trajectory / distribution
+
+        Keyword Args:
+            pool (WorkerPool, optional): persistent worker pool used by models that
+                distribute their computation across processes. The pool does not
+                contribute to the model hash.
+            dtype (np.dtype, optional): precision of the positions and values of
+                the analytic kernels (e.g. np.float32 for large volumes of noisy
+                training data), which are compiled separately for each dtype. See
+                `PrecisionExperiment` for the resulting accuracy. Values of
+                reduced precision models are saved separately from float64 ones.
+                Defaults to np.float64.
+        """
         self._trajectory = None
         self.accelerations = None
         self.potentials = None
         self.file_directory = None
+        self.pool = kwargs.pop("pool", None)
+        self.dtype = np.dtype(kwargs.pop("dtype", np.float64))
         self.id = self.generate_hash(*args, **kwargs)
         return
 
@@ -40,6 +63,8 @@ class GravityModelBase(ABC):
             cls=SkipNonSerializable,
         )
         input_data += self.__class__.__name__
+        if self.dtype != np.float64:
+            input_data += self.dtype.name
 
         # Generate a SHA256 hash of the input data based on string
         hash_obj = hashlib.sha256(input_data.encode())
@@ -58,24 +83,26 @@ class GravityModelBase(ABC):
                 os.path.splitext(__file__)[0] + "/../../Files/Trajectories/Custom/"
             )
         self.generate_full_file_directory()
+        if self.dtype != np.float64:
+            # reduced precision values must not be mistaken for float64 ones
+            self.file_directory = self.file_directory[:-1] + f"_{self.dtype.name}/"
 
     def save(self):
         # Create the directory/file and dump the acceleration and potential if computed
-        if not os.path.exists(self.file_directory):
-            os.makedirs(self.file_directory)
-
-        if self.accelerations is not None:
-            with open(self.file_directory + "acceleration.data", "wb") as f:
-                pickle.dump(self.accelerations, f)
-
-        if self.potentials is not None:
-            with open(self.file_directory + "potential.data", "wb") as f:
-                pickle.dump(self.potentials, f)
+        # (atomically, see `save_arrays`), along with the hash of the positions
+        # they belong to
+        arrays = {"acceleration": self.accelerations, "potential": self.potentials}
+        if self.trajectory is not None:
+            arrays["positions_hash"] = hash_array(self.trajectory.positions)
+        save_arrays(self.file_directory, arrays)
         return
 
     def load(self, override=False):
         """Load saved acceleration and potential values for a given trajectory / distribution, or
-        generate them if they dont exist
+        generate them if they dont exist. Both quantities are generated together in a single
+        pass through `compute_all`. If the trajectory has grown since the values were saved
+        (see the `dist_seed` of `TrajectoryBase`), only the new positions are evaluated and
+        appended to the saved values.
 
         Args:
             override (bool, optional): Flag determining if the acceleration and potentials should be overwritten. Defaults to False.
@@ -83,56 +110,147 @@ class GravityModelBase(ABC):
         Returns:
             GravityModelBase: self
         """
-        self.load_acceleration(override)
-        self.load_potential(override)
+        acc_exists = array_exists(self.file_directory, "acceleration")
+        pot_exists = array_exists(self.file_directory, "potential")
+        if acc_exists and pot_exists and override is False:
+            self.load_acceleration(override)
+            self.load_potential(override)
+            self.extend()
+        else:
+            if self.verbose:
+                print(
+                    "Generating acceleration and potential at "
+                    + os.path.relpath(self.file_directory),
+                )
+            self.compute_all()
+            self.save()
         return self
 
+    def extend(self):
+        """Match the loaded values to the positions of the trajectory: values of the
+        positions beyond the saved ones are computed and appended to the saved
+        values, while values of a longer saved (seeded) trajectory are truncated
+        lazily. Values are only reused if the positions they were computed for
+        are a prefix of the trajectory, and are regenerated otherwise."""
+        if self.trajectory is None:
+            return
+        positions = self.trajectory.positions
+        N = len(positions)
+        M = len(self.accelerations)
+        if M == N and len(self.potentials) == N:
+            return
+
+        if len(self.potentials) != M or not self.matches_saved_positions(M):
+            if self.verbose:
+                print(
+                    "Regenerating acceleration and potential of other positions at "
+                    + os.path.relpath(self.file_directory),
+                )
+            self.compute_all()
+            self.save()
+            return
+
+        if M < N:
+            if self.verbose:
+                print(
+                    f"Extending acceleration and potential from {M} to {N} points at "
+                    + os.path.relpath(self.file_directory),
+                )
+            accelerations, potentials = self.compute_all(positions[M:])
+            append_arrays(
+                self.file_directory,
+                {"acceleration": accelerations, "potential": potentials},
+            )
+            # written last, so an interrupted append is regenerated
+            save_arrays(self.file_directory, {"positions_hash": hash_array(positions)})
+            self.accelerations = load_array(self.file_directory, "acceleration")
+            self.potentials = load_array(self.file_directory, "potential")
+        self.accelerations = self.accelerations[:N]
+        self.potentials = self.potentials[:N]
+
+    def matches_saved_positions(self, M):
+        """Whether the M saved values were computed for the first M positions of
+        the trajectory (or of its saved, longer, seeded distribution)"""
+        if not array_exists(self.file_directory, "positions_hash"):
+            return False
+        positions = self.trajectory.positions
+        if M > len(positions):
+            positions = load_array(self.trajectory.file_directory, "trajectory")
+        if len(positions) < M:
+            return False
+        saved_hash = load_array(self.file_directory, "positions_hash", mmap_mode=None)
+        return np.array_equal(hash_array(positions[:M]), saved_hash)
+
     def load_acceleration(self, override=False):
         # Check if the file exists and either load the acceleration or generate it
-        if (
-            os.path.exists(self.file_directory + "acceleration.data")
-            and override is False
-        ):
+        if array_exists(self.file_directory, "acceleration") and override is False:
             if self.verbose:
                 print(
-                    "Found existing acceleration.data at "
+                    "Found existing acceleration data at "
                     + os.path.relpath(self.file_directory),
                 )
-            with open(self.file_directory + "acceleration.data", "rb") as f:
-                self.accelerations = pickle.load(f)
-                return self.accelerations
+            self.accelerations = load_array(self.file_directory, "acceleration")
+            return self.accelerations
         else:
             if self.verbose:
                 print(
                     "Generating acceleration at "
                     + os.path.relpath(self.file_directory),
                 )
-            # Note: compute_acceleration() might generate the potential values too for some representations.
-            # For example, computing the potential of the polyhedral model adds one extra step
-            # to the acceleration calculation. Rather than rerunning the entire algorithm to
-            # compute the potential, the calculations are bundled together for efficiency.
-            self.compute_acceleration()
+            # The potential is a byproduct of the acceleration for most
+            # representations, so both are generated and saved together.
+            self.compute_all()
             self.save()
-        return
+        return self.accelerations
 
     def load_potential(self, override=False):
         # Check if the file exists and either load the potential or generate it
-        if os.path.exists(self.file_directory + "potential.data") and override is False:
+        if array_exists(self.file_directory, "potential") and override is False:
             if self.verbose:
                 print(
-                    "Found existing potential.data at "
+                    "Found existing potential data at "
                     + os.path.relpath(self.file_directory),
                 )
-            with open(self.file_directory + "potential.data", "rb") as f:
-                self.potentials = pickle.load(f)
-                return self.potentials
+            self.potentials = load_array(self.file_directory, "potential")
+            return self.potentials
         else:
             if self.verbose:
                 print("Generating potential at " + os.path.relpath(self.file_directory))
-            self.compute_potential()
+            self.compute_all()
             self.save()
             return self.potentials
 
+    def compute_all(self, positions=None, gradient=False):
+        """Compute the acceleration and potential (and optionally the gravity
+        gradient tensor) for an existing trajectory or provided set of positions.
+
+        Representations whose kernels produce both quantities at once should
+        override this so they are evaluated in a single pass. The default falls
+        back to separate acceleration and potential calls.
+
+        Args:
+            positions (np.array, optional): [N x 3] cartesian positions. Defaults
+                to the positions of the configured trajectory.
+            gradient (bool, optional): Also compute the [N x 3 x 3] gradient of the
+                acceleration. Defaults to False.
+
+        Returns:
+            tuple: accelerations [N x 3], potentials [N] (, gradients [N x 3 x 3])
+        """
+        if positions is None:
+            positions = self.trajectory.positions
+        accelerations = self.compute_acceleration(positions)
+        potentials = self.compute_potential(positions)
+        self.accelerations = accelerations
+        self.potentials = potentials
+        if gradient:
+            return accelerations, potentials, self.compute_dU_dxdx(positions)
+        return accelerations, potentials
+
+    @abstractmethod
+    def compute_dU_dxdx(self):
+        pass
+
     @abstractmethod
     def generate_full_file_directory(self):
         pass
@@ -8,6 +8,7 @@ from GravNN.GravityModels.GravityModelBase import GravityModelBase
 from GravNN.GravityModels.PointMass import PointMass
 from GravNN.GravityModels.Polyhedral import Polyhedral
 from GravNN.Support.PathTransformations import make_windows_path_posix
+from GravNN.Support.storage import array_exists
 
 
 def get_hetero_poly_data(trajectory, obj_shape_file, **kwargs):
@@ -117,8 +118,22 @@ class Heterogeneity:
 
 
 class HeterogeneousPoly(GravityModelBase):
-    def __init__(self, celestial_body, obj_file, heterogeneities, trajectory=None):
-        self.homogeneous_poly = Polyhedral(celestial_body, obj_file, trajectory)
+    def __init__(
+        self,
+        celestial_body,
+        obj_file,
+        heterogeneities,
+        trajectory=None,
+        pool=None,
+        dtype=np.float64,
+    ):
+        self.homogeneous_poly = Polyhedral(
+            celestial_body,
+            obj_file,
+            trajectory,
+            pool=pool,
+            dtype=dtype,
+        )
         self.planet = celestial_body
         self.obj_file = obj_file
         self.point_mass_list = []
@@ -138,6 +153,8 @@ class HeterogeneousPoly(GravityModelBase):
             self.offset_list,
             self.point_mass_list,
             trajectory,
+            pool=pool,
+            dtype=dtype,
         )
         self.configure(trajectory)
 
@@ -154,11 +171,14 @@ class HeterogeneousPoly(GravityModelBase):
             mu_str = f"{self.point_mass_list[i].celestial_body.mu}"
             offset_str = f"{self.offset_list[i]}"
             unique_str += f"{mu_str}_{offset_str}_"
+        surrogate_tag = self.homogeneous_poly.surrogate_tag
+        if surrogate_tag is not None:
+            unique_str += f"{surrogate_tag}_"
         self.file_directory += f"{class_name}_{obj_file}_{unique_str}/"
 
     def load(self, override=False):
         # If heterogeneous model exists, load it
-        data_exists = os.path.exists(self.file_directory + "acceleration.data")
+        data_exists = array_exists(self.file_directory, "acceleration")
         if data_exists:
             # you need to load the homogeneous solution
             self.homogeneous_poly.trajectory = self.trajectory
@@ -193,6 +213,43 @@ class HeterogeneousPoly(GravityModelBase):
             self.potentials = potentials
             self.save()
 
+    def build_surrogate(self, r_max, r_min=None, error_bound=1e-6):
+        """Tabulate the homogeneous polyhedron on an interpolation grid (see
+        `Polyhedral.build_surrogate`). The point masses remain exact."""
+        surrogate = self.homogeneous_poly.build_surrogate(r_max, r_min, error_bound)
+        self.configure(self.trajectory)
+        return surrogate
+
+    def compute_all(self, positions=None, gradient=False):
+        if positions is None:
+            positions = self.trajectory.positions
+        positions = positions.reshape((-1, 3))
+
+        values = self.homogeneous_poly.compute_all(positions, gradient=gradient)
+        a_poly = values[0].copy()
+        u_poly = values[1].copy()
+
+        for i in range(len(self.point_mass_list)):
+            r_offset = np.array(self.offset_list[i]).reshape((-1, 3))
+            x_pm = positions - r_offset
+            a_poly += self.point_mass_list[i].compute_acceleration(x_pm)
+            u_poly += self.point_mass_list[i].compute_potential(x_pm)
+
+        self.accelerations = a_poly
+        self.potentials = u_poly
+        if gradient:
+            dU_dxdx = values[2].copy()
+            for i in range(len(self.point_mass_list)):
+                r_offset = np.array(self.offset_list[i]).reshape((-1, 3))
+                x_pm = positions - r_offset
+                dU_dxdx += self.point_mass_list[i].compute_dU_dxdx(x_pm)
+            return a_poly, u_poly, dU_dxdx
+        return a_poly, u_poly
+
+    def compute_dU_dxdx(self, positions=None):
+        "Compute the [N x 3 x 3] gradient of the acceleration"
+        return self.compute_all(positions, gradient=True)[2]
+
     def compute_acceleration(self, positions=None):
         if positions is None:
             positions = self.trajectory.positions
@@ -1,11 +1,11 @@
 import os
 
 import numpy as np
+from numba import njit, prange
 
 import GravNN
 from GravNN.CelestialBodies.Asteroids import Eros
 from GravNN.GravityModels.GravityModelBase import GravityModelBase
-from GravNN.Support.transformations import cart2sph
 
 
 def get_mascons_data(trajectory, gravity_file, **kwargs):
@@ -23,8 +23,128 @@ def get_mascons_data(trajectory, gravity_file, **kwargs):
     return x, a, u
 
 
+def compute_mascon_batch(
+    positions,
+    masses_mu,
+    masses_position,
+    point_tile=64,
+    mass_tile=1024,
+):
+    """Evaluate the acceleration and potential of a set of point masses at
+    each of the (N, 3) positions [m].
+
+    The masses are expected in structure-of-arrays layout: masses_mu (M,) and
+    masses_position (3, M). Points are processed in tiles of `point_tile` and
+    the masses in tiles of `mass_tile` so that a tile of masses stays in cache
+    while it is reused by every point of the point tile. Beyond the outputs,
+    memory is bounded by the tile sizes regardless of N and M, and the point
+    tiles are distributed across threads. The outputs and the sums over a tile
+    of masses share the dtype of the positions (and masses)."""
+    N = len(positions)
+    M = len(masses_mu)
+    accelerations = np.zeros((N, 3), dtype=positions.dtype)
+    potentials = np.zeros((N,), dtype=positions.dtype)
+
+    # 0 and 1 in the dtype of the masses, such that the arithmetic over a tile
+    # of masses isn't promoted to float64
+    zero = np.zeros((1,), dtype=masses_mu.dtype)[0]
+    one = np.ones((1,), dtype=masses_mu.dtype)[0]
+
+    N_point_tiles = (N + point_tile - 1) // point_tile
+    for tile in prange(N_point_tiles):
+        p_start = tile * point_tile
+        p_end = min(p_start + point_tile, N)
+        for m_start in range(0, M, mass_tile):
+            m_end = min(m_start + mass_tile, M)
+            for p in range(p_start, p_end):
+                x = positions[p, 0]
+                y = positions[p, 1]
+                z = positions[p, 2]
+                ax, ay, az, u = zero, zero, zero, zero
+                for m in range(m_start, m_end):
+                    dx = x - masses_position[0, m]
+                    dy = y - masses_position[1, m]
+                    dz = z - masses_position[2, m]
+                    r_inv = one / np.sqrt(dx * dx + dy * dy + dz * dz)
+                    mu_r_inv = masses_mu[m] * r_inv
+
+                    # a = -mu * dr / |dr|^3, U = -mu / |dr|
+                    mu_r3_inv = mu_r_inv * r_inv * r_inv
+                    ax -= mu_r3_inv * dx
+                    ay -= mu_r3_inv * dy
+                    az -= mu_r3_inv * dz
+                    u -= mu_r_inv
+                accelerations[p, 0] += ax
+                accelerations[p, 1] += ay
+                accelerations[p, 2] += az
+                potentials[p] += u
+    return accelerations, potentials
+
+
+def compute_mascon_gradient_batch(
+    positions,
+    masses_mu,
+    masses_position,
+    point_tile=64,
+    mass_tile=1024,
+):
+    """Evaluate the [N x 3 x 3] gradient of the acceleration of a set of point
+    masses at each of the (N, 3) positions [m], tiled as `compute_mascon_batch`"""
+    N = len(positions)
+    M = len(masses_mu)
+    gradients = np.zeros((N, 3, 3), dtype=positions.dtype)
+
+    zero = np.zeros((1,), dtype=masses_mu.dtype)[0]
+    one = np.ones((1,), dtype=masses_mu.dtype)[0]
+    three = 3 * one
+
+    N_point_tiles = (N + point_tile - 1) // point_tile
+    for tile in prange(N_point_tiles):
+        p_start = tile * point_tile
+        p_end = min(p_start + point_tile, N)
+        for m_start in range(0, M, mass_tile):
+            m_end = min(m_start + mass_tile, M)
+            for p in range(p_start, p_end):
+                x = positions[p, 0]
+                y = positions[p, 1]
+                z = positions[p, 2]
+                gxx, gyy, gzz, gxy, gxz, gyz = zero, zero, zero, zero, zero, zero
+                for m in range(m_start, m_end):
+                    dx = x - masses_position[0, m]
+                    dy = y - masses_position[1, m]
+                    dz = z - masses_position[2, m]
+                    r_inv = one / np.sqrt(dx * dx + dy * dy + dz * dz)
+                    r2_inv = r_inv * r_inv
+
+                    # da/dx = mu * (3 * dr dr^T / |dr|^2 - I) / |dr|^3
+                    mu_r3_inv = masses_mu[m] * r_inv * r2_inv
+                    c = three * mu_r3_inv * r2_inv
+                    gxx += c * dx * dx - mu_r3_inv
+                    gyy += c * dy * dy - mu_r3_inv
+                    gzz += c * dz * dz - mu_r3_inv
+                    gxy += c * dx * dy
+                    gxz += c * dx * dz
+                    gyz += c * dy * dz
+                gradients[p, 0, 0] += gxx
+                gradients[p, 1, 1] += gyy
+                gradients[p, 2, 2] += gzz
+                gradients[p, 0, 1] += gxy
+                gradients[p, 1, 0] += gxy
+                gradients[p, 0, 2] += gxz
+                gradients[p, 2, 0] += gxz
+                gradients[p, 1, 2] += gyz
+                gradients[p, 2, 1] += gyz
+    return gradients
+
+
 class Mascons(GravityModelBase):
-    def __init__(self, celestial_body, mass_csv, trajectory=None):
+    def __init__(
+        self,
+        celestial_body,
+        mass_csv,
+        trajectory=None,
+        dtype=np.float64,
+    ):
         """Gravity model that only produces accelerations and potentials
         as if there were only a point mass.
 
@@ -32,8 +152,15 @@ class Mascons(GravityModelBase):
             celestial_body (CelestialBody): body used to generate gravity measurements
             trajectory (TrajectoryBase, optional): trajectory for which gravity
             measurements must be produced. Defaults to None.
+            dtype (np.dtype, optional): precision of the masses and values, see
+            `GravityModelBase`. Defaults to np.float64.
         """
-        super().__init__(celestial_body, mass_csv, trajectory=trajectory)
+        super().__init__(
+            celestial_body,
+            mass_csv,
+            trajectory=trajectory,
+            dtype=dtype,
+        )
         self.celestial_body = celestial_body
         self.mu = celestial_body.mu
         self.mass_csv = mass_csv
@@ -57,34 +184,61 @@ class Mascons(GravityModelBase):
             self.masses_mu = lines[:, 0:1]
             self.masses_position = lines[:, 1:]
 
+        # structure-of-arrays copies for the batch kernel
+        self.masses_mu_soa = np.ascontiguousarray(
+            self.masses_mu[:, 0],
+            dtype=self.dtype,
+        )
+        self.masses_position_soa = np.ascontiguousarray(
+            self.masses_position.T,
+            dtype=self.dtype,
+        )
+
     def generate_full_file_directory(self):
         model_name = os.path.splitext(os.path.basename(__file__))[0]
         masses_file = os.path.splitext(os.path.basename(self.mass_csv))[0]
         self.file_directory += f"{model_name}_{masses_file}/"
         pass
 
-    def compute_acceleration(self, positions=None):
-        """Compute the acceleration for an existing trajectory or provided
-        set of positions"""
+    def compute_all(self, positions=None, gradient=False):
+        """Compute the acceleration and potential (both produced by the same
+        sweep over the masses) for an existing trajectory or provided positions"""
         if positions is None:
             positions = self.trajectory.positions
 
-        self.accelerations = np.zeros(positions.shape)
-        for i in range(len(self.accelerations)):
-            self.accelerations[i] = self.compute_acceleration_value(positions[i])
+        positions = np.ascontiguousarray(positions, dtype=self.dtype).reshape((-1, 3))
+        self.accelerations, self.potentials = compute_masses(
+            positions,
+            self.masses_mu_soa,
+            self.masses_position_soa,
+        )
+        if gradient:
+            gradients = self.compute_dU_dxdx(positions)
+            return self.accelerations, self.potentials, gradients
+        return self.accelerations, self.potentials
 
-        return self.accelerations
-
-    def compute_potential(self, positions=None):
-        "Compute the potential for an existing trajectory or provided set of positions"
+    def compute_dU_dxdx(self, positions=None):
+        """Compute the [N x 3 x 3] gradient of the acceleration for an existing
+        trajectory or provided set of positions"""
         if positions is None:
             positions = self.trajectory.positions
 
-        positions = cart2sph(positions)
-        self.potentials = np.zeros(len(positions))
-        for i in range(len(self.potentials)):
-            self.potentials[i] = self.compute_potential_value(positions[i])
+        positions = np.ascontiguousarray(positions, dtype=self.dtype).reshape((-1, 3))
+        if len(positions) == 1:
+            compute_fcn = compute_mascon_gradient_batch_jit
+        else:
+            compute_fcn = compute_mascon_gradient_batch_parallel
+        return compute_fcn(positions, self.masses_mu_soa, self.masses_position_soa)
 
+    def compute_acceleration(self, positions=None):
+        """Compute the acceleration for an existing trajectory or provided
+        set of positions"""
+        self.compute_all(positions)
+        return self.accelerations
+
+    def compute_potential(self, positions=None):
+        "Compute the potential for an existing trajectory or provided set of positions"
+        self.compute_all(positions)
         return self.potentials
 
     def compute_acceleration_value(self, position):
@@ -106,6 +260,30 @@ class Mascons(GravityModelBase):
         return u_mass
 
 
+def compute_masses(positions, masses_mu, masses_position):
+    """Evaluate (N, 3) positions against SoA masses, only spawning threads if
+    there is more than a single point (e.g. within solve_ivp)"""
+    if len(positions) == 1:
+        compute_fcn = compute_mascon_batch_jit
+    else:
+        compute_fcn = compute_mascon_batch_parallel
+    return compute_fcn(positions, masses_mu, masses_position)
+
+
+compute_mascon_batch_jit = njit(compute_mascon_batch, parallel=False, cache=True)
+compute_mascon_batch_parallel = njit(compute_mascon_batch, parallel=True, cache=True)
+compute_mascon_gradient_batch_jit = njit(
+    compute_mascon_gradient_batch,
+    parallel=False,
+    cache=True,
+)
+compute_mascon_gradient_batch_parallel = njit(
+    compute_mascon_gradient_batch,
+    parallel=True,
+    cache=True,
+)
+
+
 def main():
     import time
 
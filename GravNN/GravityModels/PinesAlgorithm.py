@@ -1,10 +1,10 @@
-import multiprocessing as mp
 from functools import partial
 
 import numpy as np
-from numba import njit
+from numba import get_num_threads, njit, prange
 
-from GravNN.Support.slurm_utils import get_available_cores
+from GravNN.Support.SHFiles import pack_triangular
+from GravNN.Support.WorkerPool import split_positions
 
 
 def getK(x):
@@ -39,6 +39,49 @@ def compute_n_matrices(N):
     return n1, n2, n1q, n2q
 
 
+def compute_n_packed(N):
+    """`compute_n_matrices` in packed lower-triangular form (see
+    `GravNN.Support.SHFiles.triangular_index`), without allocating the dense
+    matrices"""
+    size = (N + 2) * (N + 3) // 2
+    n1 = np.full((size,), np.nan)
+    n2 = np.full((size,), np.nan)
+    n1q = np.full((size,), np.nan)
+    n2q = np.full((size,), np.nan)
+
+    for l in range(0, N + 2):  # noqa: E741
+        for m in range(0, l + 1):
+            i = l * (l + 1) // 2 + m
+            if l >= m + 2:
+                n1[i] = np.sqrt(
+                    ((2.0 * l + 1.0) * (2.0 * l - 1.0)) / ((l - m) * (l + m)),
+                )
+                n2[i] = np.sqrt(
+                    ((l + m - 1.0) * (2.0 * l + 1.0) * (l - m - 1.0))
+                    / ((l + m) * (l - m) * (2.0 * l - 3.0)),
+                )
+            if l < N + 1:
+                if m < l:
+                    n1q[i] = np.sqrt(
+                        ((l - m) * getK(m) * (l + m + 1.0)) / getK(m + 1),
+                    )
+                n2q[i] = np.sqrt(
+                    ((l + m + 2.0) * (l + m + 1.0) * (2.0 * l + 1.0) * getK(m))
+                    / ((2.0 * l + 3.0) * getK(m + 1.0)),
+                )
+    return n1, n2, n1q, n2q
+
+
+def as_packed(*arrays):
+    """Pack dense [L+1 x L+1] normalization tables and Stokes coefficients into
+    the lower-triangular form used by the kernels, already packed arrays are
+    returned as is"""
+    return [
+        pack_triangular(array) if np.ndim(array) == 2 else np.asarray(array)
+        for array in arrays
+    ]
+
+
 def compute_acceleration(positions, N, mu, a, n1, n2, n1q, n2q, cbar, sbar):
     acc = np.zeros(positions.shape)
     for i in range(0, int(len(positions) / 3)):
@@ -95,116 +138,314 @@ def compute_acceleration(positions, N, mu, a, n1, n2, n1q, n2q, cbar, sbar):
     return acc
 
 
-# @njit(cache=True)
-# def compute_acc(positions, N, mu, a, n1, n2, n1q, n2q, cbar, sbar):
-#     acc = np.zeros(positions.shape)
-#     N_total = int(len(positions) / 3)
-#     potential = np.zeros((N_total,))
-#     if N == -1:
-#         return (acc, potential)
-#     for i in prange(0, N_total):
-#         results = compute_acc_thread(
-#             positions[3 * i : 3 * (i + 1)],
-#             N,
-#             mu,
-#             a,
-#             n1,
-#             n2,
-#             n1q,
-#             n2q,
-#             cbar,
-#             sbar,
-#         )
-#         acc[3 * i : 3 * (i + 1)] = results[0]
-#         potential[i] = results[1]
-#     return (acc, potential)
-
-
-def compute_acc(positions, N, mu, a, n1, n2, n1q, n2q, cbar, sbar):
-    acc = np.zeros(positions.shape)
-    N_total = int(len(positions) / 3)
-    potential = np.zeros((N_total,))
+def compute_acc(
+    positions,
+    N,
+    mu,
+    a,
+    n1,
+    n2,
+    n1q,
+    n2q,
+    cbar,
+    sbar,
+    pool=None,
+    gradient=False,
+    dtype=np.float64,
+):
+    """Compute the acceleration and potential for a flattened array of positions
+    ([x1, y1, z1, x2, ...]). All positions are evaluated in a single call to the
+    batch kernel rather than being distributed one at a time to a process pool.
+    If a `WorkerPool` is provided, chunks of positions are instead distributed to
+    its (persistent) workers.
+
+    The normalization tables (n1, n2, n1q, n2q) and Stokes coefficients (cbar,
+    sbar) are expected in packed lower-triangular form, dense arrays are packed
+    first. If `gradient`, the [N x 3 x 3] gradient of the acceleration is
+    computed in the same pass (see `compute_hessian_point`) and returned third.
+
+    The positions and outputs are stored in `dtype`, for which the kernel is
+    compiled separately. The tables and the recursion remain in float64, as the
+    aBar / rhol recursion underflows in float32 beyond moderate degrees."""
+    positions_Nx3 = np.ascontiguousarray(positions, dtype=dtype).reshape((-1, 3))
+    n1, n2, n1q, n2q, cbar, sbar = as_packed(n1, n2, n1q, n2q, cbar, sbar)
     if N == -1:
-        return (acc, potential)
+        values = (
+            np.zeros((len(positions_Nx3) * 3,), dtype=dtype),
+            np.zeros((len(positions_Nx3),), dtype=dtype),
+        )
+        if gradient:
+            values += (np.zeros((len(positions_Nx3), 3, 3), dtype=dtype),)
+        return values
+
+    if pool is not None and len(positions_Nx3) > 1:
+        acc, potential, hessian = compute_acc_pool(
+            positions_Nx3,
+            N,
+            mu,
+            a,
+            n1,
+            n2,
+            n1q,
+            n2q,
+            cbar,
+            sbar,
+            pool,
+            gradient,
+        )
+    elif len(positions_Nx3) == 1:
+        # Spawning threads isn't worth it for a single point (e.g. within solve_ivp)
+        acc, potential, hessian = compute_acc_batch_jit(
+            positions_Nx3,
+            N,
+            mu,
+            a,
+            n1,
+            n2,
+            n1q,
+            n2q,
+            cbar,
+            sbar,
+            1,
+            gradient,
+        )
+    else:
+        acc, potential, hessian = compute_acc_batch_parallel(
+            positions_Nx3,
+            N,
+            mu,
+            a,
+            n1,
+            n2,
+            n1q,
+            n2q,
+            cbar,
+            sbar,
+            get_num_threads(),
+            gradient,
+        )
 
-    compute_acc_partial = partial(
-        compute_acc_thread,
+    if gradient:
+        return (acc.reshape((-1,)), potential, hessian)
+    return (acc.reshape((-1,)), potential)
+
+
+def compute_acc_pool(
+    positions,
+    N,
+    mu,
+    a,
+    n1,
+    n2,
+    n1q,
+    n2q,
+    cbar,
+    sbar,
+    pool,
+    gradient=False,
+):
+    """Distribute chunks of an (N, 3) position array across a `WorkerPool`. The
+    normalization tables and Stokes coefficients are placed in shared memory once
+    and only their handles are sent with each task."""
+    handles = [pool.share(array) for array in (n1, n2, n1q, n2q, cbar, sbar)]
+    compute_chunk = partial(
+        compute_acc_shared,
         N=N,
         mu=mu,
         a=a,
-        n1=n1,
-        n2=n2,
-        n1q=n1q,
-        n2q=n2q,
-        cbar=cbar,
-        sbar=sbar,
+        handles=handles,
+        gradient=gradient,
+    )
+    results = pool.map(compute_chunk, split_positions(positions, pool.processes))
+
+    acc = np.concatenate([result[0] for result in results])
+    potential = np.concatenate([result[1] for result in results])
+    hessian = np.concatenate([result[2] for result in results])
+    return (acc, potential, hessian)
+
+
+def compute_acc_shared(positions, N, mu, a, handles, gradient=False):
+    """Worker side of `compute_acc_pool`"""
+    n1, n2, n1q, n2q, cbar, sbar = [handle.get() for handle in handles]
+    return compute_acc_batch_jit(
+        positions,
+        N,
+        mu,
+        a,
+        n1,
+        n2,
+        n1q,
+        n2q,
+        cbar,
+        sbar,
+        1,
+        gradient,
     )
-    positions_Nx3 = positions.reshape((-1, 3))
-    if len(positions_Nx3) == 1:
-        results = [compute_acc_partial(positions_Nx3[0])]
-    else:
-        cores = get_available_cores()
-        with mp.Pool(processes=cores) as pool:
-            results = pool.map(compute_acc_partial, positions_Nx3)
 
-    for i, result in enumerate(results):
-        acc_output = result[0]
-        pot_output = result[1]
 
-        acc[3 * i : 3 * (i + 1)] = acc_output
-        potential[i] = pot_output
-    return (acc, potential)
+def compute_acc_batch(
+    positions,
+    N,
+    mu,
+    a,
+    n1,
+    n2,
+    n1q,
+    n2q,
+    cbar,
+    sbar,
+    N_chunks=1,
+    gradient=False,
+):
+    """Batch Pines kernel over an (N, 3) array of positions.
+
+    The points are split into `N_chunks` contiguous chunks (typically one per
+    thread) and each chunk allocates its aBar / rE / iM / rhol scratch buffers
+    once, reusing them for every point in the chunk. All tables are packed
+    lower-triangular arrays. The gradient of the acceleration is only computed
+    (and the returned [N x 3 x 3] array only populated) if `gradient`. The
+    outputs share the dtype of the positions."""
+    N_total = len(positions)
+    dtype = positions.dtype
+    acc = np.zeros((N_total, 3), dtype=dtype)
+    potential = np.zeros((N_total,), dtype=dtype)
+    hessian = np.zeros((N_total if gradient else 0, 3, 3), dtype=dtype)
+
+    N_chunks = max(min(N_chunks, N_total), 1)
+    chunk_size = (N_total + N_chunks - 1) // N_chunks
+    for chunk in prange(N_chunks):
+        rE = np.zeros((N + 2,))
+        iM = np.zeros((N + 2,))
+        rhol = np.zeros((N + 2,))
+        aBar = np.zeros(((N + 2) * (N + 3) // 2,))
+
+        start = chunk * chunk_size
+        end = min(start + chunk_size, N_total)
+        for i in range(start, end):
+            potential[i] = compute_acc_point(
+                positions[i],
+                N,
+                mu,
+                a,
+                n1,
+                n2,
+                n1q,
+                n2q,
+                cbar,
+                sbar,
+                aBar,
+                rE,
+                iM,
+                rhol,
+                acc[i],
+            )
+            if gradient:
+                # reuses the aBar / rE / iM tables of the point
+                compute_hessian_point(
+                    positions[i],
+                    N,
+                    mu,
+                    a,
+                    n1q,
+                    cbar,
+                    sbar,
+                    aBar,
+                    rE,
+                    iM,
+                    hessian[i],
+                )
+    return (acc, potential, hessian)
 
 
-@njit(cache=True, parallel=False)
 def compute_acc_thread(position, N, mu, a, n1, n2, n1q, n2q, cbar, sbar):
-    np.zeros(position.shape)
-    potential = 0.0
-    r = np.linalg.norm(position)
-    [s, t, u] = position / r
+    """Acceleration and potential of a single position (dense or packed tables)"""
+    n1, n2, n1q, n2q, cbar, sbar = as_packed(n1, n2, n1q, n2q, cbar, sbar)
+    acc, potential, _ = compute_acc_batch_jit(
+        np.reshape(position, (1, 3)),
+        N,
+        mu,
+        a,
+        n1,
+        n2,
+        n1q,
+        n2q,
+        cbar,
+        sbar,
+    )
+    return (acc[0], potential[0])
 
-    rE = np.zeros((N + 2,))
-    iM = np.zeros((N + 2,))
 
-    rhol = np.zeros((N + 2,))
+@njit(cache=True, parallel=False)
+def compute_acc_point(
+    position,
+    N,
+    mu,
+    a,
+    n1,
+    n2,
+    n1q,
+    n2q,
+    cbar,
+    sbar,
+    aBar,
+    rE,
+    iM,
+    rhol,
+    acc,
+):
+    """Evaluate the Pines recursion for a single position using caller-provided
+    scratch buffers. Every entry of the buffers that is read is first written, so
+    they can be reused across points without being reset. The acceleration is
+    written into `acc` and the potential is returned."""
+    potential = 0.0
+    r = np.sqrt(position[0] ** 2 + position[1] ** 2 + position[2] ** 2)
+    s = position[0] / r
+    t = position[1] / r
+    u = position[2] / r
 
-    aBar = np.zeros((N + 2, N + 2))
-    aBar[0, 0] = 1.0
+    aBar[0] = 1.0
 
     rho = a / r
     rhol[0] = mu / r
     rhol[1] = rhol[0] * rho
 
+    # aBar[l][m] is stored at l * (l + 1) / 2 + m, such that aBar[l - 1][m] and
+    # aBar[l - 2][m] lie l and 2l - 1 entries before it
     for l in range(1, N + 2):  # noqa: E741
-        aBar[l][l] = (
+        i = l * (l + 1) // 2
+        aBar[i + l] = (
             np.sqrt(((2.0 * l + 1.0) * getK(l)) / ((2.0 * l * getK(l - 1))))
-            * aBar[l - 1][l - 1]
+            * aBar[i - 1]
         )
-        aBar[l][l - 1] = np.sqrt((2.0 * l) * getK(l - 1) / getK(l)) * aBar[l][l] * u
+        aBar[i + l - 1] = np.sqrt((2.0 * l) * getK(l - 1) / getK(l)) * aBar[i + l] * u
+        for m in range(0, l - 1):
+            aBar[i + m] = (
+                u * n1[i + m] * aBar[i + m - l] - n2[i + m] * aBar[i + m - 2 * l + 1]
+            )
 
     for m in range(0, N + 2):
-        for l in range(m + 2, N + 2):  # noqa: E741
-            aBar[l][m] = u * n1[l][m] * aBar[l - 1][m] - n2[l][m] * aBar[l - 2][m]
         rE[m] = 1.0 if m == 0 else s * rE[m - 1] - t * iM[m - 1]
         iM[m] = 0.0 if m == 0 else s * iM[m - 1] + t * rE[m - 1]
 
     a1, a2, a3, a4 = 0.0, 0.0, 0.0, 0.0
     for l in range(1, N + 1):  # noqa: E741
         rhol[l + 1] = rho * rhol[l]
+        i = l * (l + 1) // 2
+        j = i + l + 1  # aBar[l + 1][0]
         sum_a1, sum_a2, sum_a3, sum_a4 = 0.0, 0.0, 0.0, 0.0
         for m in range(0, l + 1):
-            D = cbar[l][m] * rE[m] + sbar[l][m] * iM[m]
-            E = 0.0 if m == 0 else cbar[l][m] * rE[m - 1] + sbar[l][m] * iM[m - 1]
-            F = 0.0 if m == 0 else sbar[l][m] * rE[m - 1] - cbar[l][m] * iM[m - 1]
+            D = cbar[i + m] * rE[m] + sbar[i + m] * iM[m]
+            E = 0.0 if m == 0 else cbar[i + m] * rE[m - 1] + sbar[i + m] * iM[m - 1]
+            F = 0.0 if m == 0 else sbar[i + m] * rE[m - 1] - cbar[i + m] * iM[m - 1]
 
-            sum_a1 += m * aBar[l][m] * E
-            sum_a2 += m * aBar[l][m] * F
+            sum_a1 += m * aBar[i + m] * E
+            sum_a2 += m * aBar[i + m] * F
 
             if m < l:
-                sum_a3 += n1q[l][m] * aBar[l][m + 1] * D
-            sum_a4 += n2q[l][m] * aBar[l + 1][m + 1] * D
+                sum_a3 += n1q[i + m] * aBar[i + m + 1] * D
+            sum_a4 += n2q[i + m] * aBar[j + m + 1] * D
 
-            potential += rhol[l] * aBar[l][m] * D
+            potential += rhol[l] * aBar[i + m] * D
         a1 += rhol[l + 1] / a * sum_a1
         a2 += rhol[l + 1] / a * sum_a2
         a3 += rhol[l + 1] / a * sum_a3
@@ -212,7 +453,11 @@ def compute_acc_thread(position, N, mu, a, n1, n2, n1q, n2q, cbar, sbar):
     a4 -= rhol[1] / a
 
     # The prior loop doesn't account for the l=0 index
-    potential += rhol[0] * aBar[0][0] * (cbar[0][0] * rE[0] + sbar[0][0] * iM[0])
+    potential += rhol[0] * aBar[0] * (cbar[0] * rE[0] + sbar[0] * iM[0])
+
+    acc[0] = a1 + s * a4
+    acc[1] = a2 + t * a4
+    acc[2] = a3 + u * a4
 
     # Note that the original paper computes U and F=dU (as opposed to U and F=-dU)
     # Consequently, F in the paper is actually equal to -a, but all of my calculations
@@ -220,13 +465,106 @@ def compute_acc_thread(position, N, mu, a, n1, n2, n1q, n2q, cbar, sbar):
     # generated by -1, we multiply the potential by -1 because it is used in
     # significantly fewer places and then reconciles the relationship with the
     # produced acceleration.
-    return (np.array([a1, a2, a3]) + np.array([s, t, u]) * a4, -potential)
+    return -potential
+
+
+@njit(cache=True, parallel=False)
+def compute_hessian_point(position, N, mu, a, n1q, cbar, sbar, aBar, rE, iM, hess):
+    """Gradient of the acceleration (Hessian of the potential) at a single
+    position, written into `hess`. The aBar, rE, and iM tables must already hold
+    the values of this position (see `compute_acc_point`).
+
+    The potential is a function f(r, s, t, u) of the radius and direction cosines
+    q = (s, t, u) = x / r, whose partials follow from the Pines recursion:
+    dA_lm/du = n1q_lm A_l,m+1 and d(rE_m, iM_m)/d(s, t) = m (rE_m-1, iM_m-1). By
+    the chain rule (with P = I - q q^T and g, G the gradient and Hessian of f
+    with respect to q)
+
+        H = f_rr q q^T + (q (P g_r)^T + (P g_r) q^T) / r + f_r P / r
+            + (P G P - (q . g) P - q (P g)^T - (P g) q^T) / r^2
+
+    As for the acceleration, the degree 0 term is that of a point mass. The
+    tensor is assembled in float64 regardless of the dtype of the tables."""
+    x = position.astype(np.float64)
+    r = np.sqrt(x[0] ** 2 + x[1] ** 2 + x[2] ** 2)
+    q = x / r
+    rho = a / r
+
+    # degree 0 term
+    rhol = mu / r
+    f_r = -rhol / r
+    f_rr = 2.0 * rhol / r**2
+    g = np.zeros(3)
+    g_r = np.zeros(3)
+    G = np.zeros((3, 3))
+
+    for l in range(1, N + 1):  # noqa: E741
+        rhol *= rho
+        i = l * (l + 1) // 2
+        f_l, gs, gt, gu = 0.0, 0.0, 0.0, 0.0
+        Gss, Gst, Gsu, Gtu, Guu = 0.0, 0.0, 0.0, 0.0, 0.0
+        for m in range(0, l + 1):
+            C = cbar[i + m]
+            S = sbar[i + m]
+            A = aBar[i + m]
+            D = C * rE[m] + S * iM[m]
+            f_l += A * D
+
+            dA = 0.0
+            if m < l:
+                dA = n1q[i + m] * aBar[i + m + 1]
+                gu += dA * D
+                if m < l - 1:
+                    Guu += n1q[i + m] * n1q[i + m + 1] * aBar[i + m + 2] * D
+            if m >= 1:
+                E = C * rE[m - 1] + S * iM[m - 1]
+                F = S * rE[m - 1] - C * iM[m - 1]
+                gs += m * A * E
+                gt += m * A * F
+                Gsu += m * dA * E
+                Gtu += m * dA * F
+            if m >= 2:
+                E2 = C * rE[m - 2] + S * iM[m - 2]
+                F2 = S * rE[m - 2] - C * iM[m - 2]
+                Gss += m * (m - 1) * A * E2
+                Gst += m * (m - 1) * A * F2
+
+        w_r = -(l + 1.0) * rhol / r
+        f_r += w_r * f_l
+        f_rr += (l + 1.0) * (l + 2.0) * rhol / r**2 * f_l
+        g[0] += rhol * gs
+        g[1] += rhol * gt
+        g[2] += rhol * gu
+        g_r[0] += w_r * gs
+        g_r[1] += w_r * gt
+        g_r[2] += w_r * gu
+        G[0, 0] += rhol * Gss
+        G[0, 1] += rhol * Gst
+        G[0, 2] += rhol * Gsu
+        G[1, 2] += rhol * Gtu
+        G[2, 2] += rhol * Guu
+    G[1, 1] = -G[0, 0]
+    G[1, 0] = G[0, 1]
+    G[2, 0] = G[0, 2]
+    G[2, 1] = G[1, 2]
+
+    P = np.eye(3) - np.outer(q, q)
+    Pg = P @ g
+    Pg_r = P @ g_r
+    PGP = P @ G @ P
+    q_g = np.dot(q, g)
+    for j in range(3):
+        for k in range(3):
+            hess[j, k] = (
+                f_rr * q[j] * q[k]
+                + (q[j] * Pg_r[k] + Pg_r[j] * q[k]) / r
+                + f_r * P[j, k] / r
+                + (PGP[j, k] - q_g * P[j, k] - q[j] * Pg[k] - Pg[j] * q[k]) / r**2
+            )
 
 
 getK = njit(getK, cache=True)
 compute_n_matrices = njit(compute_n_matrices, cache=True)
-# compute_acc_jit = njit(compute_acc, parallel=False, cache=True)
-# compute_acc_parallel = njit(compute_acc, parallel=True, cache=True)
-# compute_acc_thread = njit(compute_acc_thread, cache=True)
-
-# compute_acc_jit = compute_acc
+compute_n_packed = njit(compute_n_packed, cache=True)
+compute_acc_batch_jit = njit(compute_acc_batch, parallel=False, cache=True)
+compute_acc_batch_parallel = njit(compute_acc_batch, parallel=True, cache=True)
@@ -22,7 +22,7 @@ def get_pm_data(trajectory, gravity_file, **kwargs):
 
 
 class PointMass(GravityModelBase):
-    def __init__(self, celestial_body, trajectory=None):
+    def __init__(self, celestial_body, trajectory=None, dtype=np.float64):
         """Gravity model that only produces accelerations and potentials
         as if there were only a point mass.
 
@@ -30,8 +30,10 @@ class PointMass(GravityModelBase):
             celestial_body (CelestialBody): body used to generate gravity measurements
             trajectory (TrajectoryBase, optional): trajectory for which gravity
             measurements must be produced. Defaults to None.
+            dtype (np.dtype, optional): precision of the values, see
+            `GravityModelBase`. Defaults to np.float64.
         """
-        super().__init__(celestial_body, trajectory=trajectory)
+        super().__init__(celestial_body, trajectory=trajectory, dtype=dtype)
         self.celestial_body = celestial_body
         self.mu = celestial_body.mu
         self.configure(trajectory)
@@ -48,10 +50,9 @@ class PointMass(GravityModelBase):
         if positions is None:
             positions = self.trajectory.positions
 
-        self.accelerations = np.zeros(positions.shape)
-        for i in range(len(self.accelerations)):
-            self.accelerations[i] = self.compute_acceleration_value(positions[i])
-
+        positions = np.reshape(positions, (-1, 3)).astype(self.dtype, copy=False)
+        r = np.linalg.norm(positions, axis=1, keepdims=True)
+        self.accelerations = -self.mu * positions / r**3
         return self.accelerations
 
     def compute_potential(self, positions=None):
@@ -59,12 +60,21 @@ class PointMass(GravityModelBase):
         if positions is None:
             positions = self.trajectory.positions
 
-        self.potentials = np.zeros(len(positions))
-        for i in range(len(self.potentials)):
-            self.potentials[i] = self.compute_potential_value(positions[i])
-
+        positions = np.reshape(positions, (-1, 3)).astype(self.dtype, copy=False)
+        self.potentials = -self.mu / np.linalg.norm(positions, axis=1)
         return self.potentials
 
+    def compute_dU_dxdx(self, positions=None):
+        """Compute the [N x 3 x 3] gradient of the acceleration for an existing
+        trajectory or provided set of positions"""
+        if positions is None:
+            positions = self.trajectory.positions
+
+        positions = np.reshape(positions, (-1, 3)).astype(self.dtype, copy=False)
+        r = np.linalg.norm(positions, axis=1)[:, None, None]
+        outer = positions[:, :, None] * positions[:, None, :]
+        return self.mu * (3.0 * outer - r**2 * np.eye(3)) / r**5
+
     def compute_acceleration_value(self, position):
         # remember that a = -dU/dx
         # U = -mu/r
@@ -1,16 +1,22 @@
 import copy
-import multiprocessing as mp
 import os
+from functools import partial
 
 import matplotlib.pyplot as plt
 import numpy as np
-import trimesh
-from numba import njit  # , range
+from numba import njit, prange
 
 from GravNN.CelestialBodies.Asteroids import Eros
 from GravNN.GravityModels.GravityModelBase import GravityModelBase
 from GravNN.GravityModels.PointMass import PointMass
+from GravNN.GravityModels.PolyhedralSurrogate import (
+    InterpolationGrid,
+    build_interpolation_grid,
+)
+from GravNN.GravityModels.PolyhedralTree import FacetTree
 from GravNN.Support.PathTransformations import make_windows_path_posix
+from GravNN.Support.ShapeModelCache import ShapeModel, cached_arrays
+from GravNN.Support.WorkerPool import split_positions
 
 
 def get_poly_data(trajectory, obj_mesh_file, **kwargs):
@@ -194,17 +200,250 @@ def edge_acc_loop(point_scaled, vertices, edges_unique, edge_dyads):
     return acc, pot
 
 
+def compute_poly_batch(
+    positions,
+    face_vertices,
+    facet_dyads,
+    edge_vertices,
+    edge_midpoints,
+    edge_lengths,
+    edge_dyads,
+    density,
+    scaleFactor,
+    gradient=False,
+    point_tile=64,
+    element_tile=1024,
+):
+    """Evaluate the acceleration and potential of the polyhedron at each of the
+    (N, 3) positions [m] in a single sweep over (points x facets) and
+    (points x edges). If `gradient`, the [N x 3 x 3] gradient of the
+    acceleration, G * density * (sum_e L_e E_e - sum_f w_f F_f), is accumulated
+    in the same sweep (otherwise the returned gradients are empty).
+
+    The per facet / edge terms are evaluated in the dtype of the positions (and
+    geometry), as are the outputs, while their sums are accumulated in float64.
+
+    The geometry is expected in structure-of-arrays layout (see `Mesh`):
+    face_vertices (3 vertices, 3 components, F), edge_vertices (2, 3, E),
+    edge_midpoints (3, E), edge_lengths (E,), and the dyads flattened
+    row-major into (9, F) / (9, E). Points are processed in tiles of
+    `point_tile` and the facets / edges in tiles of `element_tile` so the
+    geometry of one tile stays in cache while it is reused by every point of
+    the point tile. Point tiles are distributed across threads."""
+    G = 6.67430 * 10**-11  # m^3/(kg s^2)
+
+    N = len(positions)
+    F = facet_dyads.shape[1]
+    E = edge_dyads.shape[1]
+    accelerations = np.zeros((N, 3), dtype=positions.dtype)
+    potentials = np.zeros((N,), dtype=positions.dtype)
+    gradients = np.zeros((N if gradient else 0, 3, 3), dtype=positions.dtype)
+
+    N_point_tiles = (N + point_tile - 1) // point_tile
+    for tile in prange(N_point_tiles):
+        p_start = tile * point_tile
+        p_end = min(p_start + point_tile, N)
+        acc = np.zeros((p_end - p_start, 3))
+        # scaled point in the dtype of the geometry, such that the per element
+        # arithmetic isn't promoted to float64
+        point = np.zeros((3,), dtype=positions.dtype)
+        pot = np.zeros((p_end - p_start,))
+        grad = np.zeros((p_end - p_start if gradient else 0, 9))
+
+        for f_start in range(0, F, element_tile):
+            f_end = min(f_start + element_tile, F)
+            for p in range(p_start, p_end):
+                point[0] = positions[p, 0] / scaleFactor
+                point[1] = positions[p, 1] / scaleFactor
+                point[2] = positions[p, 2] / scaleFactor
+                x, y, z = point[0], point[1], point[2]
+                ax, ay, az, u = 0.0, 0.0, 0.0, 0.0
+                for f in range(f_start, f_end):
+                    r0x = face_vertices[0, 0, f] - x
+                    r0y = face_vertices[0, 1, f] - y
+                    r0z = face_vertices[0, 2, f] - z
+                    r1x = face_vertices[1, 0, f] - x
+                    r1y = face_vertices[1, 1, f] - y
+                    r1z = face_vertices[1, 2, f] - z
+                    r2x = face_vertices[2, 0, f] - x
+                    r2y = face_vertices[2, 1, f] - y
+                    r2z = face_vertices[2, 2, f] - z
+
+                    R0 = np.sqrt(r0x * r0x + r0y * r0y + r0z * r0z)
+                    R1 = np.sqrt(r1x * r1x + r1y * r1y + r1z * r1z)
+                    R2 = np.sqrt(r2x * r2x + r2y * r2y + r2z * r2z)
+
+                    # r0m . (r1m x r2m)
+                    triple = (
+                        r0x * (r1y * r2z - r1z * r2y)
+                        + r0y * (r1z * r2x - r1x * r2z)
+                        + r0z * (r1x * r2y - r1y * r2x)
+                    )
+                    denom = (
+                        R0 * R1 * R2
+                        + R0 * (r1x * r2x + r1y * r2y + r1z * r2z)
+                        + R1 * (r0x * r2x + r0y * r2y + r0z * r2z)
+                        + R2 * (r0x * r1x + r0y * r1y + r0z * r1z)
+                    )
+                    # half the solid angle, the factor 2 is applied to the sums
+                    wf = np.arctan2(triple, denom)
+
+                    # F . r_f where r_f = r0 - point
+                    Fr_x = (
+                        facet_dyads[0, f] * r0x
+                        + facet_dyads[1, f] * r0y
+                        + facet_dyads[2, f] * r0z
+                    )
+                    Fr_y = (
+                        facet_dyads[3, f] * r0x
+                        + facet_dyads[4, f] * r0y
+                        + facet_dyads[5, f] * r0z
+                    )
+                    Fr_z = (
+                        facet_dyads[6, f] * r0x
+                        + facet_dyads[7, f] * r0y
+                        + facet_dyads[8, f] * r0z
+                    )
+                    ax += wf * Fr_x
+                    ay += wf * Fr_y
+                    az += wf * Fr_z
+                    u -= wf * (r0x * Fr_x + r0y * Fr_y + r0z * Fr_z)
+                    if gradient:
+                        for k in range(9):
+                            grad[p - p_start, k] -= 2.0 * wf * facet_dyads[k, f]
+                acc[p - p_start, 0] += 2.0 * ax
+                acc[p - p_start, 1] += 2.0 * ay
+                acc[p - p_start, 2] += 2.0 * az
+                pot[p - p_start] += 2.0 * u
+
+        for e_start in range(0, E, element_tile):
+            e_end = min(e_start + element_tile, E)
+            for p in range(p_start, p_end):
+                point[0] = positions[p, 0] / scaleFactor
+                point[1] = positions[p, 1] / scaleFactor
+                point[2] = positions[p, 2] / scaleFactor
+                x, y, z = point[0], point[1], point[2]
+                ax, ay, az, u = 0.0, 0.0, 0.0, 0.0
+                for e in range(e_start, e_end):
+                    r0x = edge_vertices[0, 0, e] - x
+                    r0y = edge_vertices[0, 1, e] - y
+                    r0z = edge_vertices[0, 2, e] - z
+                    r1x = edge_vertices[1, 0, e] - x
+                    r1y = edge_vertices[1, 1, e] - y
+                    r1z = edge_vertices[1, 2, e] - z
+
+                    R0 = np.sqrt(r0x * r0x + r0y * r0y + r0z * r0z)
+                    R1 = np.sqrt(r1x * r1x + r1y * r1y + r1z * r1z)
+                    Re = edge_lengths[e]
+                    Le = np.log((R0 + R1 + Re) / (R0 + R1 - Re))
+
+                    # Page 12 implies that r_e can be any point on edge e or its
+                    # infinite extension
+                    rex = edge_midpoints[0, e] - x
+                    rey = edge_midpoints[1, e] - y
+                    rez = edge_midpoints[2, e] - z
+
+                    Er_x = (
+                        edge_dyads[0, e] * rex
+                        + edge_dyads[1, e] * rey
+                        + edge_dyads[2, e] * rez
+                    )
+                    Er_y = (
+                        edge_dyads[3, e] * rex
+                        + edge_dyads[4, e] * rey
+                        + edge_dyads[5, e] * rez
+                    )
+                    Er_z = (
+                        edge_dyads[6, e] * rex
+                        + edge_dyads[7, e] * rey
+                        + edge_dyads[8, e] * rez
+                    )
+                    ax -= Le * Er_x
+                    ay -= Le * Er_y
+                    az -= Le * Er_z
+                    u += Le * (rex * Er_x + rey * Er_y + rez * Er_z)
+                    if gradient:
+                        for k in range(9):
+                            grad[p - p_start, k] += Le * edge_dyads[k, e]
+                acc[p - p_start, 0] += ax
+                acc[p - p_start, 1] += ay
+                acc[p - p_start, 2] += az
+                pot[p - p_start] += u
+
+        for p in range(p_start, p_end):
+            for k in range(3):
+                accelerations[p, k] = acc[p - p_start, k] * G * density * scaleFactor
+            # [km^2/s^2] - > [m^2/s^2]
+            # the paper gives delta U, not a.
+            # Given that a is already standard, we are going to negate U
+            potentials[p] = -pot[p - p_start] * 0.5 * G * density * scaleFactor**2
+            if gradient:
+                # [1/s^2], independent of the scale of the mesh
+                for k in range(9):
+                    gradients[p, k // 3, k % 3] = grad[p - p_start, k] * G * density
+    return accelerations, potentials, gradients
+
+
+def compute_poly_batch_shared(positions, handles, density, scaleFactor, gradient=False):
+    """Worker side of `Polyhedral.compute_values_pool`. The geometry and dyads are
+    read from shared memory rather than being pickled with each task."""
+    arrays = [handle.get() for handle in handles]
+    return compute_poly_batch_jit(positions, *arrays, density, scaleFactor, gradient)
+
+
+compute_poly_batch_jit = njit(compute_poly_batch, cache=True, parallel=False)
+compute_poly_batch_parallel = njit(compute_poly_batch, cache=True, parallel=True)
+
+
 class Mesh:
     def __init__(self, trimesh):
+        """Minimal copy of the mesh arrays used by the polyhedral model
+
+        Args:
+            trimesh (trimesh.Trimesh or ShapeModel): source geometry
+        """
         self.vertices = copy.deepcopy(np.array(trimesh.vertices))
         self.faces = copy.deepcopy(np.array(trimesh.faces, dtype=np.int32))
         self.edges_unique = copy.deepcopy(
             np.array(trimesh.edges_unique, dtype=np.int32),
         )
+        self.compute_soa_geometry()
+
+    def compute_soa_geometry(self):
+        """Per-face vertex triples and per-edge endpoints / midpoints / lengths
+        in structure-of-arrays layout for the batch kernel"""
+        self.face_vertices = np.ascontiguousarray(
+            self.vertices[self.faces].transpose((1, 2, 0)),
+        )  # (3 vertices, 3 components, F)
+        self.edge_vertices = np.ascontiguousarray(
+            self.vertices[self.edges_unique].transpose((1, 2, 0)),
+        )  # (2 vertices, 3 components, E)
+        self.edge_midpoints = np.ascontiguousarray(
+            (self.edge_vertices[0] + self.edge_vertices[1]) / 2.0,
+        )  # (3, E)
+        self.edge_lengths = np.linalg.norm(
+            self.edge_vertices[1] - self.edge_vertices[0],
+            axis=0,
+        )  # (E,)
+
+    def astype(self, dtype):
+        """Store the structure-of-arrays geometry of the batch kernel in dtype"""
+        self.face_vertices = self.face_vertices.astype(dtype, copy=False)
+        self.edge_vertices = self.edge_vertices.astype(dtype, copy=False)
+        self.edge_midpoints = self.edge_midpoints.astype(dtype, copy=False)
+        self.edge_lengths = self.edge_lengths.astype(dtype, copy=False)
 
 
 class Polyhedral(GravityModelBase):
-    def __init__(self, celestial_body, obj_file, trajectory=None):
+    def __init__(
+        self,
+        celestial_body,
+        obj_file,
+        trajectory=None,
+        pool=None,
+        tolerance=None,
+        dtype=np.float64,
+    ):
         """Polyhedral gravity model based on work from Werner and Scheeres
         (https://link.springer.com/article/10.1007/BF00053511)
         The model computes the accelerations from a constant density polyhedral shape
@@ -215,21 +454,60 @@ class Polyhedral(GravityModelBase):
             obj_file (str): path to shape model of the body
             trajectory (TrajectoryBase, optional): Trajectory / distribution for which
                 the gravity measurements should be computed. Defaults to None.
+            pool (WorkerPool, optional): Persistent worker pool across which the
+                positions are distributed. Defaults to None (threaded batch kernel).
+            tolerance (float, optional): Approximate relative accuracy of the far
+                field. If provided, distant clusters of facets are replaced by their
+                multipole expansion (see `FacetTree`) and only nearby facets are
+                evaluated exactly. Defaults to None (exact evaluation).
+            dtype (np.dtype, optional): precision of the geometry and values of the
+                batch kernel, see `GravityModelBase`. The facet tree is evaluated
+                in float64. Defaults to np.float64.
         """
-        super().__init__(celestial_body, obj_file, trajectory=trajectory)
+        super().__init__(
+            celestial_body,
+            obj_file,
+            trajectory=trajectory,
+            pool=pool,
+            dtype=dtype,
+        )
         self.obj_file = obj_file
+        self.tolerance = tolerance
+        self.surrogate_tag = None
 
         self.configure(trajectory)
 
         self.planet = celestial_body
         obj_file = make_windows_path_posix(obj_file)
-        filename, file_extension = os.path.splitext(obj_file)
-        self.mesh = trimesh.load_mesh(obj_file, file_type=file_extension[1:])
+        self.mesh = ShapeModel(obj_file)
         self.scaleFactor = 1e3  # Assume that the mesh is given in km
         self.density = self.compute_density()
 
-        self.facet_dyads = compute_facet_dyads(self.mesh.face_normals)
-        self.edge_dyads = compute_edge_dyads(
+        dyads = cached_arrays(obj_file, "dyads", lambda: self.compute_dyads())
+        self.facet_dyads = dyads["facet_dyads"]
+        self.edge_dyads = dyads["edge_dyads"]
+        self.reduce_mesh_memory()
+        self.mesh.astype(self.dtype)
+
+        # dyads flattened row-major into (9, F) / (9, E) for the batch kernel
+        self.facet_dyads_soa = np.ascontiguousarray(
+            self.facet_dyads.reshape((-1, 9)).T,
+            dtype=self.dtype,
+        )
+        self.edge_dyads_soa = np.ascontiguousarray(
+            self.edge_dyads.reshape((-1, 9)).T,
+            dtype=self.dtype,
+        )
+
+        self.tree = None
+        if tolerance is not None:
+            self.tree = FacetTree(self.mesh.vertices, self.mesh.faces, tolerance)
+
+        self.surrogate = None
+
+    def compute_dyads(self):
+        facet_dyads = compute_facet_dyads(self.mesh.face_normals)
+        edge_dyads = compute_edge_dyads(
             self.mesh.vertices,
             self.mesh.faces,
             self.mesh.edges_unique,
@@ -237,17 +515,7 @@ class Polyhedral(GravityModelBase):
             self.mesh.face_normals,
             self.mesh.face_adjacency,
         )
-        self.reduce_mesh_memory()
-        self.get_available_cores()
-
-    def get_available_cores(self):
-        try:
-            int(os.environ["SLURM_JOB_NUM_NODES"])
-            cores_per_nodes = int(os.environ["SLURM_JOB_CPUS_PER_NODE"].split("(")[0])
-            processes = cores_per_nodes
-        except Exception:
-            processes = mp.cpu_count()
-        self.processes = processes
+        return {"facet_dyads": facet_dyads, "edge_dyads": edge_dyads}
 
     def reduce_mesh_memory(self):
         smaller_mesh = Mesh(self.mesh)
@@ -258,8 +526,14 @@ class Polyhedral(GravityModelBase):
             os.path.splitext(os.path.basename(__file__))[0]
             + "_"
             + os.path.basename(self.obj_file).split(".")[0]
-            + "/"
         )
+        if self.tolerance is not None:
+            # approximate far field values must not be mistaken for exact ones
+            self.file_directory += "_tol" + str(self.tolerance)
+        if self.surrogate_tag is not None:
+            # nor interpolated values
+            self.file_directory += "_" + self.surrogate_tag
+        self.file_directory += "/"
         pass
 
     def compute_density(self):
@@ -330,78 +604,167 @@ class Polyhedral(GravityModelBase):
         plt.show()
 
     # Bulk function
-    def compute_acceleration(self, positions=None, pbar=True):
-        "Compute the acceleration for an existing trajectory or provided positions"
+    def compute_all(self, positions=None, gradient=False):
+        """Compute the acceleration and potential (both produced by the same
+        facet / edge sweep) for an existing trajectory or provided positions.
+
+        The gravity gradient tensor is accumulated by the exact kernel in the
+        same sweep, so the surrogate and facet tree are bypassed if `gradient`."""
         if positions is None:
             positions = self.trajectory.positions
 
-        # bar = ProgressBar(positions.shape[0], enable=pbar)
-        self.accelerations = np.zeros(positions.shape)
-        self.potentials = np.zeros(len(positions))
+        if gradient:
+            positions = np.ascontiguousarray(positions, dtype=np.float64)
+            values = self.compute_values_exact(positions.reshape((-1, 3)), True)
+            self.accelerations, self.potentials = values[:2]
+            return values
 
-        if len(positions) == 1:
-            results = map(self.compute_values, positions)
-        else:
-            with mp.Pool(processes=self.processes) as pool:
-                results = pool.map(self.compute_values, positions)
+        self.accelerations, self.potentials = self.compute_values_batch(positions)
+        return self.accelerations, self.potentials
 
-        for i, result in enumerate(results):
-            self.accelerations[i] = result[0]
-            self.potentials[i] = result[1]
+    def compute_dU_dxdx(self, positions=None):
+        "Compute the [N x 3 x 3] gradient of the acceleration"
+        return self.compute_all(positions, gradient=True)[2]
 
+    def compute_acceleration(self, positions=None, pbar=True):
+        "Compute the acceleration for an existing trajectory or provided positions"
+        self.compute_all(positions)
         return self.accelerations
 
     def compute_potential(self, positions=None):
         "Compute the potential for an existing trajectory or provided positions"
-        if positions is None:
-            positions = self.trajectory.positions
-
-        self.accelerations = np.zeros(positions.shape)
-        self.potentials = np.zeros(len(positions))
-
-        if len(positions) == 1:
-            results = map(self.compute_values, positions)
-        else:
-            with mp.Pool(processes=self.processes) as pool:
-                results = pool.map(self.compute_values, positions)
-
-        for i, result in enumerate(results):
-            self.accelerations[i] = result[0]
-            self.potentials[i] = result[1]
-
+        self.compute_all(positions)
         return self.potentials
 
-    def compute_values(self, position):
-        G = 6.67430 * 10**-11  # m^3/(kg s^2)
+    def batch_arrays(self):
+        return (
+            self.mesh.face_vertices,
+            self.facet_dyads_soa,
+            self.mesh.edge_vertices,
+            self.mesh.edge_midpoints,
+            self.mesh.edge_lengths,
+            self.edge_dyads_soa,
+        )
 
-        point_scaled = position / self.scaleFactor
-        acc = np.zeros((3,))
-        pot = 0.0
+    def build_surrogate(self, r_max, r_min=None, error_bound=1e-6):
+        """Tabulate the model on an interpolation grid covering the shell
+        r_min <= |x| <= r_max. Subsequent evaluations within the shell are
+        interpolated from the grid, while all other positions fall back to the
+        exact kernel. Grids are cached on disk alongside the mesh geometry, and
+        the values of the model are saved in a directory specific to the grid.
 
-        acc_facet, pot_facet = facet_acc_loop(
-            point_scaled,
-            self.mesh.vertices,
-            self.mesh.faces,
-            self.facet_dyads,
+        Args:
+            r_max (float): outer radius of the shell [m]
+            r_min (float, optional): inner radius of the shell [m]. Defaults to
+                the radius of the Brillouin sphere.
+            error_bound (float, optional): maximum relative error of the
+                interpolated acceleration and potential. Defaults to 1e-6.
+        """
+        if r_min is None:
+            vertex_radii = np.linalg.norm(self.mesh.vertices, axis=1)
+            r_min = np.max(vertex_radii) * self.scaleFactor
+
+        # the values scale linearly with the density, so only the geometry
+        # (and far field approximation) determine the grid
+        def compute_fcn(positions):
+            accelerations, potentials = self.compute_values_batch(positions)
+            return accelerations / self.density, potentials / self.density
+
+        tag = f"surrogate_{r_min:.6e}_{r_max:.6e}_{error_bound:.1e}"
+        if self.tolerance is not None:
+            tag += "_tol" + str(self.tolerance)
+        if self.dtype != np.float64:
+            tag += "_" + self.dtype.name
+
+        self.surrogate = None
+        arrays = cached_arrays(
+            make_windows_path_posix(self.obj_file),
+            tag,
+            lambda: build_interpolation_grid(compute_fcn, r_min, r_max, error_bound),
         )
-        acc_edge, pot_edge = edge_acc_loop(
-            point_scaled,
-            self.mesh.vertices,
-            self.mesh.edges_unique,
-            self.edge_dyads,
+        self.surrogate = InterpolationGrid(**arrays)
+
+        # values computed from now on are saved separately from the exact ones
+        self.surrogate_tag = tag
+        self.configure(self.trajectory)
+        return self.surrogate
+
+    def compute_values_batch(self, positions):
+        """Evaluate all positions, interpolating those covered by the surrogate
+        grid (if one was built) and computing the remainder exactly"""
+        positions = np.ascontiguousarray(positions, dtype=np.float64).reshape((-1, 3))
+        if self.surrogate is None:
+            return self.compute_values_exact(positions)
+
+        mask = self.surrogate.contains(positions)
+        if np.all(mask):
+            accelerations, potentials = self.surrogate.compute(positions)
+            return accelerations * self.density, potentials * self.density
+
+        accelerations = np.zeros((len(positions), 3))
+        potentials = np.zeros((len(positions),))
+        if np.any(mask):
+            acc_grid, pot_grid = self.surrogate.compute(positions[mask])
+            accelerations[mask] = acc_grid * self.density
+            potentials[mask] = pot_grid * self.density
+        accelerations[~mask], potentials[~mask] = self.compute_values_exact(
+            positions[~mask],
         )
+        return accelerations, potentials
+
+    def compute_values_exact(self, positions, gradient=False):
+        """Evaluate all positions with the batch kernel, either threaded within
+        this process or distributed across the worker pool if one was given.
+        The gradients of the acceleration are returned third if `gradient`."""
+        positions = np.ascontiguousarray(positions, dtype=self.dtype)
+        if self.tree is not None and not gradient:
+            return self.tree.compute(positions, self.density, self.scaleFactor)
+
+        if self.pool is not None and len(positions) > 1:
+            values = self.compute_values_pool(positions, gradient)
+        else:
+            # Spawning threads isn't worth it for a single point (e.g. within
+            # solve_ivp)
+            if len(positions) == 1:
+                compute_fcn = compute_poly_batch_jit
+            else:
+                compute_fcn = compute_poly_batch_parallel
+            values = compute_fcn(
+                positions,
+                *self.batch_arrays(),
+                self.density,
+                self.scaleFactor,
+                gradient,
+            )
+        return values if gradient else values[:2]
+
+    def compute_values_pool(self, positions, gradient=False):
+        """Distribute chunks of positions across the worker pool. The geometry
+        and dyads are shared with the workers once rather than per call."""
+        pool = self.pool
+        handles = [pool.share(array) for array in self.batch_arrays()]
+        compute_chunk = partial(
+            compute_poly_batch_shared,
+            handles=handles,
+            density=self.density,
+            scaleFactor=self.scaleFactor,
+            gradient=gradient,
+        )
+        results = pool.map(compute_chunk, split_positions(positions, pool.processes))
 
-        acc = acc_facet + acc_edge  # signs taken care of in loop
-        acc *= G * self.density * self.scaleFactor
-
-        pot = pot_edge + pot_facet  # signs taken care of in loop
-        pot *= (
-            1.0 / 2.0 * G * self.density * self.scaleFactor**2
-        )  # [km^2/s^2] - > [m^2/s^2]
+        accelerations = np.concatenate([result[0] for result in results])
+        potentials = np.concatenate([result[1] for result in results])
+        gradients = np.concatenate([result[2] for result in results])
+        return accelerations, potentials, gradients
 
-        # the paper gives delta U, not a.
-        # Given that a is already standard, we are going to negate U
-        return acc, -pot
+    def compute_values(self, position):
+        accelerations, potentials, _ = compute_poly_batch_jit(
+            np.reshape(position, (1, 3)).astype(self.dtype),
+            *self.batch_arrays(),
+            self.density,
+            self.scaleFactor,
+        )
+        return accelerations[0], potentials[0]
 
 
 def main():
@@ -0,0 +1,206 @@
+import numpy as np
+from numba import njit, prange
+
+
+class InterpolationGrid:
+    def __init__(self, values, r_min, r_max, error):
+        """Tricubic lookup table of the acceleration and potential within a
+        spherical shell r_min <= |x| <= r_max.
+
+        The values are tabulated on a (r, colatitude, longitude) grid and
+        interpolated with 4x4x4 point Lagrange polynomials, such that a query
+        only touches 64 nodes regardless of the mesh resolution. Radial stencils
+        never leave the shell, so the grid remains accurate down to r_min as long
+        as the shell lies outside of the body. The angular axes are padded with
+        two ghost nodes on either side (continued across the poles and the 2*pi
+        seam) and r^2*a and r*U are tabulated to remove the dominant radial decay.
+
+        Args:
+            values (np.array): (N_r, N_theta + 4, N_phi + 4, 4) nodal values
+            r_min (float): inner radius of the shell [m]
+            r_max (float): outer radius of the shell [m]
+            error (float): maximum relative error measured when building the grid
+        """
+        self.values = np.ascontiguousarray(values)
+        self.r_min = float(r_min)
+        self.r_max = float(r_max)
+        self.error = float(error)
+
+    def contains(self, positions):
+        r = np.linalg.norm(positions, axis=1)
+        return (r >= self.r_min) & (r <= self.r_max)
+
+    def compute(self, positions):
+        """Interpolated acceleration and potential at (N, 3) positions that lie
+        within the shell"""
+        if len(positions) == 1:
+            compute_fcn = interpolate_grid_jit
+        else:
+            compute_fcn = interpolate_grid_parallel
+        values = compute_fcn(positions, self.values, self.r_min, self.r_max)
+        return values[:, 0:3], values[:, 3]
+
+
+def sample_shell(N, r_min, r_max, rng):
+    """Positions distributed uniformly within the volume of a spherical shell"""
+    x = rng.normal(size=(N, 3))
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    u = rng.uniform((r_min / r_max) ** 3, 1.0, size=(N, 1))
+    return x * r_max * u ** (1.0 / 3.0)
+
+
+def generate_grid_values(compute_fcn, r_min, r_max, N_r, N_theta):
+    N_phi = 2 * N_theta
+    r = np.linspace(r_min, r_max, N_r)
+    theta = (np.arange(N_theta) + 0.5) * np.pi / N_theta
+    phi = np.arange(N_phi) * 2.0 * np.pi / N_phi
+
+    R, T, P = np.meshgrid(r, theta, phi, indexing="ij")
+    positions = np.stack(
+        (R * np.sin(T) * np.cos(P), R * np.sin(T) * np.sin(P), R * np.cos(T)),
+        axis=-1,
+    ).reshape((-1, 3))
+    accelerations, potentials = compute_fcn(positions)
+
+    values = np.zeros((N_r * N_theta * N_phi, 4))
+    r_nodes = R.reshape((-1, 1))
+    values[:, 0:3] = accelerations * r_nodes**2
+    values[:, 3] = potentials * r_nodes[:, 0]
+    values = values.reshape((N_r, N_theta, N_phi, 4))
+
+    # ghost nodes: crossing a pole maps theta -> -theta and phi -> phi + pi
+    theta_idx = np.arange(-2, N_theta + 2)
+    across_pole = (theta_idx < 0) | (theta_idx >= N_theta)
+    theta_idx = np.where(theta_idx < 0, -theta_idx - 1, theta_idx)
+    theta_idx = np.where(theta_idx >= N_theta, 2 * N_theta - 1 - theta_idx, theta_idx)
+    phi_idx = np.arange(-2, N_phi + 2)[None, :] + across_pole[:, None] * N_phi // 2
+    phi_idx = phi_idx % N_phi
+    return values[:, theta_idx[:, None], phi_idx]
+
+
+def build_interpolation_grid(
+    compute_fcn,
+    r_min,
+    r_max,
+    error_bound,
+    N_r=16,
+    N_theta=32,
+    max_nodes=4e6,
+    N_validation=1000,
+    seed=0,
+):
+    """Tabulate `compute_fcn` on successively finer grids until the maximum
+    relative error of the interpolated acceleration and potential at random
+    points within the shell falls below `error_bound`.
+
+    Args:
+        compute_fcn (callable): maps (M, 3) positions to (acceleration, potential)
+        r_min (float): inner radius of the shell [m]
+        r_max (float): outer radius of the shell [m]
+        error_bound (float): maximum tolerated relative error
+        N_r (int, optional): initial number of radial nodes. Defaults to 16.
+        N_theta (int, optional): initial number of colatitude nodes (twice as
+            many longitude nodes are used). Defaults to 32.
+        max_nodes (int, optional): maximum size of the grid. Defaults to 4e6.
+        N_validation (int, optional): number of validation points. Defaults to 1000.
+        seed (int, optional): seed for the validation points. Defaults to 0.
+
+    Returns:
+        dict: arguments of `InterpolationGrid`
+    """
+    rng = np.random.default_rng(seed)
+    positions = sample_shell(N_validation, r_min, r_max, rng)
+    acc_true, pot_true = compute_fcn(positions)
+
+    while True:
+        values = generate_grid_values(compute_fcn, r_min, r_max, N_r, N_theta)
+        grid = InterpolationGrid(values, r_min, r_max, np.nan)
+        acc, pot = grid.compute(positions)
+
+        acc_error = np.linalg.norm(acc - acc_true, axis=1) / np.linalg.norm(
+            acc_true,
+            axis=1,
+        )
+        pot_error = np.abs(pot - pot_true) / np.abs(pot_true)
+        error = max(np.max(acc_error), np.max(pot_error))
+        print(
+            f"Interpolation grid {N_r}x{N_theta}x{2 * N_theta}: "
+            f"max relative error {error:.2e}",
+        )
+
+        # the interpolation error scales with the fourth power of the spacing
+        scale = 1.1 * (error / error_bound) ** 0.25
+        N_nodes = 2 * N_r * N_theta**2 * scale**3
+        if error <= error_bound or N_nodes > max_nodes:
+            break
+        N_r = int(np.ceil(N_r * scale))
+        N_theta = int(np.ceil(N_theta * scale))
+
+    if error > error_bound:
+        print(
+            f"Warning: refining the interpolation grid further would exceed "
+            f"{int(max_nodes)} nodes, the relative error remains {error:.2e}",
+        )
+
+    return {"values": values, "r_min": r_min, "r_max": r_max, "error": error}
+
+
+def lagrange_weights(s, N, weights):
+    """Index of the first node of the four point stencil enclosing the fractional
+    grid coordinate s (clamped to the N available nodes) and its cubic Lagrange
+    weights"""
+    i0 = min(max(int(np.floor(s)) - 1, 0), N - 4)
+    t = s - i0
+    weights[0] = -(t - 1.0) * (t - 2.0) * (t - 3.0) / 6.0
+    weights[1] = t * (t - 2.0) * (t - 3.0) / 2.0
+    weights[2] = -t * (t - 1.0) * (t - 3.0) / 2.0
+    weights[3] = t * (t - 1.0) * (t - 2.0) / 6.0
+    return i0
+
+
+def interpolate_grid(positions, values, r_min, r_max):
+    N_r = values.shape[0]
+    N_theta = values.shape[1] - 4
+    N_phi = values.shape[2] - 4
+    dr = (r_max - r_min) / (N_r - 1)
+    dtheta = np.pi / N_theta
+    dphi = 2.0 * np.pi / N_phi
+
+    N = len(positions)
+    results = np.zeros((N, 4))
+    for p in prange(N):
+        x = positions[p, 0]
+        y = positions[p, 1]
+        z = positions[p, 2]
+        r = np.sqrt(x * x + y * y + z * z)
+        theta = np.arccos(z / r)
+        phi = np.arctan2(y, x)
+        if phi < 0.0:
+            phi += 2.0 * np.pi
+
+        wr = np.zeros(4)
+        wt = np.zeros(4)
+        wp = np.zeros(4)
+        i0 = lagrange_weights_jit((r - r_min) / dr, N_r, wr)
+        j0 = lagrange_weights_jit(theta / dtheta + 1.5, N_theta + 4, wt)
+        k0 = lagrange_weights_jit(phi / dphi + 2.0, N_phi + 4, wp)
+
+        value = np.zeros(4)
+        for i in range(4):
+            for j in range(4):
+                w_ij = wr[i] * wt[j]
+                for k in range(4):
+                    w = w_ij * wp[k]
+                    for q in range(4):
+                        value[q] += w * values[i0 + i, j0 + j, k0 + k, q]
+
+        results[p, 0] = value[0] / r**2
+        results[p, 1] = value[1] / r**2
+        results[p, 2] = value[2] / r**2
+        results[p, 3] = value[3] / r
+    return results
+
+
+lagrange_weights_jit = njit(lagrange_weights, cache=True)
+interpolate_grid_jit = njit(interpolate_grid, parallel=False, cache=True)
+interpolate_grid_parallel = njit(interpolate_grid, parallel=True, cache=True)
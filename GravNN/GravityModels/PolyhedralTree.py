@@ -0,0 +1,336 @@
+import numpy as np
+from numba import njit, prange
+
+G = 6.67430 * 10**-11  # m^3/(kg s^2)
+
+
+def compute_facet_geometry(vertices, faces):
+    """Per-facet quantities needed to evaluate the facet single layer potential.
+
+    Returns the vertex triples (3, 3, F), unit normals (3, F), plane offsets
+    h = n . v0 (F,), outward in-plane edge normals (3 edges, 3, F), edge lengths
+    (3, F), areas (F,) and centroids (F, 3). Edge i runs from vertex i to i+1."""
+    v = vertices[faces]  # (F, 3 vertices, 3 components)
+    cross = np.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0])
+    cross_norm = np.linalg.norm(cross, axis=1)
+    normals = cross / cross_norm[:, None]
+    areas = 0.5 * cross_norm
+    centroids = v.mean(axis=1)
+    h = np.einsum("ij,ij->i", normals, v[:, 0])
+
+    edge_normals = np.zeros((3, 3, len(faces)))
+    edge_lengths = np.zeros((3, len(faces)))
+    for i in range(3):
+        edge = v[:, (i + 1) % 3] - v[:, i]
+        edge_lengths[i] = np.linalg.norm(edge, axis=1)
+        edge_normal = np.cross(edge, normals)
+        edge_normals[i] = (edge_normal / edge_lengths[i][:, None]).T
+
+    return (
+        np.ascontiguousarray(v.transpose((1, 2, 0))),
+        np.ascontiguousarray(normals.T),
+        h,
+        edge_normals,
+        edge_lengths,
+        areas,
+        centroids,
+    )
+
+
+class FacetTree:
+    def __init__(self, vertices, faces, tolerance, leaf_size=32):
+        """Hierarchical clustering of the polyhedron facets used to approximate
+        the far field of the polyhedral model.
+
+        The constant density polyhedron potential can be written as a sum of
+        facet single layer potentials phi_f(x) = int_f dS / |s - x|:
+
+            V(x) = G*rho/2 * (sum_f h_f phi_f(x) - x . sum_f n_f phi_f(x))
+            a(x) = -G*rho * sum_f n_f phi_f(x)
+
+        which is algebraically identical to the Werner-Scheeres facet and edge
+        sums (the edge terms are the facet-edge terms regrouped per edge).
+        The facets are recursively bisected into a k-d tree and each node stores
+        the monopole, dipole, and quadrupole moments of phi for the four weights
+        (h, n_x, n_y, n_z). Clusters that are well separated from the field point
+        (node radius < theta * distance) are evaluated through their expansion,
+        whereas nearby leaves are summed exactly facet by facet.
+
+        The truncation error of the quadrupole expansion scales with theta^3, so
+        the opening angle is chosen as theta = tolerance^(1/3).
+
+        Args:
+            vertices (np.array): (V, 3) mesh vertices
+            faces (np.array): (F, 3) mesh faces
+            tolerance (float): approximate relative accuracy of the far field
+            leaf_size (int, optional): maximum number of facets in a leaf.
+                Defaults to 32.
+        """
+        self.tolerance = tolerance
+        self.theta = tolerance ** (1.0 / 3.0)
+        self.leaf_size = leaf_size
+
+        (
+            face_vertices,
+            normals,
+            h,
+            edge_normals,
+            edge_lengths,
+            areas,
+            centroids,
+        ) = compute_facet_geometry(np.asarray(vertices), np.asarray(faces))
+
+        self.build(face_vertices, normals, h, areas, centroids)
+
+        # reorder the facets such that every node owns a contiguous range
+        order = self.order
+        self.face_vertices = np.ascontiguousarray(face_vertices[:, :, order])
+        self.normals = np.ascontiguousarray(normals[:, order])
+        self.h = np.ascontiguousarray(h[order])
+        self.edge_normals = np.ascontiguousarray(edge_normals[:, :, order])
+        self.edge_lengths = np.ascontiguousarray(edge_lengths[:, order])
+
+    def build(self, face_vertices, normals, h, areas, centroids):
+        F = len(areas)
+        weights = np.vstack((h, normals)).T  # (F, 4)
+
+        # second moment of each facet about its own centroid
+        offsets = face_vertices.transpose((2, 0, 1)) - centroids[:, None, :]
+        facet_Q = (
+            areas[:, None, None] / 12.0 * np.einsum("fvi,fvj->fij", *[offsets] * 2)
+        )
+
+        centers, radii, children, starts, ends = [], [], [], [], []
+        M0, D, Q = [], [], []
+        order = np.arange(F)
+
+        def add_node(idx, start):
+            node = len(centers)
+            w_A = weights[idx] * areas[idx, None]  # (n, 4)
+            center = np.sum(centroids[idx] * areas[idx, None], axis=0) / np.sum(
+                areas[idx],
+            )
+            d = centroids[idx] - center
+            vertices = face_vertices[:, :, idx].transpose((2, 0, 1)).reshape((-1, 3))
+            radius = np.max(np.linalg.norm(vertices - center, axis=1))
+
+            centers.append(center)
+            radii.append(radius)
+            children.append([-1, -1])
+            starts.append(start)
+            ends.append(start + len(idx))
+            M0.append(np.sum(w_A, axis=0))
+            D.append(np.einsum("fk,fi->ki", w_A, d))
+            Q.append(
+                np.einsum("fk,fij->kij", weights[idx], facet_Q[idx])
+                + np.einsum("fk,fi,fj->kij", w_A, d, d),
+            )
+
+            if len(idx) > self.leaf_size:
+                # bisect at the median along the longest extent of the centroids
+                extent = np.ptp(centroids[idx], axis=0)
+                axis = np.argmax(extent)
+                sorted_idx = idx[np.argsort(centroids[idx, axis], kind="stable")]
+                half = len(sorted_idx) // 2
+                order[start : start + len(idx)] = sorted_idx
+                left = add_node(sorted_idx[:half], start)
+                right = add_node(sorted_idx[half:], start + half)
+                children[node] = [left, right]
+            else:
+                order[start : start + len(idx)] = idx
+            return node
+
+        add_node(np.arange(F), 0)
+
+        self.order = order
+        self.node_center = np.array(centers)
+        self.node_radius = np.array(radii)
+        self.node_children = np.array(children, dtype=np.int64)
+        self.node_start = np.array(starts, dtype=np.int64)
+        self.node_end = np.array(ends, dtype=np.int64)
+        self.node_M0 = np.array(M0)
+        self.node_D = np.array(D)
+        self.node_Q = np.array(Q)
+
+    def compute(self, positions, density, scaleFactor):
+        """Approximate acceleration [m/s^2] and potential [m^2/s^2] at the
+        (N, 3) positions [m]"""
+        positions = np.ascontiguousarray(positions, dtype=np.float64).reshape((-1, 3))
+        return compute_tree_batch(
+            positions,
+            self.node_center,
+            self.node_radius,
+            self.node_children,
+            self.node_start,
+            self.node_end,
+            self.node_M0,
+            self.node_D,
+            self.node_Q,
+            self.face_vertices,
+            self.normals,
+            self.h,
+            self.edge_normals,
+            self.edge_lengths,
+            self.theta,
+            density,
+            scaleFactor,
+        )
+
+
+@njit(cache=True)
+def facet_single_layer(
+    x,
+    y,
+    z,
+    f,
+    face_vertices,
+    normals,
+    edge_normals,
+    edge_lengths,
+):
+    """Exact phi_f = int_f dS / |s - x| for facet f (Werner and Scheeres)"""
+    r0x = face_vertices[0, 0, f] - x
+    r0y = face_vertices[0, 1, f] - y
+    r0z = face_vertices[0, 2, f] - z
+    r1x = face_vertices[1, 0, f] - x
+    r1y = face_vertices[1, 1, f] - y
+    r1z = face_vertices[1, 2, f] - z
+    r2x = face_vertices[2, 0, f] - x
+    r2y = face_vertices[2, 1, f] - y
+    r2z = face_vertices[2, 2, f] - z
+    R0 = np.sqrt(r0x * r0x + r0y * r0y + r0z * r0z)
+    R1 = np.sqrt(r1x * r1x + r1y * r1y + r1z * r1z)
+    R2 = np.sqrt(r2x * r2x + r2y * r2y + r2z * r2z)
+
+    triple = (
+        r0x * (r1y * r2z - r1z * r2y)
+        + r0y * (r1z * r2x - r1x * r2z)
+        + r0z * (r1x * r2y - r1y * r2x)
+    )
+    denom = (
+        R0 * R1 * R2
+        + R0 * (r1x * r2x + r1y * r2y + r1z * r2z)
+        + R1 * (r0x * r2x + r0y * r2y + r0z * r2z)
+        + R2 * (r0x * r1x + r0y * r1y + r0z * r1z)
+    )
+    wf = 2.0 * np.arctan2(triple, denom)
+    phi = -wf * (normals[0, f] * r0x + normals[1, f] * r0y + normals[2, f] * r0z)
+
+    # edge i runs from vertex i to vertex i + 1
+    Re = edge_lengths[0, f]
+    Le = np.log((R0 + R1 + Re) / (R0 + R1 - Re))
+    phi += Le * (
+        edge_normals[0, 0, f] * r0x
+        + edge_normals[0, 1, f] * r0y
+        + edge_normals[0, 2, f] * r0z
+    )
+    Re = edge_lengths[1, f]
+    Le = np.log((R1 + R2 + Re) / (R1 + R2 - Re))
+    phi += Le * (
+        edge_normals[1, 0, f] * r1x
+        + edge_normals[1, 1, f] * r1y
+        + edge_normals[1, 2, f] * r1z
+    )
+    Re = edge_lengths[2, f]
+    Le = np.log((R2 + R0 + Re) / (R2 + R0 - Re))
+    phi += Le * (
+        edge_normals[2, 0, f] * r2x
+        + edge_normals[2, 1, f] * r2y
+        + edge_normals[2, 2, f] * r2z
+    )
+    return phi
+
+
+@njit(cache=True, parallel=True)
+def compute_tree_batch(
+    positions,
+    node_center,
+    node_radius,
+    node_children,
+    node_start,
+    node_end,
+    node_M0,
+    node_D,
+    node_Q,
+    face_vertices,
+    normals,
+    h,
+    edge_normals,
+    edge_lengths,
+    theta,
+    density,
+    scaleFactor,
+):
+    N = len(positions)
+    accelerations = np.zeros((N, 3))
+    potentials = np.zeros((N,))
+    for p in prange(N):
+        x = positions[p, 0] / scaleFactor
+        y = positions[p, 1] / scaleFactor
+        z = positions[p, 2] / scaleFactor
+
+        # sums of h_f * phi_f and n_f * phi_f
+        phi = np.zeros(4)
+        stack = np.zeros(128, dtype=np.int64)
+        stack_size = 1
+        while stack_size > 0:
+            stack_size -= 1
+            node = stack[stack_size]
+
+            Rx = x - node_center[node, 0]
+            Ry = y - node_center[node, 1]
+            Rz = z - node_center[node, 2]
+            r2 = Rx * Rx + Ry * Ry + Rz * Rz
+            r = np.sqrt(r2)
+
+            if node_radius[node] < theta * r:
+                # quadrupole expansion of 1 / |R - d|
+                r3 = r2 * r
+                r5 = r3 * r2
+                for k in range(4):
+                    D_R = (
+                        node_D[node, k, 0] * Rx
+                        + node_D[node, k, 1] * Ry
+                        + node_D[node, k, 2] * Rz
+                    )
+                    Q = node_Q[node, k]
+                    R_Q_R = (
+                        Rx * (Q[0, 0] * Rx + Q[0, 1] * Ry + Q[0, 2] * Rz)
+                        + Ry * (Q[1, 0] * Rx + Q[1, 1] * Ry + Q[1, 2] * Rz)
+                        + Rz * (Q[2, 0] * Rx + Q[2, 1] * Ry + Q[2, 2] * Rz)
+                    )
+                    trace_Q = Q[0, 0] + Q[1, 1] + Q[2, 2]
+                    phi[k] += (
+                        node_M0[node, k] / r
+                        + D_R / r3
+                        + (3.0 * R_Q_R - trace_Q * r2) / (2.0 * r5)
+                    )
+            elif node_children[node, 0] == -1:
+                for f in range(node_start[node], node_end[node]):
+                    phi_f = facet_single_layer(
+                        x,
+                        y,
+                        z,
+                        f,
+                        face_vertices,
+                        normals,
+                        edge_normals,
+                        edge_lengths,
+                    )
+                    phi[0] += h[f] * phi_f
+                    phi[1] += normals[0, f] * phi_f
+                    phi[2] += normals[1, f] * phi_f
+                    phi[3] += normals[2, f] * phi_f
+            else:
+                stack[stack_size] = node_children[node, 0]
+                stack[stack_size + 1] = node_children[node, 1]
+                stack_size += 2
+
+        accelerations[p, 0] = -G * density * scaleFactor * phi[1]
+        accelerations[p, 1] = -G * density * scaleFactor * phi[2]
+        accelerations[p, 2] = -G * density * scaleFactor * phi[3]
+
+        # the gravity models report U = -V
+        V = phi[0] - (x * phi[1] + y * phi[2] + z * phi[3])
+        potentials[p] = -0.5 * G * density * scaleFactor**2 * V
+    return accelerations, potentials
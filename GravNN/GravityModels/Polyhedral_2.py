@@ -122,6 +122,56 @@ def get_values(faces, vertices, point_scaled):
     return U, acc
 
 
+@njit(cache=True, parallel=False)
+def get_gradient(faces, vertices, point_scaled):
+    """Gradient of the (unscaled) acceleration of `get_values`, i.e. the sum of
+    the edge dyads weighted by their performance factors minus the sum of the
+    facet dyads weighted by their solid angles"""
+    dU_dxdx = np.zeros((3, 3), dtype=np.float64)
+    for face_idx, face in enumerate(faces):
+        i, j, k = face[0:3]  # vertex index
+        r_i, r_j, r_k = vertices[face[0:3], :] - point_scaled
+
+        e_1 = r_j - r_i
+        e_2 = r_k - r_j
+        n_f = np.cross(e_1, e_2)
+        n_f /= np.linalg.norm(n_f)
+
+        for edge_idx in range(3):
+            if edge_idx == 0:
+                r1, r2 = r_i, r_j
+            if edge_idx == 1:
+                r1, r2 = r_j, r_k
+            if edge_idx == 2:
+                r1, r2 = r_k, r_i
+
+            a = np.linalg.norm(r1)
+            b = np.linalg.norm(r2)
+            r21 = r2 - r1
+            e = np.linalg.norm(r21)
+            n21 = np.cross(r21, n_f)
+            n21 /= np.linalg.norm(n21)
+
+            Le = np.log(a + b + e) - np.log(a + b - e)
+            dU_dxdx += Le * np.outer(n_f, n21)
+
+        R1 = np.linalg.norm(r_i)
+        R2 = np.linalg.norm(r_j)
+        R3 = np.linalg.norm(r_k)
+
+        wy = r_i @ np.cross(r_j, r_k)
+        wx = (
+            R1 * R2 * R3
+            + R1 * np.dot(r_j, r_k)
+            + R2 * np.dot(r_k, r_i)
+            + R3 * np.dot(r_i, r_j)
+        )
+        wf = 2.0 * np.arctan2(wy, wx)
+        dU_dxdx -= wf * np.outer(n_f, n_f)
+
+    return dU_dxdx
+
+
 class Mesh:
     def __init__(self, trimesh):
         self.vertices = copy.deepcopy(np.array(trimesh.vertices, dtype=np.float64))
@@ -304,6 +354,28 @@ class Polyhedral_2(GravityModelBase):
 
         return self.potentials
 
+    def compute_dU_dxdx(self, positions=None):
+        """Compute the [N x 3 x 3] gradient of the acceleration for an existing
+        trajectory or provided positions"""
+        if positions is None:
+            positions = self.trajectory.positions
+
+        if len(positions) == 1:
+            results = map(self.compute_gradient_value, positions)
+        else:
+            with mp.Pool(processes=self.processes) as pool:
+                results = pool.map(self.compute_gradient_value, positions)
+        return np.array(list(results))
+
+    def compute_gradient_value(self, position):
+        G = 6.67430 * 10**-11
+        point_scaled = position / self.scaleFactor
+        dU_dxdx = get_gradient(self.mesh.faces, self.mesh.vertices, point_scaled)
+
+        # the acceleration is scaled by G * rho * scaleFactor, and the position
+        # by 1 / scaleFactor
+        return dU_dxdx * G * self.density
+
     def compute_values(self, position):
         # G = 6.67408 * 1e-11  # m^3/(kg s^2)
         G = 6.67430 * 10**-11
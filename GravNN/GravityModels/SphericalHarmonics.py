@@ -1,12 +1,18 @@
-import csv
 import json
 import os
+from functools import lru_cache
 
 import numpy as np
 
 from GravNN.GravityModels.GravityModelBase import GravityModelBase
 from GravNN.GravityModels.PinesAlgorithm import *
 from GravNN.Regression.utils import RegressSolution
+from GravNN.Support.SHFiles import (
+    load_sh_file,
+    pack_triangular,
+    triangular_degree,
+    unpack_triangular,
+)
 
 
 def make_2D_array(lis):
@@ -22,19 +28,70 @@ def make_2D_array(lis):
 
 
 def get_normalization(l, m):  # noqa: E741
-    N = np.zeros((l + 1, l + 1))
-    for i in range(0, l + 1):
-        for j in range(0, i + 1):
-            if j == 0:
-                N[i, j] = np.sqrt(2.0 * i + 1)
-            else:
-                N[i, j] = np.sqrt(
-                    (2 * (2 * i + 1) * np.math.factorial(i - j))
-                    / (np.math.factorial(i + j)),
-                )
+    """Normalization factors of the associated Legendre functions up to degree l.
+    The factorial ratio (i-j)!/(i+j)! is accumulated as a running product along
+    each row, which avoids evaluating (and dividing) the factorials themselves."""
+    i = np.arange(l + 1)[:, None]
+    j = np.arange(l + 1)[None, :]
+    lower = (j >= 1) & (j <= i)
+    factors = np.ones((l + 1, l + 1))
+    np.divide(1.0, (i + j) * (i - j + 1.0), out=factors, where=lower)
+    ratios = np.cumprod(factors, axis=1)
+
+    N = np.where(j == 0, np.sqrt(2.0 * i + 1), np.sqrt(2 * (2 * i + 1) * ratios))
+    N[j > i] = 0.0
     return N
 
 
+@lru_cache(maxsize=16)
+def get_n_matrices(degree):
+    """Packed `compute_n_matrices`, shared across all models of the same degree.
+    The matrices are read-only as they are shared."""
+    matrices = compute_n_packed(degree)
+    for matrix in matrices:
+        matrix.setflags(write=False)
+    return matrices
+
+
+@lru_cache(maxsize=16)
+def read_sh_coefficients(file, mtime_ns, size, degree):
+    # (+2 for purposes of the algorithm)
+    max_degree = None if degree is None else degree + 2
+    mu, radius, C_lm, S_lm = load_sh_file(file, max_degree, packed=True)
+    if degree is None:
+        degree = triangular_degree(len(C_lm)) - 2
+    C_lm.setflags(write=False)
+    S_lm.setflags(write=False)
+    return mu, radius, C_lm, S_lm, degree
+
+
+def get_sh_coefficients(file, degree=None):
+    """Stokes coefficients of a text file up to the requested degree (+2).
+
+    The coefficients are read from the memory mapped binary counterpart of the
+    text file (see `load_sh_file`) and cached for the lifetime of the process
+    (keyed by the path, modification time, and degree), so repeated models of the
+    same field don't re-read the file. The returned coefficients are packed
+    lower-triangular arrays (see `GravNN.Support.SHFiles.triangular_index`) and
+    read-only as they are shared.
+
+    Args:
+        file (str): path to the coefficients
+        degree (int, optional): maximum degree of the model. Defaults to None
+            (all degrees available in the file but the last two).
+
+    Returns:
+        tuple: mu (or None), radius (or None), C_lm, S_lm, degree
+    """
+    stat = os.stat(file)
+    return read_sh_coefficients(
+        os.path.abspath(file),
+        stat.st_mtime_ns,
+        stat.st_size,
+        degree,
+    )
+
+
 def get_sh_data(trajectory, gravity_file, **kwargs):
     override = bool(kwargs.get("override", [False])[0])
     parallel = kwargs.get("parallel", False)
@@ -71,13 +128,48 @@ def get_sh_data(trajectory, gravity_file, **kwargs):
 
 
 class SphericalHarmonicsDegRemoved(GravityModelBase):
-    def __init__(self, sh_info, degree, remove_deg, trajectory=None, parallel=False):
-        self.sh_hf = SphericalHarmonics(sh_info, degree, trajectory)
-        self.sh_lf = SphericalHarmonics(sh_info, remove_deg, trajectory)
-        super().__init__()
+    def __init__(
+        self,
+        sh_info,
+        degree,
+        remove_deg,
+        trajectory=None,
+        parallel=False,
+        pool=None,
+        dtype=np.float64,
+    ):
+        self.sh_hf = SphericalHarmonics(
+            sh_info,
+            degree,
+            trajectory,
+            pool=pool,
+            dtype=dtype,
+        )
+        self.sh_lf = SphericalHarmonics(
+            sh_info,
+            remove_deg,
+            trajectory,
+            pool=pool,
+            dtype=dtype,
+        )
+        super().__init__(pool=pool, dtype=dtype)
         self.configure(trajectory)
         self.deg_removed = degree
 
+    def compute_all(self, positions=None, gradient=False):
+        if positions is None:
+            positions = self.trajectory.positions
+        hf_values = self.sh_hf.compute_all(positions, gradient=gradient)
+        lf_values = self.sh_lf.compute_all(positions, gradient=gradient)
+        values = tuple(hf - lf for hf, lf in zip(hf_values, lf_values))
+        self.accelerations = values[0]
+        self.potentials = values[1]
+        return values
+
+    def compute_dU_dxdx(self, positions=None):
+        "Compute the [N x 3 x 3] gradient of the acceleration"
+        return self.compute_all(positions, gradient=True)[2]
+
     def compute_potential(self, positions=None):
         if positions is None:
             positions = self.trajectory.positions
@@ -103,7 +195,15 @@ class SphericalHarmonicsDegRemoved(GravityModelBase):
 
 
 class SphericalHarmonics(GravityModelBase):
-    def __init__(self, sh_info, degree, trajectory=None, parallel=False):
+    def __init__(
+        self,
+        sh_info,
+        degree,
+        trajectory=None,
+        parallel=False,
+        pool=None,
+        dtype=np.float64,
+    ):
         """Spherical Harmonic Gravity Model. Takes in a set of Stokes coefficients and
         computes acceleration and potentials using a non-singular representation
         (Pines Algorithm).
@@ -113,15 +213,31 @@ class SphericalHarmonics(GravityModelBase):
             degree (int): maximum degree of the spherical harmonic expansions
             trajectory (TrajectoryBase, optional): Trajectory / distribution for which
             the gravity measurements should be produced. Defaults to None.
+            pool (WorkerPool, optional): Persistent worker pool across which the
+            positions are distributed. Defaults to None (threaded batch kernel).
+            dtype (np.dtype, optional): precision of the positions and values, see
+            `GravityModelBase`. Defaults to np.float64.
         """
-        super().__init__(sh_info, degree, trajectory=trajectory, parallel=parallel)
+        super().__init__(
+            sh_info,
+            degree,
+            trajectory=trajectory,
+            parallel=parallel,
+            pool=pool,
+            dtype=dtype,
+        )
 
         self.degree = degree
 
         self.mu = None
         self.radEquator = None
-        self.C_lm = None
-        self.S_lm = None
+
+        # packed lower-triangular Stokes coefficients, see `C_lm` and `S_lm` for
+        # their dense counterparts
+        self.cbar = None
+        self.sbar = None
+        self._C_lm = None
+        self._S_lm = None
 
         if isinstance(sh_info, RegressSolution):
             self.file = "./"
@@ -136,7 +252,7 @@ class SphericalHarmonics(GravityModelBase):
         else:
             self.loadSH()
 
-        self.n1, self.n2, self.n1q, self.n2q = compute_n_matrices(self.degree)
+        self.n1, self.n2, self.n1q, self.n2q = get_n_matrices(self.degree)
 
         # if parallel:
         #     self.compute_fcn = compute_acc_parallel
@@ -186,59 +302,42 @@ class SphericalHarmonics(GravityModelBase):
         return
 
     def loadSH_csv(self):
-        need_whitespace_fix = False
-        with open(self.file, "r") as csvfile:
-            gravReader = csv.reader(csvfile, delimiter=",")
-            firstRow = next(gravReader)
-            clmList = []
-            slmList = []
-            # Currently do not take the mu and radius values
-            # provided by the gravity file.
-            try:
-                int(firstRow[0])
-            except ValueError:
-                try:
-                    self.mu = float(firstRow[1])
-                    self.radEquator = float(firstRow[0])
-                except IndexError:
-                    need_whitespace_fix = True
-                    split_first_row = firstRow[0].split()
-                    self.mu = float(split_first_row[1])
-                    self.radEquator = float(split_first_row[0])
-
-            clmRow = []
-            slmRow = []
-            currDeg = 0
-            for gravRow in gravReader:
-                if need_whitespace_fix:
-                    gravRow = gravRow[0].split()
-
-                # TODO: Check if this results in correct behavior
-                if self.degree is not None:
-                    # if loading coefficients beyond the maximum desired
-                    # (+2 for purposes of the algorithm)
-                    if int(float(gravRow[0])) > self.degree + 2:
-                        break
-                while int(float(gravRow[0])) > currDeg:
-                    if len(clmRow) < currDeg + 1:
-                        clmRow.extend([0.0] * (currDeg + 1 - len(clmRow)))
-                        slmRow.extend([0.0] * (currDeg + 1 - len(slmRow)))
-                    clmList.append(clmRow)
-                    slmList.append(slmRow)
-                    clmRow = []
-                    slmRow = []
-                    currDeg += 1
-                clmRow.append(float(gravRow[2]))
-                slmRow.append(float(gravRow[3]))
-
-            clmList.append(clmRow)
-            slmList.append(slmRow)
-            if self.degree is None:
-                self.degree = currDeg - 2
-
-            self.C_lm = make_2D_array(clmList)
-            self.S_lm = make_2D_array(slmList)
-            return
+        mu, radEquator, C_lm, S_lm, degree = get_sh_coefficients(
+            self.file,
+            self.degree,
+        )
+        self.mu = mu
+        self.radEquator = radEquator
+        self.degree = degree
+        self.cbar = C_lm
+        self.sbar = S_lm
+        return
+
+    @property
+    def C_lm(self):
+        """Dense (read-only) C_lm, unpacked from `cbar` on first access"""
+        if self._C_lm is None and self.cbar is not None:
+            self._C_lm = unpack_triangular(self.cbar, triangular_degree(len(self.cbar)))
+            self._C_lm.setflags(write=False)
+        return self._C_lm
+
+    @C_lm.setter
+    def C_lm(self, value):
+        self._C_lm = None
+        self.cbar = None if value is None else pack_triangular(np.asarray(value))
+
+    @property
+    def S_lm(self):
+        """Dense (read-only) S_lm, unpacked from `sbar` on first access"""
+        if self._S_lm is None and self.sbar is not None:
+            self._S_lm = unpack_triangular(self.sbar, triangular_degree(len(self.sbar)))
+            self._S_lm.setflags(write=False)
+        return self._S_lm
+
+    @S_lm.setter
+    def S_lm(self, value):
+        self._S_lm = None
+        self.sbar = None if value is None else pack_triangular(np.asarray(value))
 
     def loadSH(self):
         if ".json" in self.file:
@@ -255,14 +354,16 @@ class SphericalHarmonics(GravityModelBase):
 
         return
 
-    def compute_potential(self, positions=None):
-        "Compute the potential for an existing trajectory or provided set of positions"
+    def compute_all(self, positions=None, gradient=False):
+        """Compute the acceleration and potential (and optionally the gravity
+        gradient tensor) in a single pass of the Pines algorithm for an existing
+        trajectory or provided set of positions"""
         if positions is None:
             positions = self.trajectory.positions
 
         positions = np.reshape(positions, (len(positions) * 3))
 
-        accelerations, potentials = compute_acc(
+        values = compute_acc(
             positions,
             self.degree,
             self.mu,
@@ -271,43 +372,35 @@ class SphericalHarmonics(GravityModelBase):
             self.n2,
             self.n1q,
             self.n2q,
-            self.C_lm,
-            self.S_lm,
+            self.cbar,
+            self.sbar,
+            pool=self.pool,
+            gradient=gradient,
+            dtype=self.dtype,
         )
+        accelerations, potentials = values[:2]
 
         self.accelerations = np.reshape(
             np.array(accelerations),
             (int(len(np.array(accelerations)) / 3), 3),
         )
         self.potentials = potentials
+        if gradient:
+            return self.accelerations, self.potentials, values[2]
+        return self.accelerations, self.potentials
+
+    def compute_dU_dxdx(self, positions=None):
+        "Compute the [N x 3 x 3] gradient of the acceleration"
+        return self.compute_all(positions, gradient=True)[2]
 
+    def compute_potential(self, positions=None):
+        "Compute the potential for an existing trajectory or provided set of positions"
+        self.compute_all(positions)
         return self.potentials
 
     def compute_acceleration(self, positions=None):
         "Compute the acceleration for an existing trajectory or set of positions"
-        if positions is None:
-            positions = self.trajectory.positions
-
-        positions = np.reshape(positions, (len(positions) * 3))
-
-        accelerations, potentials = compute_acc(
-            positions,
-            self.degree,
-            self.mu,
-            self.radEquator,
-            self.n1,
-            self.n2,
-            self.n1q,
-            self.n2q,
-            self.C_lm,
-            self.S_lm,
-        )
-
-        self.accelerations = np.reshape(
-            np.array(accelerations),
-            (int(len(np.array(accelerations)) / 3), 3),
-        )
-        self.potentials = potentials
+        self.compute_all(positions)
         return self.accelerations
 
 
@@ -1,4 +1,7 @@
 """Custom tensorflow callbacks"""
+import glob
+import os
+import pickle
 import time
 
 import matplotlib.pyplot as plt
@@ -13,10 +16,11 @@ class SimpleCallback(tf.keras.callbacks.Callback):
     """Simple Callback that prints out loss metrics every 10 epochs and
     measures the amount of time per iteration and total training time"""
 
-    def __init__(self, batch_size, print_interval=10):
+    def __init__(self, batch_size, print_interval=10, verbose=True):
         super().__init__()
         self.batch_size = batch_size
         self.print_interval = print_interval
+        self.verbose = verbose
         self.N_train_batches = 0
         self.N_test_batches = 0
 
@@ -77,7 +81,7 @@ class SimpleCallback(tf.keras.callbacks.Callback):
     def on_epoch_end(self, epoch, logs=None):
         self.N_train_batches = np.max([self.N_train_batches, 1])
         self.N_test_batches = np.max([self.N_test_batches, 1])
-        if epoch % self.print_interval == 0:
+        if self.verbose and epoch % self.print_interval == 0:
             print(
                 "Epoch: {} \t Loss: {:.9f} \t Val Loss: {:.9f} \t Time: {:.3f} \t \
                     Avg Error: {:.9f}% \t Max Error: {:.9f}%".format(
@@ -109,6 +113,48 @@ class SimpleCallback(tf.keras.callbacks.Callback):
         self.time_delta = np.round(self.end_time - self.train_start, 2)
 
 
+class SweepCallback(tf.keras.callbacks.Callback):
+    """Averages the per-model metrics (model_loss, model_percent_mean,
+    model_percent_max) of a StackedPINNGravityModel over the batches of each
+    epoch, such that the history holds the [K] metrics of every epoch."""
+
+    keys = ["loss", "percent_mean", "percent_max"]
+
+    def accumulate(self, metrics, logs):
+        for key in self.keys:
+            value = np.asarray(logs[f"model_{key}"])
+            if key not in metrics:
+                metrics[key] = value
+            elif key == "percent_max":
+                metrics[key] = np.maximum(metrics[key], value)
+            else:
+                metrics[key] = metrics[key] + value
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.train_metrics = {}
+        self.test_metrics = {}
+        self.N_train_batches = 0
+        self.N_test_batches = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.accumulate(self.train_metrics, logs)
+        self.N_train_batches += 1
+
+    def on_test_batch_end(self, batch, logs=None):
+        self.accumulate(self.test_metrics, logs)
+        self.N_test_batches += 1
+
+    def on_epoch_end(self, epoch, logs=None):
+        for prefix, metrics, N_batches in [
+            ("", self.train_metrics, self.N_train_batches),
+            ("val_", self.test_metrics, self.N_test_batches),
+        ]:
+            for key, value in metrics.items():
+                if key != "percent_max":
+                    value = value / N_batches
+                logs[f"{prefix}model_{key}"] = value
+
+
 class GradientCallback(tf.keras.callbacks.Callback):
     """
     Callback that plots out the gradients for each hidden layer after every 1000
@@ -190,6 +236,133 @@ class TimingCallback(tf.keras.callbacks.Callback):
         self.time_delta = np.round(self.end_time - self.train_start, 2)
 
 
+class CheckpointCallback(tf.keras.callbacks.Callback):
+    """Callback that periodically checkpoints the training such that it can be
+    resumed (e.g. after a preempted job) from the last checkpoint.
+
+    The model variables (network weights, optimizer state, loss weights w_loss)
+    and the number of completed epochs and steps are saved through a
+    tf.train.CheckpointManager, which only keeps the max_to_keep most recent
+    checkpoints. The state of the other callbacks (e.g. the learning rate
+    schedule or early stopping) and the history of all previous epochs are
+    pickled alongside each checkpoint. Both are written to temporary files
+    before being moved into place, so an interrupted save never replaces the
+    previous checkpoint."""
+
+    # attributes holding the progress of the keras schedules and early stopping
+    state_attributes = [
+        "wait",
+        "best",
+        "best_epoch",
+        "best_weights",
+        "cooldown_counter",
+    ]
+
+    def __init__(self, directory, callbacks=None, interval=100, max_to_keep=3):
+        super().__init__()
+        self.directory = os.path.join(directory, "")
+        self.callbacks = callbacks if callbacks is not None else []
+        self.interval = interval
+        self.max_to_keep = max_to_keep
+        self.history = {}
+        self.initial_epoch = 0
+        self.initial_step = 0
+        self.last_epoch = 0
+        self.restored_state = None
+        self.epoch = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.step = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.manager = None
+
+    def set_model(self, model):
+        super().set_model(model)
+        if self.manager is None:
+            checkpoint = tf.train.Checkpoint(
+                model=model,
+                optimizer=model.optimizer,
+                epoch=self.epoch,
+                step=self.step,
+            )
+            self.manager = tf.train.CheckpointManager(
+                checkpoint,
+                self.directory,
+                max_to_keep=self.max_to_keep,
+            )
+
+    def state_file(self, epoch):
+        return f"{self.directory}state-{epoch}.data"
+
+    def restore(self, model):
+        """Restore the latest checkpoint (if any) into the model. The state of
+        the callbacks is only restored at the beginning of the training, after
+        keras has reset them, so this callback must follow them in the list of
+        callbacks passed to fit.
+
+        Returns:
+            int: number of completed epochs (the initial epoch of the training)
+        """
+        self.set_model(model)
+        if self.manager.latest_checkpoint is None:
+            return 0
+
+        self.manager.checkpoint.restore(self.manager.latest_checkpoint)
+        with open(self.state_file(int(self.epoch.numpy())), "rb") as f:
+            self.restored_state = pickle.load(f)
+        self.history = self.restored_state["history"]
+        self.initial_epoch = int(self.epoch.numpy())
+        self.initial_step = int(self.step.numpy())
+        print(f"Resuming from epoch {self.initial_epoch}")
+        return self.initial_epoch
+
+    def on_train_begin(self, logs=None):
+        # keras resets the step counter (used by the loss annealing) on every fit
+        self.model._train_counter.assign(self.initial_step)
+        if self.restored_state is not None:
+            states = self.restored_state["callbacks"]
+            for callback, callback_state in zip(self.callbacks, states):
+                callback.__dict__.update(callback_state)
+            self.restored_state = None
+        self.last_epoch = self.initial_epoch
+
+    def on_epoch_end(self, epoch, logs=None):
+        for key, value in (logs or {}).items():
+            self.history.setdefault(key, []).append(value)
+        self.last_epoch = epoch + 1
+        if self.last_epoch % self.interval == 0:
+            self.save(self.last_epoch)
+
+    def on_train_end(self, logs=None):
+        if self.last_epoch > int(self.epoch.numpy()):
+            self.save(self.last_epoch)
+
+    def save(self, epoch):
+        self.epoch.assign(epoch)
+        self.step.assign(self.model._train_counter)
+        state = {
+            "history": self.history,
+            "callbacks": [
+                {
+                    key: value
+                    for key, value in callback.__dict__.items()
+                    if key in self.state_attributes
+                }
+                for callback in self.callbacks
+            ],
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.state_file(epoch) + ".tmp", "wb") as f:
+            pickle.dump(state, f)
+        os.replace(self.state_file(epoch) + ".tmp", self.state_file(epoch))
+        self.manager.save(checkpoint_number=epoch)
+
+        # remove the states of the checkpoints deleted by the manager
+        kept = [
+            self.state_file(path.split("-")[-1]) for path in self.manager.checkpoints
+        ]
+        for state_file in glob.glob(f"{self.directory}state-*.data"):
+            if state_file not in kept:
+                os.remove(state_file)
+
+
 def get_early_stop(config):
     if config["early_stop"][0]:
         return tf.keras.callbacks.EarlyStopping(
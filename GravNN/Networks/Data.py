@@ -2,16 +2,25 @@
      data for the networks"""
 
 import copy
+import os
+import shutil
 import sys
+import tempfile
+import weakref
 
 import numpy as np
 import tensorflow as tf
 from sklearn.utils import shuffle
 
 from GravNN.CelestialBodies.Planets import Planet
+from GravNN.GravityModels.PointMass import PointMass
+from GravNN.GravityModels.Polyhedral import Polyhedral
+from GravNN.GravityModels.SphericalHarmonics import SphericalHarmonicsDegRemoved
 from GravNN.Networks.Constraints import *
 from GravNN.Preprocessors.DummyScaler import DummyScaler
+from GravNN.Support.DataProducer import DataProducer
 from GravNN.Support.PathTransformations import make_windows_path_posix
+from GravNN.Support.storage import load_array, save_arrays
 
 
 def print_stats(data, name):
@@ -424,9 +433,11 @@ def no_scale(data_dict, config):
 def single_training_validation_split(X, N_train, N_val, random_state=42):
     """Function responsible for splitting the variable into separate training
     and validation sets"""
-    X = shuffle(X, random_state=random_state)
-    X_train = X[:N_train]
-    X_val = X[N_train : N_train + N_val]
+    # Only gather the selected rows (identical to shuffling all of X) so that
+    # memory mapped data is never read in full
+    indices = shuffle(np.arange(len(X)), random_state=random_state)
+    X_train = X[indices[:N_train]]
+    X_val = X[indices[N_train : N_train + N_val]]
     return X_train, X_val
 
 
@@ -483,6 +494,110 @@ def cart2sph_tf(x, acc_N):
     return acc_B
 
 
+def hstack_2D(data):
+    data_list = []
+    for values in data.values():
+        if len(np.shape(values)) == 1:
+            values = values.reshape((-1, 1))
+        data_list.append(values)
+    return np.hstack(data_list)
+
+
+def write_shards(directory, get_shard, N, shard_size, dtype):
+    """Write the N rows returned by get_shard(start, end) -> (x, y) as shards
+    of shard_size rows (x_i.npy and y_i.npy), gathering one shard at a time
+
+    Returns:
+        int: number of shards
+    """
+    N_shards = 0
+    for start in range(0, N, shard_size):
+        x, y = get_shard(start, min(start + shard_size, N))
+        save_arrays(
+            directory,
+            {
+                f"x_{N_shards}": x.astype(dtype.as_numpy_dtype),
+                f"y_{N_shards}": y.astype(dtype.as_numpy_dtype),
+            },
+        )
+        N_shards += 1
+    return N_shards
+
+
+def select_constraint_data(u, a, laplace, curl, pinn_constraint_fcn):
+    """Keep only the values required by the PINN constraint"""
+    data = OrderedDict(
+        {
+            "potential": u,
+            "acceleration": a,
+            "laplace": laplace,
+            "curl": curl,
+        },
+    )
+    constraint_str = pinn_constraint_fcn.split("_")[1].lower()
+    if "a" not in constraint_str and constraint_str != "00":
+        data.pop("acceleration")
+    if "p" not in constraint_str:
+        data.pop("potential")
+    if "l" not in constraint_str:
+        data.pop("laplace")
+    if "c" not in constraint_str:
+        data.pop("curl")
+    return data
+
+
+def get_ground_truth_fcn(trajectory, grav_file, config):
+    """Function evaluating the model of gravity_data_fcn (minus any removed
+    degrees or point mass) on new positions, used to generate data on the fly
+
+    Returns:
+        callable: positions [N x 3] -> accelerations [N x 3], potentials [N]
+    """
+    get_analytic_data_fcn = config["gravity_data_fcn"][0]
+    planet = trajectory.celestial_body
+    if get_analytic_data_fcn.__name__ == "get_sh_data":
+        max_deg = int(config["max_deg"][0])
+        deg_removed = int(config["deg_removed"][0])
+        model = SphericalHarmonicsDegRemoved(grav_file, max_deg, deg_removed)
+        point_mass = None
+    elif get_analytic_data_fcn.__name__ == "get_poly_data":
+        model = Polyhedral(planet, make_windows_path_posix(grav_file))
+        point_mass = None
+        if config.get("remove_point_mass", [False])[0]:
+            point_mass = PointMass(planet)
+    else:
+        raise ValueError(
+            f"Data can't be generated on the fly with {get_analytic_data_fcn.__name__}",
+        )
+
+    def compute_fcn(positions):
+        a, u = model.compute_all(positions)[0:2]
+        if point_mass is not None:
+            a_pm, u_pm = point_mass.compute_all(positions)[0:2]
+            a, u = a - a_pm, u - u_pm
+        return a, u
+
+    return compute_fcn
+
+
+def transform_chunk(x, a, u, transformers):
+    """Scale new data with the transformers fit by the preprocessing"""
+    x = transformers["x"].transform(x)
+    a = transformers["a"].transform(a)
+
+    # the potential transformers are fit to either one or three columns
+    u_vals = np.repeat(u.reshape((-1, 1)), 3, axis=1)
+    u = transformers["u"].transform(u_vals)[:, 0].reshape((-1, 1))
+    return x, a, u
+
+
+def copy_to_gpu(dataset):
+    # only worthwhile when training on a GPU
+    if len(tf.config.list_logical_devices("GPU")) > 0:
+        dataset = dataset.apply(tf.data.experimental.copy_to_device("/gpu:0"))
+    return dataset
+
+
 class DataSet:
     def __init__(self, data_config=None):
         # populate these variables
@@ -495,57 +610,16 @@ class DataSet:
         else:
             self.config = {}
 
-    def get_raw_data(self):
-        """Function responsible for getting the raw training data (without
-        any preprocessing). This may include concatenating an "extra" training
-        data distribution defined within config.
-
-        Args:
-            config (dict): hyperparameters and configuration variables for TF Model
+    def get_ground_truth(self):
+        """Positions, accelerations, and potentials of all N_dist samples of the
+        distribution (memory mapped when read from disk), before the split into
+        training and validation data
 
         Returns:
-            tuple: x,a,u training and validation data
+            tuple: x,a,u of the distribution
         """
-        planet = self.config[0][0]["planet"]
-        radius_bounds = [self.config[0][0]["radius_min"], self.config[0][0]["radius_max"]]
         N_dist = self.config[0][0]["N_dist"]
-
-        grav_file = self.config[0][0].get("grav_file", [None])
-
-        # HACK: This is a hack to get the correct gravity file for the distribution
-        obj_file = (
-            grav_file[0]
-            if grav_file[0] is not None
-            else self.config[0][0].get("obj_file", [None])[0]
-        )
-        sh_file = (
-            grav_file[0]
-            if grav_file[0] is not None
-            else self.config[0][0].get("sh_file", [None])[0]
-        )
-        self.config[0][0]["obj_file"] = [obj_file]
-        self.config[0][0]["sh_file"] = [sh_file]
-
-        if isinstance(planet, Planet):
-            grav_file = sh_file
-        else:
-            grav_file = obj_file
-
-        distribution = self.config[0][0]["distribution"][0]
-        if distribution.__name__ == "SurfaceDist":
-            trajectory = distribution(
-                planet,
-                make_windows_path_posix(obj_file),
-                # **self.config,
-            )
-        else:
-            c_dict = self.config[0][0]
-            trajectory = distribution(
-                planet,
-                radius_bounds,
-                N_dist,
-                **c_dict,
-            )
+        trajectory, grav_file = self.get_trajectory(N_dist)
         get_analytic_data_fcn = self.config[0][0]["gravity_data_fcn"][0]
 
         x_unscaled, a_unscaled, u_unscaled = get_analytic_data_fcn(
@@ -567,7 +641,20 @@ class DataSet:
                 "ERROR: This pickled acceleration/potential pair was generated \
                 when the potential had a wrong sign. \n You must overwrite the data!",
             )
+        return x_unscaled, a_unscaled, u_unscaled
+
+    def get_raw_data(self):
+        """Function responsible for getting the raw training data (without
+        any preprocessing). This may include concatenating an "extra" training
+        data distribution defined within config.
+
+        Args:
+            config (dict): hyperparameters and configuration variables for TF Model
 
+        Returns:
+            tuple: x,a,u training and validation data
+        """
+        x_unscaled, a_unscaled, u_unscaled = self.get_ground_truth()
         x_train, a_train, u_train, x_val, a_val, u_val = training_validation_split(
             x_unscaled,
             a_unscaled,
@@ -603,6 +690,50 @@ class DataSet:
 
         return data_dict
 
+    def get_trajectory(self, points):
+        """Distribution of the config with the given number of points, along
+        with the gravity file of the ground truth model"""
+        planet = self.config[0][0]["planet"]
+        radius_bounds = [self.config[0][0]["radius_min"], self.config[0][0]["radius_max"]]
+
+        grav_file = self.config[0][0].get("grav_file", [None])
+
+        # HACK: This is a hack to get the correct gravity file for the distribution
+        obj_file = (
+            grav_file[0]
+            if grav_file[0] is not None
+            else self.config[0][0].get("obj_file", [None])[0]
+        )
+        sh_file = (
+            grav_file[0]
+            if grav_file[0] is not None
+            else self.config[0][0].get("sh_file", [None])[0]
+        )
+        self.config[0][0]["obj_file"] = [obj_file]
+        self.config[0][0]["sh_file"] = [sh_file]
+
+        if isinstance(planet, Planet):
+            grav_file = sh_file
+        else:
+            grav_file = obj_file
+
+        distribution = self.config[0][0]["distribution"][0]
+        if distribution.__name__ == "SurfaceDist":
+            trajectory = distribution(
+                planet,
+                make_windows_path_posix(obj_file),
+                # **self.config,
+            )
+        else:
+            c_dict = self.config[0][0]
+            trajectory = distribution(
+                planet,
+                radius_bounds,
+                points,
+                **c_dict,
+            )
+        return trajectory, grav_file
+
     def get_preprocessed_data(self, data_dict):
         """Function responsible for normalizing the training data. Possible options
         include normalizing by the bounds of the acceleration, the potential, neither,
@@ -680,13 +811,62 @@ class DataSet:
             batch_size,
             num_parallel_calls=tf.data.experimental.AUTOTUNE,
         )
-        dataset = dataset.apply(tf.data.experimental.copy_to_device("/gpu:0"))
+        dataset = copy_to_gpu(dataset)
         dataset = dataset.prefetch(tf.data.experimental.AUTOTUNE)
         dataset = dataset.cache()
 
         # Why Cache is Impt: https://stackoverflow.com/questions/48240573/why-is-tensorflows-tf-data-dataset-shuffle-so-slow
         return dataset
 
+    def generate_streaming_dataset(
+        self,
+        directory,
+        N_shards,
+        batch_size,
+        shuffle=True,
+        shuffle_buffer=262144,
+        dtype=None,
+    ):
+        """Function which streams the shards written by `write_shards` into a
+        tensorflow Dataset without loading them into memory. The shards are
+        memory mapped and read one window of shuffle_buffer rows at a time,
+        which is shuffled before being batched. Each epoch visits the shards
+        and their windows in a new random order, so the memory used is bounded
+        by the window (plus the prefetched batches) regardless of the size of
+        the data."""
+        dtype = tf.as_dtype(dtype if dtype is not None else tf.float32)
+        x_0 = load_array(directory, "x_0")
+        y_0 = load_array(directory, "y_0")
+        rng = np.random.default_rng(1234)
+
+        def generator():
+            shards = rng.permutation(N_shards) if shuffle else range(N_shards)
+            for shard in shards:
+                x = load_array(directory, f"x_{shard}")
+                y = load_array(directory, f"y_{shard}")
+                windows = np.arange(0, len(x), shuffle_buffer)
+                if shuffle:
+                    windows = rng.permutation(windows)
+                for start in windows:
+                    x_window = np.array(x[start : start + shuffle_buffer])
+                    y_window = np.array(y[start : start + shuffle_buffer])
+                    if shuffle:
+                        idx = rng.permutation(len(x_window))
+                        x_window, y_window = x_window[idx], y_window[idx]
+                    for i in range(0, len(x_window), batch_size):
+                        yield x_window[i : i + batch_size], y_window[i : i + batch_size]
+
+        dataset = tf.data.Dataset.from_generator(
+            generator,
+            output_signature=(
+                tf.TensorSpec(shape=(None, x_0.shape[1]), dtype=dtype),
+                tf.TensorSpec(shape=(None, y_0.shape[1]), dtype=dtype),
+            ),
+        )
+        dataset = copy_to_gpu(dataset)
+        dataset = dataset.prefetch(tf.data.experimental.AUTOTUNE)
+        return dataset
+
     def configure_dataset(self, train_data, val_data, config):
         """Function that partitions the training data to include only that
         which is required for the use PINN constraint. I.e. if using the
@@ -696,48 +876,23 @@ class DataSet:
         x_val, u_val, a_val, laplace_val, curl_val = val_data
         pinn_constraint_fcn = config[0][0].get("PINN_constraint_fcn", ["pinn_00"])[0]
 
-        data = OrderedDict(
-            {
-                "potential": u_train,
-                "acceleration": a_train,
-                "laplace": laplace_train,
-                "curl": curl_train,
-            },
+        data = select_constraint_data(
+            u_train,
+            a_train,
+            laplace_train,
+            curl_train,
+            pinn_constraint_fcn,
         )
-        val_data = OrderedDict(
-            {
-                "potential": u_val,
-                "acceleration": a_val,
-                "laplace": laplace_val,
-                "curl": curl_val,
-            },
+        val_data = select_constraint_data(
+            u_val,
+            a_val,
+            laplace_val,
+            curl_val,
+            pinn_constraint_fcn,
         )
 
-        constraint_str = pinn_constraint_fcn.split("_")[1].lower()
-        if "a" not in constraint_str and constraint_str != "00":
-            data.pop("acceleration")
-            val_data.pop("acceleration")
-        if "p" not in constraint_str:
-            data.pop("potential")
-            val_data.pop("potential")
-        if "l" not in constraint_str:
-            data.pop("laplace")
-            val_data.pop("laplace")
-        if "c" not in constraint_str:
-            data.pop("curl")
-            val_data.pop("curl")
-
         # stack the data into a single array, but
         # ensure that dimensions are 2D
-
-        def hstack_2D(data):
-            data_list = []
-            for values in data.values():
-                if len(np.shape(values)) == 1:
-                    values = values.reshape((-1, 1))
-                data_list.append(values)
-            return np.hstack(data_list)
-
         y_train = hstack_2D(data)
         y_val = hstack_2D(val_data)
 
@@ -767,6 +922,11 @@ class DataSet:
 
     def from_config(self, config):
         self.config = config
+        if config[0][0].get("online_data", [False])[0]:
+            return self.from_producer()
+        if config[0][0].get("stream_data", [False])[0]:
+            return self.from_stream()
+
         data_dict = self.get_raw_data()
         train_data, val_data, transformers = self.get_preprocessed_data(data_dict)
         dataset, val_dataset = self.configure_dataset(train_data, val_data, self.config)
@@ -779,6 +939,241 @@ class DataSet:
         # force transformers into config
         self.add_transformers_to_config()
 
+    def from_stream(self):
+        """Stream the training and validation data from memory mapped shards
+        (see `generate_streaming_dataset`) rather than holding them in memory.
+        The training shards are gathered from the memory mapped ground truth
+        and scaled one at a time, with transformers fit to (at most) fit_size
+        of the training samples. Configured through stream_data, shard_size,
+        shuffle_buffer, fit_size, and stream_directory (defaults to a temporary
+        directory, which is removed along with the DataSet)."""
+        config = self.config[0][0]
+        if "augment_data_config" in config:
+            raise ValueError("Augmented data can't be streamed")
+        N_train = config["N_train"][0]
+        N_val = config["N_val"][0]
+        shard_size = config.get("shard_size", [1048576])[0]
+        shuffle_buffer = config.get("shuffle_buffer", [262144])[0]
+        fit_size = config.get("fit_size", [shard_size])[0]
+        batch_size = config.get("batch_size", [N_train])[0]
+        dtype = tf.as_dtype(config.get("dtype", [tf.float64])[0])
+        pinn_constraint_fcn = config.get("PINN_constraint_fcn", ["pinn_00"])[0]
+        acc_noise = config.get("acc_noise", [0.0])[0]
+
+        # the same split as training_validation_split, gathered shard by shard
+        x, a, u = self.get_ground_truth()
+        indices = shuffle(np.arange(len(x)), random_state=config.get("seed", [42])[0])
+        train_indices = indices[:N_train]
+        val_indices = indices[N_train : N_train + N_val]
+
+        # the first fit_size of the shuffled indices are a random subset
+        fit_indices = train_indices[:fit_size]
+        data_dict = {
+            "x_train": x[fit_indices],
+            "a_train": a[fit_indices],
+            "u_train": u[fit_indices],
+            "x_val": x[val_indices],
+            "a_val": a[val_indices],
+            "u_val": u[val_indices],
+        }
+        print_stats(data_dict["x_train"], "Position")
+        print_stats(data_dict["a_train"], "Acceleration")
+        print_stats(data_dict["u_train"], "Potential")
+
+        _, val_data, transformers = self.get_preprocessed_data(data_dict)
+        self.raw_data = data_dict
+        self.transformers = transformers
+
+        def get_values(u, a, laplace, curl):
+            data = select_constraint_data(u, a, laplace, curl, pinn_constraint_fcn)
+            return hstack_2D(data)
+
+        def get_train_shard(start, end):
+            idx = train_indices[start:end]
+            a_shard = add_error({"a_train": a[idx]}, acc_noise)["a_train"]
+            x_shard, a_shard, u_shard = transform_chunk(
+                x[idx],
+                a_shard,
+                u[idx],
+                transformers,
+            )
+            return x_shard, get_values(
+                u_shard,
+                a_shard,
+                np.zeros_like(u_shard),
+                np.zeros_like(a_shard),
+            )
+
+        x_val, u_val, a_val, laplace_val, curl_val = val_data
+
+        def get_val_shard(start, end):
+            return x_val[start:end], get_values(
+                u_val[start:end],
+                a_val[start:end],
+                laplace_val[start:end],
+                curl_val[start:end],
+            )
+
+        directory = config.get("stream_directory", [None])[0]
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="GravNN_data_")
+            weakref.finalize(self, shutil.rmtree, directory, ignore_errors=True)
+        self.stream_directory = os.path.join(directory, "")
+
+        datasets = []
+        for name, get_shard, N, shuffle_shards in [
+            ("train", get_train_shard, len(train_indices), True),
+            ("val", get_val_shard, len(x_val), False),
+        ]:
+            shard_directory = self.stream_directory + name + "/"
+            N_shards = write_shards(shard_directory, get_shard, N, shard_size, dtype)
+            dataset = self.generate_streaming_dataset(
+                shard_directory,
+                N_shards,
+                batch_size,
+                shuffle=shuffle_shards,
+                shuffle_buffer=shuffle_buffer,
+                dtype=dtype,
+            )
+            datasets.append(dataset)
+        self.train_data, self.valid_data = datasets
+
+        # force transformers into config
+        self.add_transformers_to_config()
+
+    def get_producer(self):
+        """Start generating the ground truth of new samples of the distribution
+        in the background (see `DataProducer`). Configured through chunk_size,
+        producer_workers, max_chunks, and producer_cache_directory."""
+        config = self.config[0][0]
+        chunk_size = config.get("chunk_size", [65536])[0]
+        trajectory, grav_file = self.get_trajectory([chunk_size])
+        if not hasattr(trajectory, "sample_exterior"):
+            raise ValueError(
+                f"{trajectory.__class__.__name__} can't draw new samples on the fly",
+            )
+
+        return DataProducer(
+            get_ground_truth_fcn(trajectory, grav_file, config),
+            trajectory.sample_exterior,
+            chunk_size,
+            workers=config.get("producer_workers", [1])[0],
+            max_chunks=config.get("max_chunks", [4])[0],
+            cache_directory=config.get("producer_cache_directory", [None])[0],
+            seed=config.get("seed", [42])[0],
+        )
+
+    def from_producer(self):
+        """Train on data generated on the fly rather than waiting for all N_dist
+        samples to be computed. The validation data and the preprocessing are
+        taken from the first chunk, and every epoch then draws N_train new
+        samples from the producer."""
+        config = self.config[0][0]
+        N_train = config["N_train"][0]
+        N_val = config["N_val"][0]
+        self.producer = self.get_producer()
+
+        x, a, u = self.producer.get()
+        if len(x) <= N_val:
+            raise ValueError(f"The first chunk must contain more than {N_val} samples")
+        data_dict = {
+            "x_train": x[N_val:],
+            "a_train": a[N_val:],
+            "u_train": u[N_val:],
+            "x_val": x[:N_val],
+            "a_val": a[:N_val],
+            "u_val": u[:N_val],
+        }
+        print_stats(data_dict["x_train"], "Position")
+        print_stats(data_dict["a_train"], "Acceleration")
+        print_stats(data_dict["u_train"], "Potential")
+
+        train_data, val_data, transformers = self.get_preprocessed_data(data_dict)
+        self.raw_data = data_dict
+        self.transformers = transformers
+
+        x_train, u_train, a_train, laplace_train, curl_train = train_data
+        x_val, u_val, a_val, laplace_val, curl_val = val_data
+        pinn_constraint_fcn = config.get("PINN_constraint_fcn", ["pinn_00"])[0]
+        batch_size = config.get("batch_size", [N_train])[0]
+        dtype = config.get("dtype", [tf.float64])[0]
+
+        def get_values(u, a, laplace, curl):
+            data = select_constraint_data(u, a, laplace, curl, pinn_constraint_fcn)
+            return hstack_2D(data)
+
+        def get_chunk():
+            x, a, u = self.producer.get()
+            a = add_error({"a_train": a}, config.get("acc_noise", [0.0])[0])["a_train"]
+            x, a, u = transform_chunk(x, a, u, self.transformers)
+            return x, get_values(u, a, np.zeros_like(u), np.zeros_like(a))
+
+        first_chunk = (x_train, get_values(u_train, a_train, laplace_train, curl_train))
+        self.train_data = self.generate_online_dataset(
+            first_chunk,
+            get_chunk,
+            N_train,
+            batch_size,
+            dtype=dtype,
+        )
+        self.valid_data = self.generate_tensorflow_dataset(
+            x_val,
+            get_values(u_val, a_val, laplace_val, curl_val),
+            batch_size,
+            shuffle=False,
+            dtype=dtype,
+        )
+
+        # force transformers into config
+        self.add_transformers_to_config()
+
+    def generate_online_dataset(
+        self,
+        first_chunk,
+        get_chunk,
+        N,
+        batch_size,
+        dtype=None,
+    ):
+        """Function which converts chunks of data generated on the fly into a
+        tensorflow Dataset. Each pass over the dataset (epoch) consumes N new
+        samples, beginning with the first chunk."""
+        dtype = tf.as_dtype(dtype if dtype is not None else tf.float32)
+        chunks = [first_chunk]
+        x_dim = first_chunk[0].shape[1]
+        y_dim = first_chunk[1].shape[1]
+        rng = np.random.default_rng(1234)
+
+        def generator():
+            x_batch = np.zeros((0, x_dim))
+            y_batch = np.zeros((0, y_dim))
+            N_epoch = 0
+            while N_epoch < N:
+                x, y = chunks.pop() if len(chunks) > 0 else get_chunk()
+                x, y = x[: N - N_epoch], y[: N - N_epoch]
+                N_epoch += len(x)
+
+                idx = rng.permutation(len(x))
+                x_batch = np.concatenate((x_batch, x[idx]))
+                y_batch = np.concatenate((y_batch, y[idx]))
+                while len(x_batch) >= batch_size:
+                    yield x_batch[:batch_size], y_batch[:batch_size]
+                    x_batch = x_batch[batch_size:]
+                    y_batch = y_batch[batch_size:]
+            if len(x_batch) > 0:
+                yield x_batch, y_batch
+
+        dataset = tf.data.Dataset.from_generator(
+            generator,
+            output_signature=(
+                tf.TensorSpec(shape=(None, x_dim), dtype=dtype),
+                tf.TensorSpec(shape=(None, y_dim), dtype=dtype),
+            ),
+        )
+        dataset = copy_to_gpu(dataset)
+        dataset = dataset.prefetch(tf.data.experimental.AUTOTUNE)
+        return dataset
+
     def from_raw_data(self, x, a, percent_validation=0.1):
         N_train = int(np.round(len(x) * (1.0 - percent_validation)))
         N_val = int(np.round(len(x) * percent_validation))
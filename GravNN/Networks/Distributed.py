@@ -0,0 +1,191 @@
+"""Data-parallel training of the PINNs over several local processes"""
+import json
+import multiprocessing as mp
+import os
+import queue
+import socket
+
+from GravNN.Support.slurm_utils import get_available_cores
+
+
+def get_free_ports(N):
+    """Ports available on localhost (reserved by the OS until the sockets close)"""
+    sockets = []
+    for _ in range(N):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.bind(("localhost", 0))
+        sockets.append(s)
+    ports = [s.getsockname()[1] for s in sockets]
+    for s in sockets:
+        s.close()
+    return ports
+
+
+def get_tf_config(ports, index):
+    """TF_CONFIG of the worker `index` within a cluster of localhost workers"""
+    return json.dumps(
+        {
+            "cluster": {"worker": [f"localhost:{port}" for port in ports]},
+            "task": {"type": "worker", "index": index},
+        },
+    )
+
+
+def is_chief(strategy):
+    """Whether this process is the chief (first worker) of a distribution
+    strategy, which is always the case when training in a single process"""
+    resolver = getattr(strategy, "cluster_resolver", None)
+    if resolver is None:
+        return True
+    return resolver.task_id in (None, 0)
+
+
+def _run_worker(index, tf_config, threads, fcn, args, results):
+    # tensorflow reads these when it is first imported (by fcn)
+    os.environ["TF_CONFIG"] = tf_config
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    result = fcn(*args)
+    if index == 0:
+        results.put(result)
+
+
+def launch_workers(fcn, args=(), workers=2, threads=None):
+    """Run fcn(*args) in separate processes which form a cluster of localhost
+    workers (see `get_tf_config`), e.g. for a MultiWorkerMirroredStrategy.
+
+    Args:
+        fcn (callable): picklable (module level) function run by every worker
+        args (tuple, optional): arguments of fcn. Defaults to ().
+        workers (int, optional): number of worker processes. Defaults to 2.
+        threads (int, optional): tensorflow intra-op threads of each worker.
+            Defaults to the available cores divided among the workers.
+
+    Raises:
+        RuntimeError: if a worker fails
+
+    Returns:
+        object: the value returned by fcn in the chief (first) worker
+    """
+    if threads is None:
+        threads = max(get_available_cores() // workers, 1)
+    ports = get_free_ports(workers)
+
+    # fork is unsafe once tensorflow (or numba) threads have been started
+    context = mp.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=_run_worker,
+            args=(i, get_tf_config(ports, i), threads, fcn, args, results),
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        while True:
+            try:
+                result = results.get(timeout=1.0)
+                break
+            except queue.Empty:
+                if any(p.exitcode not in (None, 0) for p in processes):
+                    raise RuntimeError("A training worker failed")
+                if processes[0].exitcode == 0 and results.empty():
+                    raise RuntimeError("The chief worker returned no result")
+        for process in processes:
+            process.join()
+        if any(p.exitcode != 0 for p in processes):
+            raise RuntimeError("A training worker failed")
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+    return result
+
+
+def shard_dataset(dataset):
+    """Split the batches of a dataset between the workers (rather than the
+    files it would be read from, which the in-memory datasets don't have)"""
+    import tensorflow as tf
+
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = (
+        tf.data.experimental.AutoShardPolicy.DATA
+    )
+    return dataset.with_options(options)
+
+
+def train_worker(config, df_file=None):
+    """Train a PINNGravityModel as one of the workers of a
+    MultiWorkerMirroredStrategy. Every worker generates the same data and
+    processes its share of each (global) batch, the gradients are averaged
+    across workers, and the chief saves the model.
+
+    Returns:
+        dict: configuration of the trained model (chief only)
+    """
+    import tensorflow as tf
+
+    from GravNN.Networks.Data import DataSet
+    from GravNN.Networks.Model import PINNGravityModel
+    from GravNN.Networks.Saver import ModelSaver
+    from GravNN.Networks.utils import (
+        configure_optimizer,
+        configure_tensorflow,
+        populate_config_objects,
+    )
+
+    # the strategy must exist before any tensorflow ops (but after the flags)
+    configure_tensorflow(config)
+    strategy = tf.distribute.MultiWorkerMirroredStrategy()
+    config = populate_config_objects(config)
+
+    # the cross-replica reductions of the optimizer can't be XLA compiled
+    config[0][0]["jit_compile"] = [False]
+
+    # every worker must write checkpoints, but only the chief's are kept
+    chief = is_chief(strategy)
+    checkpoint_dir = config[0][0].get("checkpoint_dir", [None])[0]
+    if checkpoint_dir is not None and not chief:
+        task_id = strategy.cluster_resolver.task_id
+        config[0][0]["checkpoint_dir"] = [f"{checkpoint_dir}/worker_{task_id}"]
+
+    data = DataSet(config)
+    data.train_data = shard_dataset(data.train_data)
+    data.valid_data = shard_dataset(data.valid_data)
+
+    with strategy.scope():
+        model = PINNGravityModel(config)
+        optimizer = configure_optimizer(model.config, mixed_precision=False)
+        model.compile(optimizer=optimizer, loss="mse")
+    history = model.train(data)
+
+    if not chief:
+        return None
+    model.config["val_loss"] = history.history["val_percent_mean"][-1]
+    saver = ModelSaver(model, history)
+    saver.save(df_file=df_file)
+    return model.config
+
+
+def train_distributed(config, workers=2, threads=None, df_file=None):
+    """Train a PINNGravityModel with data-parallelism over local processes.
+
+    Each process trains a replica of the network on 1/workers of every batch
+    with `threads` intra-op threads, which scales further than the intra-op
+    parallelism of a single process for the small networks.
+
+    Args:
+        config (dict): hyperparameters and configuration variables
+        workers (int, optional): number of worker processes. Defaults to 2.
+        threads (int, optional): threads per worker. Defaults to the available
+            cores divided among the workers.
+        df_file (str, optional): dataframe to which the model is added. Defaults
+            to None.
+
+    Returns:
+        dict: configuration of the trained model
+    """
+    return launch_workers(train_worker, (config, df_file), workers, threads)
@@ -0,0 +1,145 @@
+import json
+
+import numpy as np
+
+PREPROCESSING_TYPES = {
+    "Cart2PinesSphLayer": "pines",
+    "ScaleRLayer": "r_scale",
+    "NormalizeRLayer": "r_normalize",
+    "InvRLayer": "r_inv",
+    "FourierFeatureLayer": "fourier",
+}
+
+# layers without weights that are either inactive at inference or whose
+# arithmetic is implied by the network_arch
+PASSIVE_LAYERS = [
+    "InputLayer",
+    "Dropout",
+    "Multiply",
+    "Subtract",
+    "Add",
+    "TFOpLambda",
+    "SlicingOpLambda",
+]
+
+
+def get_weight(layer, name):
+    for weight in layer.weights:
+        if weight.name.split("/")[-1].split(":")[0] == name:
+            return weight.numpy()
+    raise ValueError(f"{layer.name} has no weight {name}")
+
+
+def scalar(value):
+    return float(np.asarray(value).reshape(-1)[0])
+
+
+def export_preprocessing_layer(layer, prefix, weights):
+    kind = PREPROCESSING_TYPES[layer.__class__.__name__]
+    spec = {"type": kind}
+    if kind == "r_scale":
+        spec["ref_radius_max"] = scalar(layer.ref_radius_max)
+    elif kind == "r_normalize":
+        df = layer.feature_max - layer.feature_min
+        dr = layer.ref_radius_max - layer.ref_radius_min
+        scale = df / dr
+        spec["scale"] = scalar(scale)
+        spec["min"] = scalar(layer.feature_min - layer.ref_radius_min * scale)
+    elif kind == "fourier":
+        spec["freq_decay"] = bool(layer.freq_decay)
+        spec["sine_and_cosine"] = bool(layer.sine_and_cosine)
+        for i in range(3):
+            freq_i = 0 if layer.shared_freq else i
+            offset_i = 0 if layer.shared_offset else i
+            weights[f"{prefix}/freq_{i}"] = get_weight(layer, f"freq_{freq_i}").T
+            weights[f"{prefix}/phase_{i}"] = get_weight(layer, f"phase_{offset_i}")
+    return spec
+
+
+def export_model(model, file):
+    """Freeze a trained PINNGravityModel into a compact .npz file which is
+    evaluated without TensorFlow by `GravNN.GravityModels.ExportedPINN`.
+
+    The file holds the dense layer weights, the weights of the preprocessing
+    and analytic layers, the scalings of the x/u/a transformers (i.e. the
+    `PreprocessingLayer` and `PostprocessingLayer` of the model), and a JSON
+    description of the network. Only the "basic" and "custom" network_type
+    with a traditional, residual, or transformer network_arch are supported.
+
+    Args:
+        model (PINNGravityModel): trained model
+        file (str): path of the exported network (.npz)
+    """
+    config = model.config
+    network_type = config["network_type"][0].lower()
+    if network_type not in ["basic", "custom"]:
+        raise ValueError(f"Unsupported network_type {network_type}")
+
+    spec = {
+        "network_arch": config["network_arch"][0].lower(),
+        "encoding_layers": int(config.get("encoding_layers", [2])[0]),
+        "preprocessing": [],
+    }
+    weights = {}
+    for name in ["x", "u", "a"]:
+        transformer = config[f"{name}_transformer"][0]
+        weights[f"{name}_min"] = np.asarray(transformer.min_, dtype=np.float64)
+        weights[f"{name}_scale"] = np.asarray(transformer.scale_, dtype=np.float64)
+
+    N_dense = 0
+    for layer in model.network.layers:
+        class_name = layer.__class__.__name__
+        if class_name in PREPROCESSING_TYPES:
+            prefix = f"preprocessing_{len(spec['preprocessing'])}"
+            layer_spec = export_preprocessing_layer(layer, prefix, weights)
+            spec["preprocessing"].append(layer_spec)
+        elif class_name == "Dense":
+            activation = layer.get_config()["activation"]
+            if N_dense == 0:
+                spec["activation"] = activation
+            elif activation not in ["linear", spec["activation"]]:
+                raise ValueError(f"Mixed activations in {layer.name}")
+            weights[f"dense_{N_dense}/kernel"] = layer.kernel.numpy()
+            weights[f"dense_{N_dense}/bias"] = layer.bias.numpy()
+            N_dense += 1
+        elif class_name == "AnalyticModelLayer":
+            spec["analytic"] = {
+                key: scalar(getattr(layer, key))
+                for key in ["mu", "a", "C20", "c1", "c2"]
+            }
+            weights["analytic/k_external"] = layer.k_external.numpy()
+            weights["analytic/r_external"] = layer.r_external.numpy()
+        elif class_name == "ScaleNNPotential":
+            spec["scale_potential"] = bool(layer.scale_potential)
+            spec["power"] = scalar(layer.power)
+        elif class_name == "FuseModels":
+            spec["fuse"] = scalar(layer.fuse)
+        elif class_name == "EnforceBoundaryConditions":
+            spec["enforce_bc"] = bool(layer.enforce_bc)
+            spec["k"] = scalar(layer.k_init)
+            weights["bc/radius"] = layer.radius.numpy()
+        elif class_name not in PASSIVE_LAYERS:
+            raise ValueError(f"Unsupported layer {layer.name} ({class_name})")
+    spec["dense_layers"] = N_dense
+
+    np.savez(file, spec=np.array(json.dumps(spec)), **weights)
+    return file
+
+
+def main():
+    from GravNN.GravityModels.ExportedPINN import ExportedPINN
+    from GravNN.Networks.Model import load_config_and_model
+
+    df_file = "Data/Dataframes/example.data"
+    config, model = load_config_and_model(df_file, idx=-1)
+    file = export_model(model, f"Data/Networks/{config['id'][0]}/network.npz")
+
+    x = np.random.uniform(-1, 1, size=(1000, 3)) * config["planet"][0].radius * 2
+    a_true = model.compute_acceleration(x).numpy()
+    a = ExportedPINN(file).compute_acceleration(x)
+    a_error = np.linalg.norm(a - a_true, axis=1) / np.linalg.norm(a_true, axis=1)
+    print(f"Max acceleration error: {np.max(a_error)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import dataclasses
+
+import numpy as np
+import tensorflow as tf
+
+from GravNN.Support.BatchIntegrator import MAX_FACTOR, MIN_FACTOR, SAFETY, get_tableau
+
+
+def _get_tableau(method):
+    return {
+        "rk4": get_tableau("RK4"),
+        # the 8th order solution of DOP853 without its error estimate
+        "rk8": dataclasses.replace(get_tableau("DOP853"), E=None, E3=None),
+        "dp45": get_tableau("RK45"),
+    }[method.lower()]
+
+
+def get_acceleration_fcn(model):
+    """In-graph acceleration of a PINNGravityModel in the original units"""
+
+    def acceleration(x):
+        x_input = model.x_preprocessor(x)
+        a_pred = model._pinn_acceleration_output(x_input)
+        return model.a_postprocessor(a_pred)
+
+    return acceleration
+
+
+def get_derivative_fcn(acceleration):
+    def f(y):
+        return tf.concat([y[:, 3:6], acceleration(y[:, 0:3])], axis=1)
+
+    return f
+
+
+def rk_step(f, tableau, y, h, k0):
+    """Single explicit Runge-Kutta step of the [M x 6] states with the [M x 1]
+    steps h. The stages are unrolled when traced."""
+    K = [k0]
+    for s in range(1, tableau.n_stages):
+        A_s = tableau.A[s, :s]
+        dy = tf.add_n([float(a) * K[j] for j, a in enumerate(A_s) if a != 0.0])
+        K.append(f(y + h * dy))
+    dy = tf.add_n([float(b) * K[s] for s, b in enumerate(tableau.B) if b != 0.0])
+    return y + h * dy, K
+
+
+def rms(x):
+    return tf.sqrt(tf.reduce_mean(x**2, axis=1))
+
+
+def select_initial_step(f, y0, f0, order, rtol, atol):
+    """Initial step of each trajectory (see scipy.integrate._ivp.common)"""
+    scale = atol + tf.abs(y0) * rtol
+    d0 = rms(y0 / scale)
+    d1 = rms(f0 / scale)
+    small = (d0 < 1e-5) | (d1 < 1e-5)
+    h0 = tf.where(small, tf.ones_like(d0) * 1e-6, 0.01 * d0 / tf.maximum(d1, 1e-30))
+
+    f1 = f(y0 + h0[:, None] * f0)
+    d2 = rms((f1 - f0) / scale) / h0
+    d_max = tf.maximum(d1, d2)
+    h1 = tf.where(
+        d_max <= 1e-15,
+        tf.maximum(1e-6, h0 * 1e-3),
+        (0.01 / tf.maximum(d_max, 1e-30)) ** (1.0 / (order + 1)),
+    )
+    return tf.minimum(100 * h0, h1)
+
+
+def propagate_fixed(f, tableau, y0, h, n_steps):
+    """Take n_steps[k] steps of h[k] between consecutive output times"""
+    T = n_steps.shape[0] + 1
+    outputs = tf.TensorArray(y0.dtype, size=T, element_shape=y0.shape)
+    outputs = outputs.write(0, y0)
+
+    def interval(k, y, outputs):
+        h_k = h[k]
+
+        def step(i, y):
+            y_new, _ = rk_step(f, tableau, y, h_k, f(y))
+            return i + 1, y_new
+
+        _, y = tf.while_loop(lambda i, y: i < n_steps[k], step, (0, y))
+        return k + 1, y, outputs.write(k + 1, y)
+
+    _, _, outputs = tf.while_loop(
+        lambda k, y, outputs: k < T - 1,
+        interval,
+        (0, y0, outputs),
+    )
+    return outputs.stack(), tf.zeros((y0.shape[0],), dtype=tf.int32)
+
+
+def propagate_adaptive(f, tableau, y0, t_eval, rtol, atol, max_steps):
+    """Dormand-Prince integration with the step of each trajectory controlled
+    independently. Steps are shortened to land on the output times, and a
+    trajectory whose error becomes non-finite, or whose rejected step falls
+    below 10 * eps * |t|, is flagged (status -1) and held."""
+    M = y0.shape[0]
+    dtype = y0.dtype
+    eps = float(np.finfo(dtype.as_numpy_dtype).eps)
+    T = t_eval.shape[0]
+    exponent = -1.0 / (tableau.error_estimator_order + 1)
+
+    f0 = f(y0)
+    h = select_initial_step(f, y0, f0, tableau.error_estimator_order, rtol, atol)
+    t = tf.zeros((M,), dtype=dtype) + t_eval[0]
+    failed = tf.zeros((M,), dtype=tf.bool)
+    outputs = tf.TensorArray(dtype, size=T, element_shape=y0.shape)
+    outputs = outputs.write(0, y0)
+
+    def step(i, t, y, f_y, h, failed, t_target):
+        active = (t < t_target) & ~failed
+        h_i = tf.where(active, tf.minimum(h, t_target - t), tf.zeros_like(h))
+        lands = h_i >= t_target - t
+
+        y_new, K = rk_step(f, tableau, y, h_i[:, None], f_y)
+        f_new = f(y_new)
+        K.append(f_new)
+
+        scale = atol + tf.maximum(tf.abs(y), tf.abs(y_new)) * rtol
+        err = tf.add_n([float(e) * K[s] for s, e in enumerate(tableau.E) if e != 0.0])
+        err = tf.abs(h_i) * rms(err / scale)
+        accept = active & (err < 1.0)
+        too_small = h_i < 10 * eps * tf.maximum(tf.abs(t), 1.0)
+        failed |= active & (~tf.math.is_finite(err) | (~accept & too_small))
+
+        factor = SAFETY * tf.maximum(err, 1e-30) ** exponent
+        factor = tf.where(
+            accept,
+            tf.minimum(MAX_FACTOR, factor),
+            tf.clip_by_value(factor, MIN_FACTOR, 1.0),
+        )
+        h_new = h_i * factor
+        # a step shortened onto an output time doesn't limit the next
+        h_new = tf.where(accept & lands, tf.maximum(h_new, h), h_new)
+        h = tf.where(active & ~failed, h_new, h)
+
+        t = tf.where(accept, tf.where(lands, t_target, t + h_i), t)
+        y = tf.where(accept[:, None], y_new, y)
+        f_y = tf.where(accept[:, None], f_new, f_y)
+        return i + 1, t, y, f_y, h, failed, t_target
+
+    def interval(k, t, y, f_y, h, failed, outputs):
+        t_target = tf.zeros_like(t) + t_eval[k + 1]
+        _, t, y, f_y, h, failed, _ = tf.while_loop(
+            lambda i, t, y, f_y, h, failed, t_target: (i < max_steps)
+            & tf.reduce_any((t < t_target) & ~failed),
+            step,
+            (0, t, y, f_y, h, failed, t_target),
+        )
+        # trajectories out of steps are failures as well
+        failed |= t < t_target
+        y_k = tf.where(failed[:, None], tf.constant(np.nan, dtype=dtype), y)
+        return k + 1, t, y, f_y, h, failed, outputs.write(k + 1, y_k)
+
+    _, _, _, _, _, failed, outputs = tf.while_loop(
+        lambda k, *args: k < T - 1,
+        interval,
+        (0, t, y0, f0, h, failed, outputs),
+    )
+    return outputs.stack(), -tf.cast(failed, tf.int32)
+
+
+def propagate(
+    model,
+    initial_states,
+    t_eval,
+    method="DP45",
+    dt=None,
+    rtol=None,
+    atol=None,
+    max_steps=100000,
+    jit_compile=True,
+):
+    """Propagate a batch of states in the (non-rotating) body frame of a
+    PINNGravityModel entirely in TensorFlow. All steps run inside a single
+    tf.while_loop graph, optionally XLA compiled, which calls the network
+    through `_pinn_acceleration_output` on the positions of all trajectories
+    without returning to NumPy.
+
+    Args:
+        model (PINNGravityModel): gravity model
+        initial_states (np.array): [M x 6] initial states
+        t_eval (np.array): [T] output times, starting at the initial time
+        method (str, optional): "RK4" or "RK8" (fixed step of dt), or "DP45"
+            (adaptive Dormand-Prince). Defaults to "DP45".
+        dt (float, optional): step of the fixed step methods, shortened to
+            divide each output interval. Defaults to None.
+        rtol (float, optional): relative tolerance of DP45. Defaults to None
+            (1e-10, or 1000 times the machine epsilon of the model dtype if
+            larger).
+        atol (float, optional): absolute tolerance of DP45. Defaults to None
+            (same as rtol).
+        max_steps (int, optional): maximum DP45 steps per output interval.
+            Defaults to 100000.
+        jit_compile (bool, optional): XLA compile the propagation. Defaults to True.
+
+    Returns:
+        tuple: states [M x 6 x T], status [M] (0 on success, -1 on failure)
+    """
+    tableau = _get_tableau(method)
+    t_eval = np.asarray(t_eval, dtype=np.float64)
+    y0 = tf.constant(np.reshape(initial_states, (-1, 6)), dtype=model.dtype)
+    # tolerances beyond the precision of the dtype are never met
+    tol = max(1e-10, 1e3 * float(np.finfo(y0.dtype.as_numpy_dtype).eps))
+    rtol = tol if rtol is None else rtol
+    atol = tol if atol is None else atol
+    f = get_derivative_fcn(get_acceleration_fcn(model))
+
+    if tableau.adaptive:
+
+        def fcn(y0):
+            t = tf.constant(t_eval, dtype=model.dtype)
+            return propagate_adaptive(f, tableau, y0, t, rtol, atol, max_steps)
+
+    else:
+        if dt is None:
+            raise ValueError(f"{method} requires a step dt")
+        intervals = np.diff(t_eval)
+        n_steps = np.maximum(np.ceil(intervals / dt), 1).astype(np.int32)
+        h = intervals / n_steps
+
+        def fcn(y0):
+            h_k = tf.constant(h, dtype=model.dtype)
+            return propagate_fixed(f, tableau, y0, h_k, tf.constant(n_steps))
+
+    states, status = tf.function(fcn, jit_compile=jit_compile)(y0)
+    states = np.transpose(states.numpy(), (1, 2, 0))
+    return states, status.numpy()
+
+
+def main():
+    import time
+
+    import pandas as pd
+    from scipy.integrate import solve_ivp
+
+    from GravNN.CelestialBodies.Asteroids import Eros
+    from GravNN.Networks.Model import load_config_and_model
+
+    df = pd.read_pickle("Data/Dataframes/eros_poly_071123.data")
+    model_id = df.id.values[-1]
+    config, model = load_config_and_model(df, model_id)
+
+    planet = Eros()
+    rng = np.random.default_rng(0)
+    r = rng.uniform(2, 4, size=(100, 1)) * planet.radius
+    v = np.sqrt(planet.mu / r)
+    states = np.hstack((r, 0 * r, 0 * r, 0 * v, v, 0 * v))
+    t_eval = np.linspace(0, 24 * 3600, 100)
+
+    start = time.time()
+    y, status = propagate(model, states, t_eval, "DP45")
+    print(f"In-graph DP45: {time.time() - start} s for {len(states)} trajectories")
+
+    def fun(t, x):
+        a = model.compute_acceleration_single(x[0:3])
+        return np.hstack((x[3:6], a[0]))
+
+    start = time.time()
+    sol = solve_ivp(
+        fun,
+        [0, t_eval[-1]],
+        states[0],
+        t_eval=t_eval,
+        rtol=1e-10,
+        atol=1e-10,
+    )
+    print(f"solve_ivp: {time.time() - start} s for 1 trajectory")
+    print(f"Max position difference: {np.max(np.abs(sol.y[0:3] - y[0, 0:3]))} m")
+
+
+if __name__ == "__main__":
+    main()
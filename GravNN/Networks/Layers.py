@@ -448,6 +448,90 @@ class EnforceBoundaryConditions(tf.keras.layers.Layer):
         return config
 
 
+# stacked models (hyperparameter sweeps)
+class StackedDense(tf.keras.layers.Layer):
+    def __init__(self, units, activation, initializers, dtype, **kwargs):
+        """Dense layers of K independent networks evaluated as one. The kernels
+        [K x in x out] and biases [K x 1 x out] of the networks are stacked and
+        applied to [K x N x in] inputs with a single batched matmul.
+
+        Args:
+            units (int): number of units of each network
+            activation (str or callable): activation function
+            initializers (list): K kernel initializers (one per network)
+            dtype (tf.dtype): layer dtype
+        """
+        super(StackedDense, self).__init__(dtype=dtype)
+        self.units = units
+        self.activation = tf.keras.activations.get(activation)
+        self.initializers = initializers
+
+    def build(self, input_shape):
+        def stacked_initializer(shape, dtype=None):
+            # same values as the kernel of a Dense layer with each initializer
+            values = [init(shape[1:], dtype=dtype) for init in self.initializers]
+            return tf.stack(values)
+
+        self.kernel = self.add_weight(
+            "kernel",
+            shape=[len(self.initializers), input_shape[-1], self.units],
+            initializer=stacked_initializer,
+        )
+        self.bias = self.add_weight(
+            "bias",
+            shape=[len(self.initializers), 1, self.units],
+            initializer=tf.keras.initializers.Zeros(),
+        )
+        super(StackedDense, self).build(input_shape)
+
+    def call(self, inputs):
+        x = tf.einsum("kni,kio->kno", inputs, self.kernel) + self.bias
+        return self.activation(x)
+
+    def get_config(self):
+        config = super().get_config().copy()
+        config.update(
+            {
+                "units": self.units,
+                "activation": tf.keras.activations.serialize(self.activation),
+            },
+        )
+        return config
+
+
+class StackedBoundaryConditions(EnforceBoundaryConditions):
+    def __init__(self, K, **kwargs):
+        """EnforceBoundaryConditions of K stacked networks, each with its own
+        radius, applied to the [K*N x ...] outputs of the networks."""
+        super(StackedBoundaryConditions, self).__init__(**kwargs)
+        self.K = K
+
+    def build(self, input_shapes):
+        self.radius = self.add_weight(
+            "radius",
+            shape=[self.K, 1, 1],
+            trainable=self.trainable_tanh,
+            initializer=tf.keras.initializers.Constant(value=self.r_max),
+        )
+        tf.keras.layers.Layer.build(self, input_shapes)
+
+    def call(self, features, u_nn, u_analytic):
+        if not self.enforce_bc:
+            return u_nn
+        r = tf.reshape(features[:, 0:1], (self.K, -1, 1))
+        u_nn = tf.reshape(u_nn, (self.K, -1, 1))
+        u_analytic = tf.reshape(u_analytic, (self.K, -1, 1))
+        h = H(r, self.radius, self.k)
+        g = G(r, self.radius, self.k)
+        u_model = g * u_nn + h * u_analytic
+        return tf.reshape(u_model, (-1, 1))
+
+    def get_config(self):
+        config = super().get_config().copy()
+        config.update({"K": self.K})
+        return config
+
+
 # Experimental
 class FourierFeatureLayer(tf.keras.layers.Layer):
     def __init__(
@@ -8,11 +8,17 @@ import tensorflow as tf
 import GravNN
 from GravNN.Networks import utils
 from GravNN.Networks.Annealing import *
-from GravNN.Networks.Callbacks import SimpleCallback, get_early_stop
+from GravNN.Networks.Callbacks import (
+    CheckpointCallback,
+    SimpleCallback,
+    SweepCallback,
+    get_early_stop,
+)
 from GravNN.Networks.Constraints import *
+from GravNN.Networks.Distributed import is_chief
 from GravNN.Networks.Layers import *
 from GravNN.Networks.Losses import *
-from GravNN.Networks.Networks import load_network
+from GravNN.Networks.Networks import StackedNet, load_network
 from GravNN.Networks.Schedules import get_schedule
 from GravNN.Networks.utils import configure_optimizer
 from GravNN.Support.transformations_tf import convert_losses_to_sph
@@ -52,6 +58,9 @@ class PINNGravityModel(tf.keras.Model):
         self.init_training_steps()
         self.init_preprocessing_layers()
 
+        # traced on the first call to compute_acceleration_single
+        self.single_acceleration_fcn = None
+
     # Initialization Fcns
     def init_preprocessing_layers(self):
         x_transformer = self.config["x_transformer"][0]
@@ -143,7 +152,13 @@ class PINNGravityModel(tf.keras.Model):
         #     N_weights -= 1 if "a" in constraints else 0
 
         constants = list(np.ones((N_weights,)))
-        self.w_loss = tf.Variable(constants, dtype=self.dtype, trainable=False)
+        # averaged over the replicas when training in parallel
+        self.w_loss = tf.Variable(
+            constants,
+            dtype=self.dtype,
+            trainable=False,
+            aggregation=tf.VariableAggregation.MEAN,
+        )
 
     def set_training_kwarg(self, training):
         self.training = tf.convert_to_tensor(training, dtype=tf.bool)
@@ -211,6 +226,11 @@ class PINNGravityModel(tf.keras.Model):
         gradients = tape.gradient(loss, self.network.trainable_variables)
         gradients = self.optimizer.get_unscaled_gradients(gradients)
 
+        # the gradients of the replicas are summed when training in parallel
+        replicas = tf.distribute.get_strategy().num_replicas_in_sync
+        if replicas > 1:
+            gradients = [g / replicas if g is not None else g for g in gradients]
+
         # update the weights
         self.update_w_fcn(
             self.w_loss,
@@ -229,12 +249,14 @@ class PINNGravityModel(tf.keras.Model):
             ],
         )
 
-        return {
+        metrics = {
             "w_loss": loss,
             "loss": tf.reduce_sum(loss_i),
             "percent_mean": tf.reduce_mean(losses.get("acceleration_percent", [0])),
             "percent_max": tf.reduce_max(losses.get("acceleration_percent", [0])),
         }
+        metrics.update(self.get_model_metrics(losses))
+        return self.reduce_replica_metrics(metrics)
 
     def test_step_fcn(self, data):
         x, y = data
@@ -252,13 +274,56 @@ class PINNGravityModel(tf.keras.Model):
 
         losses = MetaLoss(y_hat_dict, y_dict, self.loss_fcn_list)
         loss = tf.reduce_sum([tf.reduce_mean(loss) for loss in losses.values()])
-        return {
+        metrics = {
             "loss": loss,
             "percent_mean": tf.reduce_mean(losses.get("acceleration_percent", [0])),
             "percent_max": tf.reduce_max(losses.get("acceleration_percent", [0])),
         }
+        metrics.update(self.get_model_metrics(losses))
+        return self.reduce_replica_metrics(metrics)
+
+    def get_model_metrics(self, losses):
+        """Additional metrics of the batch losses (none for a single network)"""
+        return {}
+
+    def get_model_callbacks(self):
+        """Additional callbacks of the training (none for a single network)"""
+        return []
+
+    def reduce_replica_metrics(self, metrics):
+        """Combine the metrics of the batch shards of all replicas (keras
+        otherwise only reports those of the first replica)"""
+        if tf.distribute.get_strategy().num_replicas_in_sync == 1:
+            return metrics
+        context = tf.distribute.get_replica_context()
+        for key, value in metrics.items():
+            if key == "percent_max":
+                values = context.all_gather(tf.reshape(value, (1,)), axis=0)
+                metrics[key] = tf.reduce_max(values)
+            else:
+                metrics[key] = context.all_reduce("mean", value)
+        return metrics
+
+    def train(self, data, initialize_optimizer=True, resume=False):
+        """Train the network on the training data of the DataSet.
 
-    def train(self, data, initialize_optimizer=True):
+        If checkpoint_dir is configured, the training is checkpointed every
+        checkpoint_interval epochs (keeping max_checkpoints checkpoints, see
+        `CheckpointCallback`), and resume=True continues from the latest
+        checkpoint in that directory. Datasets of known size are then repeated
+        rather than re-iterated each epoch, so the shuffled order of the
+        skipped epochs is reproduced when resuming.
+
+        Args:
+            data (DataSet): training and validation data
+            initialize_optimizer (bool, optional): compile the model with the
+                configured optimizer if it has none. Defaults to True.
+            resume (bool, optional): continue from the latest checkpoint.
+                Defaults to False.
+
+        Returns:
+            History: training history (including the epochs of the checkpoints)
+        """
         optimizer = self.optimizer
         if initialize_optimizer and optimizer is None:
             optimizer = configure_optimizer(self.config, mixed_precision=False)
@@ -268,22 +333,56 @@ class PINNGravityModel(tf.keras.Model):
         callback = SimpleCallback(
             self.config["batch_size"][0],
             print_interval=self.config.get("print_interval", [10])[0],
+            verbose=is_chief(self.distribute_strategy),
         )
         schedule = get_schedule(self.config)
 
-        callbacks = [callback, schedule]
+        callbacks = [callback, schedule] + self.get_model_callbacks()
         if self.config.get("early_stop", [False])[0]:
             early_stop = get_early_stop(self.config)
             callbacks.append(early_stop)
 
-        history = self.fit(
-            data.train_data,
-            epochs=self.config["epochs"][0],
-            verbose=0,
-            validation_data=data.valid_data,
-            callbacks=callbacks,
-            use_multiprocessing=True,
-        )
+        train_data = data.train_data
+        steps_per_epoch = None
+        initial_epoch = 0
+        checkpoint_dir = self.config.get("checkpoint_dir", [None])[0]
+        if checkpoint_dir is not None:
+            checkpoint = CheckpointCallback(
+                checkpoint_dir,
+                callbacks=list(callbacks),
+                interval=self.config.get("checkpoint_interval", [100])[0],
+                max_to_keep=self.config.get("max_checkpoints", [3])[0],
+            )
+            if resume:
+                initial_epoch = checkpoint.restore(self)
+            # restores the state of the other callbacks, so it must be last
+            callbacks.append(checkpoint)
+
+            steps = int(tf.data.experimental.cardinality(train_data))
+            if steps > 0:
+                train_data = train_data.repeat().skip(initial_epoch * steps)
+                steps_per_epoch = steps
+        elif resume:
+            raise ValueError("Training can only be resumed with a checkpoint_dir")
+
+        try:
+            history = self.fit(
+                train_data,
+                epochs=self.config["epochs"][0],
+                initial_epoch=initial_epoch,
+                steps_per_epoch=steps_per_epoch,
+                verbose=0,
+                validation_data=data.valid_data,
+                callbacks=callbacks,
+                use_multiprocessing=True,
+            )
+        finally:
+            # stop generating the data of an online DataSet once it's unused
+            producer = getattr(data, "producer", None)
+            if producer is not None:
+                producer.stop()
+        if checkpoint_dir is not None:
+            history.history = checkpoint.history
         history.history["time_delta"] = callback.time_delta
 
         return history
@@ -350,6 +449,32 @@ class PINNGravityModel(tf.keras.Model):
     def compute_dU_dxdx(self, x):
         return self._compute_dU_dxdx(x)
 
+    def trace_single_acceleration(self):
+        """Trace and XLA compile the acceleration of a single [1 x 3] position.
+        The pre-traced concrete function bypasses the signature matching and
+        retracing checks of tf.function, which dominate the latency of one
+        position per call (e.g. in solve_ivp). Must be retraced if the
+        preprocessing layers are replaced."""
+        x_spec = tf.TensorSpec(shape=(1, 3), dtype=self.dtype)
+        fcn = tf.function(self._compute_acceleration, jit_compile=True)
+        self.single_acceleration_fcn = fcn.get_concrete_function(x_spec)
+        return self.single_acceleration_fcn
+
+    def compute_acceleration_single(self, x):
+        """Low latency acceleration of a single position, see
+        `trace_single_acceleration`
+
+        Args:
+            x (np.array): [3] or [1 x 3] position
+
+        Returns:
+            np.array: [1 x 3] acceleration
+        """
+        if self.single_acceleration_fcn is None:
+            self.trace_single_acceleration()
+        x = np.asarray(x, dtype=self.dtype).reshape((1, 3))
+        return self.single_acceleration_fcn(x).numpy()
+
     # private functions
     def _compute_acceleration(self, x):
         x_input = self.preprocess(x)
@@ -415,6 +540,166 @@ class PINNGravityModel(tf.keras.Model):
         return jacobian
 
 
+class StackedPINNGravityModel(PINNGravityModel):
+    def __init__(self, configs):
+        """K PINNGravityModels which differ only by their seed and learning rate,
+        trained simultaneously as a single model (see `StackedNet`).
+
+        Every batch is repeated for each of the K networks and their losses are
+        summed, such that the gradients of each network are those of its own
+        loss. The update of each network is then scaled by its learning rate
+        relative to the learning rate of the optimizer (that of the first
+        config). Callbacks such as early stopping or the learning rate schedule
+        monitor the metrics averaged over the networks, while the metrics of
+        each network are recorded as model_loss, model_percent_mean, and
+        model_percent_max (see `SweepCallback`).
+
+        The stacked model is only meant to be trained: the trained networks are
+        evaluated and saved as separate PINNGravityModels (see `split`).
+
+        Args:
+            configs (list): configurations of the K models, including the
+                transformers of their (shared) training data
+        """
+        for config in configs:
+            if config[0][0]["network_type"][0].lower() != "custom":
+                raise ValueError("The stacked models only support CustomNet")
+            if config[0][0]["lr_anneal"][0]:
+                raise ValueError("The stacked models don't support lr_anneal")
+        seeds = [config[0][0]["seed"][0] for config in configs]
+        network = StackedNet(seeds, **configs[0][0][0])
+        super(StackedPINNGravityModel, self).__init__(configs[0], network)
+        self.configs = configs
+        self.K = len(configs)
+        self.init_learning_rates()
+
+        # the sum (rather than the mean) of the losses of the networks
+        self.w_loss.assign(self.w_loss * self.K)
+
+    def init_learning_rates(self):
+        learning_rates = np.array(
+            [config[0][0]["learning_rate"][0] for config in self.configs],
+        )
+        self.lr_scales = None
+        if np.all(learning_rates == learning_rates[0]):
+            return
+
+        # every trainable weight of the StackedNet has a leading axis of size K
+        ratios = learning_rates / learning_rates[0]
+        self.lr_scales = []
+        for var in self.network.trainable_variables:
+            if var.shape[0] != self.K:
+                raise ValueError(f"{var.name} is not stacked")
+            scale = np.reshape(ratios, (-1,) + (1,) * (len(var.shape) - 1))
+            self.lr_scales.append(tf.constant(scale, dtype=var.dtype))
+
+    def tile_data(self, data):
+        x, y = data
+        return tf.tile(x, (self.K, 1)), tf.tile(y, (self.K, 1))
+
+    def train_step_fcn(self, data):
+        data = self.tile_data(data)
+        if self.lr_scales is None:
+            return super(StackedPINNGravityModel, self).train_step_fcn(data)
+
+        # the optimizer steps are proportional to the learning rate
+        variables = self.network.trainable_variables
+        previous = [tf.identity(var) for var in variables]
+        metrics = super(StackedPINNGravityModel, self).train_step_fcn(data)
+        for var, var_0, scale in zip(variables, previous, self.lr_scales):
+            var.assign(var_0 + (var - var_0) * scale)
+        return metrics
+
+    def test_step_fcn(self, data):
+        data = self.tile_data(data)
+        return super(StackedPINNGravityModel, self).test_step_fcn(data)
+
+    def get_model_metrics(self, losses):
+        """Loss and percent error of each of the K networks"""
+
+        def per_model(loss):
+            return tf.reshape(loss, (self.K, -1))
+
+        loss = tf.add_n(
+            [tf.reduce_mean(per_model(loss), axis=1) for loss in losses.values()],
+        )
+        percent = per_model(
+            losses.get("acceleration_percent", tf.zeros((self.K, 1), self.dtype)),
+        )
+        return {
+            "model_loss": loss,
+            "model_percent_mean": tf.reduce_mean(percent, axis=1),
+            "model_percent_max": tf.reduce_max(percent, axis=1),
+        }
+
+    def get_model_callbacks(self):
+        return [SweepCallback()]
+
+    def split_history(self, history, k):
+        split = tf.keras.callbacks.History()
+        split.history = {
+            key.replace("model_", ""): [float(np.asarray(value)[k]) for value in values]
+            for key, values in history.history.items()
+            if "model_" in key
+        }
+        split.history["time_delta"] = history.history["time_delta"]
+        return split
+
+    def split(self, history=None):
+        """Separate the K trained networks into PINNGravityModels
+
+        Args:
+            history (History, optional): history of the training. Defaults to None.
+
+        Returns:
+            tuple: list of the K models, and list of their histories (or None)
+        """
+        stacked_dense = [
+            layer for layer in self.network.layers if isinstance(layer, StackedDense)
+        ]
+        stacked_bc = [
+            layer
+            for layer in self.network.layers
+            if isinstance(layer, StackedBoundaryConditions)
+        ][0]
+
+        models = []
+        histories = None if history is None else []
+        for k, config in enumerate(self.configs):
+            network = load_network(config[0][0])
+            dense = [
+                layer
+                for layer in network.layers
+                if isinstance(layer, tf.keras.layers.Dense)
+            ]
+            if len(dense) != len(stacked_dense):
+                raise ValueError(
+                    f"{len(stacked_dense)} stacked layers can't be split into "
+                    f"{len(dense)} dense layers",
+                )
+            for layer, stacked_layer in zip(dense, stacked_dense):
+                weights = [
+                    stacked_layer.kernel[k].numpy(),
+                    stacked_layer.bias[k, 0].numpy(),
+                ]
+                shapes = [w.shape for w in weights]
+                expected = [w.shape for w in layer.get_weights()]
+                if shapes != expected:
+                    raise ValueError(
+                        f"The weights {shapes} of {stacked_layer.name} don't "
+                        f"match those {expected} of {layer.name}",
+                    )
+                layer.set_weights(weights)
+            for layer in network.layers:
+                if isinstance(layer, EnforceBoundaryConditions):
+                    layer.radius.assign(tf.reshape(stacked_bc.radius[k], [1]))
+
+            models.append(PINNGravityModel(config, network))
+            if history is not None:
+                histories.append(self.split_history(history, k))
+        return models, histories
+
+
 def load_config_and_model(
     df_file,
     model_id=None,  # timestamp of model
@@ -396,6 +396,130 @@ def CustomNet(**kwargs):
     return model
 
 
+def get_stacked_network_fcn(network_type):
+    return {
+        "traditional": stacked_traditional_network,
+        "residual": stacked_residual_network,
+    }[network_type.lower()]
+
+
+def get_stacked_initializers(initializer, seeds, offset):
+    return [get_initalizer_fcn(initializer, seed + offset) for seed in seeds]
+
+
+def stacked_traditional_network(inputs, seeds, **kwargs):
+    """K traditional networks (one per seed) applied to [K x N x F] inputs"""
+    layers = kwargs["layers"][0]
+    activation = kwargs["activation"][0]
+    initializer = kwargs["initializer"][0]
+    final_layer_initializer = kwargs.get("final_layer_initializer", ["glorot_uniform"])[
+        0
+    ]
+    dtype = kwargs["dtype"][0]
+
+    x = inputs
+    for i in range(1, len(layers) - 1):
+        x = StackedDense(
+            units=layers[i],
+            activation=activation,
+            initializers=get_stacked_initializers(initializer, seeds, i),
+            dtype=dtype,
+        )(x)
+    outputs = StackedDense(
+        units=layers[-1],
+        activation="linear",
+        initializers=get_stacked_initializers(final_layer_initializer, seeds, 0),
+        dtype=dtype,
+    )(x)
+    return outputs
+
+
+def stacked_residual_network(inputs, seeds, **kwargs):
+    """K residual networks (one per seed) applied to [K x N x F] inputs"""
+    layers = kwargs["layers"][0]
+    activation = kwargs["activation"][0]
+    initializer = kwargs["initializer"][0]
+    final_layer_initializer = kwargs.get("final_layer_initializer", ["glorot_uniform"])[
+        0
+    ]
+    dtype = kwargs["dtype"][0]
+
+    encoding_layers = kwargs.get("encoding_layers", [2])[0]
+    x = inputs
+    for i in range(0, encoding_layers):
+        x = StackedDense(
+            units=layers[1],
+            activation=activation,
+            initializers=get_stacked_initializers(initializer, seeds, i),
+            dtype=dtype,
+        )(x)
+
+    for i in range(1, len(layers) - 1):
+        shortcut = x
+        x = StackedDense(
+            units=layers[i],
+            activation=activation,
+            initializers=get_stacked_initializers(initializer, seeds, i),
+            dtype=dtype,
+        )(x)
+        # skip connection
+        if i % 3 == 0:
+            x = x + shortcut
+
+    outputs = StackedDense(
+        units=layers[-1],
+        activation="linear",
+        initializers=get_stacked_initializers(final_layer_initializer, seeds, 0),
+        dtype=dtype,
+    )(x)
+    return outputs
+
+
+def StackedNet(seeds, **kwargs):
+    """K CustomNets, differing only by their seed, evaluated as one network.
+
+    The inputs are the [K*N x 3] positions of the K networks (the N positions
+    repeated K times), such that the gradients of each network remain with
+    respect to its own inputs. The preprocessing and analytic model are
+    computed on all rows at once, while the dense layers are StackedDense
+    layers applied to the [K x N x F] features.
+    """
+    layers = kwargs["layers"][0]
+    dtype = kwargs["dtype"][0]
+    K = len(seeds)
+
+    for key in ["batch_norm", "dropout"]:
+        if kwargs.get(key, [False])[0]:
+            raise ValueError(f"{key} is not supported by the stacked networks")
+    if "fourier" in kwargs["preprocessing"][0]:
+        raise ValueError("The stacked networks can't share trainable features")
+
+    preprocess_args = get_preprocess_args(kwargs)
+    preprocess_layers = get_preprocess_layers(kwargs)
+
+    inputs = tf.keras.Input(shape=(layers[0],), dtype=dtype)
+    x = inputs
+    for layer in preprocess_layers:
+        x = layer(**preprocess_args)(x)
+        if layer.__name__ == "Cart2PinesSphLayer":
+            features = x
+
+    x = tf.reshape(x, (K, -1, x.shape[-1]))
+    network_fcn = get_stacked_network_fcn(kwargs["network_arch"][0])
+    u_nn = tf.reshape(network_fcn(x, seeds, **kwargs), (-1, 1))
+
+    p = compute_p(**kwargs)
+    u_analytic = AnalyticModelLayer(**kwargs)(features)
+    u_nn_scaled = ScaleNNPotential(p, **kwargs)(features, u_nn)
+    u_fused = FuseModels(**kwargs)(u_nn_scaled, u_analytic)
+    u = StackedBoundaryConditions(K, **kwargs)(features, u_fused, u_analytic)
+
+    model = tf.keras.Model(inputs=inputs, outputs=u)
+    super(tf.keras.Model, model).__init__(dtype=dtype)
+
+    return model
+
+
 def SeparationNet(**kwargs):
     layers = kwargs["layers"][0]
     dtype = kwargs["dtype"][0]
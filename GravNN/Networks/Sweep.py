@@ -0,0 +1,93 @@
+"""Hyperparameter sweeps which train many small PINNs as one stacked model"""
+from GravNN.Networks.utils import configure_run_args
+
+# hyperparameters which may differ between the stacked models
+SWEEP_KEYS = ["seed", "learning_rate"]
+
+
+def _same(a, b):
+    # unchanged values are shared between the configs of configure_run_args
+    return a is b or repr(a) == repr(b)
+
+
+def group_sweep_configs(configs):
+    """Group the configs which differ only by their SWEEP_KEYS, each group of
+    which can be trained as one StackedPINNGravityModel"""
+    groups = []
+    for config in configs:
+        for group in groups:
+            reference = group[0][0][0]
+            keys = reference.keys() | config[0][0].keys()
+            if all(
+                key in SWEEP_KEYS
+                or (
+                    key in reference
+                    and key in config[0][0]
+                    and _same(reference[key], config[0][0][key])
+                )
+                for key in keys
+            ):
+                group.append(config)
+                break
+        else:
+            groups.append([config])
+    return groups
+
+
+def train_stacked(configs, df_file=None):
+    """Train configs which differ only by their SWEEP_KEYS simultaneously as a
+    StackedPINNGravityModel, then save each of the trained networks as its own
+    model. The models share the training data of the first config.
+
+    Returns:
+        list: configurations of the trained models
+    """
+    from GravNN.Networks.Data import DataSet
+    from GravNN.Networks.Model import StackedPINNGravityModel
+    from GravNN.Networks.Saver import ModelSaver
+    from GravNN.Networks.utils import configure_tensorflow, populate_config_objects
+
+    configure_tensorflow(configs[0])
+    configs = [populate_config_objects(config) for config in configs]
+    if configs[0][0][0]["init_file"][0] is not None:
+        raise ValueError("The stacked models can't be initialized from a file")
+
+    # the data (and its transformers) of the first config is used by all models
+    data = DataSet(configs[0])
+    for config in configs[1:]:
+        for key, value in configs[0][0][0].items():
+            if key not in SWEEP_KEYS:
+                config[0][0][key] = value
+
+    model = StackedPINNGravityModel(configs)
+    history = model.train(data)
+    models, histories = model.split(history)
+    for model_k, history_k in zip(models, histories):
+        saver = ModelSaver(model_k, history_k)
+        saver.save(df_file=df_file)
+        print(f"Model ID: [{model_k.config['id']}]")
+    return [model_k.config for model_k in models]
+
+
+def train_sweep(config, hparams, df_file=None):
+    """Train every combination of the hyperparameters (see
+    `configure_run_args`). Rather than training each configuration on its own,
+    the configurations which differ only by their seed and learning rate are
+    stacked into one model, such that the small networks of a sweep share
+    each training step (and its kernel launches) rather than each using a
+    fraction of the hardware.
+
+    Args:
+        config (dict): default hyperparameters / configuration variables
+        hparams (dict): hyperparameters to permutate
+        df_file (str, optional): dataframe to which the models are added.
+            Defaults to None.
+
+    Returns:
+        list: configurations of the trained models
+    """
+    configs = [args[0] for args in configure_run_args(config, hparams)]
+    results = []
+    for group in group_sweep_configs(configs):
+        results.extend(train_stacked(group, df_file))
+    return results
@@ -1,12 +1,11 @@
 import os
-import tempfile
 
 import numpy as np
 import trimesh
 
 import GravNN
 from GravNN.CelestialBodies.Asteroids import Eros
-from GravNN.GravityModels.Mascons import Mascons
+from GravNN.GravityModels.Mascons import compute_masses
 from GravNN.GravityModels.Polyhedral import Polyhedral
 from GravNN.Support.ProgressBar import ProgressBar
 from GravNN.Trajectories.RandomDist import RandomDist
@@ -50,21 +49,19 @@ class MasconRegressorSequential:
         self.filename = os.path.basename(self.obj_file)
 
     def remove_current_model(self, x, a, mu_list, r_masses):
-        with tempfile.NamedTemporaryFile() as tmpfile:
-            save_data = np.append(mu_list.reshape((-1, 1)), r_masses, axis=1)
-            np.savetxt(
-                tmpfile.name,
-                save_data,
-                delimiter=",",
-            )
-            regressed_model = Mascons(self.planet, tmpfile.name)
-            accelerations = regressed_model.compute_acceleration(x)
-            da = a - accelerations
-            da_percent = np.linalg.norm(da, axis=1) / np.linalg.norm(a, axis=1)
-            da_percent_avg = np.mean(da_percent)
-            brill_mask = np.linalg.norm(x, axis=1) > self.planet.radius
-            print(f"Current model error: {da_percent_avg*100}% \t {len(mu_list)}")
-            print(f"Outside Brillouin Sphere: {np.mean(da_percent[brill_mask]) * 100}")
+        # evaluate the masses directly rather than round-tripping them through
+        # a csv file read by the Mascons model
+        accelerations, _ = compute_masses(
+            np.ascontiguousarray(x, dtype=np.float64).reshape((-1, 3)),
+            np.ascontiguousarray(mu_list, dtype=np.float64).reshape((-1,)),
+            np.ascontiguousarray(np.transpose(r_masses), dtype=np.float64),
+        )
+        da = a - accelerations
+        da_percent = np.linalg.norm(da, axis=1) / np.linalg.norm(a, axis=1)
+        da_percent_avg = np.mean(da_percent)
+        brill_mask = np.linalg.norm(x, axis=1) > self.planet.radius
+        print(f"Current model error: {da_percent_avg*100}% \t {len(mu_list)}")
+        print(f"Outside Brillouin Sphere: {np.mean(da_percent[brill_mask]) * 100}")
         return da
 
     def batches(self, batch_size):
@@ -6,12 +6,12 @@ from numba import njit
 from GravNN.GravityModels.SphericalHarmonics import SphericalHarmonics
 from GravNN.Regression.utils import *
 from GravNN.Regression.utils import (
-    compute_A,
     compute_euler,
     getK,
     save,
 )
 from GravNN.Support.ProgressBar import ProgressBar
+from GravNN.Support.SHFiles import triangular_index
 
 
 def iterate_lstsq(M, aVec, iterations):
@@ -24,6 +24,18 @@ def iterate_lstsq(M, aVec, iterations):
     return results
 
 
+@njit(cache=True)
+def compute_A_packed(A, n1, n2, u, N):
+    """`compute_A` for packed lower-triangular A, n1, and n2 (A[n, m] is stored
+    at n * (n + 1) / 2 + m) up to degree N + 1"""
+    for n in range(1, N + 2):
+        i = n * (n + 1) // 2
+        A[i + n - 1] = np.sqrt(((2.0 * n) * getK(n - 1.0)) / getK(n)) * A[i + n] * u
+        for m in range(0, n - 1):
+            A[i + m] = u * n1[i + m] * A[i + m - n] - n2[i + m] * A[i + m - 2 * n + 1]
+    return A
+
+
 @njit(cache=True)  # , parallel=True)
 def populate_H_singular(rVec1D, A, n1, n2, N, a, mu, remove_deg):
     P = len(rVec1D)
@@ -35,11 +47,13 @@ def populate_H_singular(rVec1D, A, n1, n2, N, a, mu, remove_deg):
     s, t, u = rVal / rMag
 
     # populate variables
-    A = compute_A(A, n1, n2, u)
+    A = compute_A_packed(A, n1, n2, u, N)
     rE, iM, rho = compute_euler(N, a, mu, rMag, s, t)
 
     # NOTE: NO ESTIMATION OF C00, C10, C11 -- THESE ARE DETERMINED ALREADY
     for n in range(k + 1, N + 1):
+        i = n * (n + 1) // 2  # A[n, 0]
+        j = i + n + 1  # A[n + 1, 0]
         for m in range(0, n + 1):
             delta_m = 1 if (m == 0) else 0
             delta_m_p1 = 1 if (m + 1 == 0) else 0
@@ -69,35 +83,35 @@ def populate_H_singular(rVec1D, A, n1, n2, N, a, mu, remove_deg):
 
             # Pines Derivatives -- but rho n+1 rather than n+2
             f_Cnm_1 = (rho[n + 1] / a) * (
-                m * A[n, m] * rTerm - s * c2 * A[n + 1, m + 1] * rE[m]
+                m * A[i + m] * rTerm - s * c2 * A[j + m + 1] * rE[m]
             )
             f_Cnm_2 = (rho[n + 1] / a) * (
-                -m * A[n, m] * iTerm - t * c2 * A[n + 1, m + 1] * rE[m]
+                -m * A[i + m] * iTerm - t * c2 * A[j + m + 1] * rE[m]
             )
 
             if m < n:
                 f_Cnm_3 = (
                     (rho[n + 1] / a)
-                    * (c1 * A[n, m + 1] - u * c2 * A[n + 1, m + 1])
+                    * (c1 * A[i + m + 1] - u * c2 * A[j + m + 1])
                     * rE[m]
                 )
             else:
-                f_Cnm_3 = (rho[n + 1] / a) * (-1.0 * u * c2 * A[n + 1, m + 1]) * rE[m]
+                f_Cnm_3 = (rho[n + 1] / a) * (-1.0 * u * c2 * A[j + m + 1]) * rE[m]
 
             f_Snm_1 = (rho[n + 1] / a) * (
-                m * A[n, m] * iTerm - s * c2 * A[n + 1, m + 1] * iM[m]
+                m * A[i + m] * iTerm - s * c2 * A[j + m + 1] * iM[m]
             )
             f_Snm_2 = (rho[n + 1] / a) * (
-                m * A[n, m] * rTerm - t * c2 * A[n + 1, m + 1] * iM[m]
+                m * A[i + m] * rTerm - t * c2 * A[j + m + 1] * iM[m]
             )
             if m < n:
                 f_Snm_3 = (
                     (rho[n + 1] / a)
-                    * (c1 * A[n, m + 1] - u * c2 * A[n + 1, m + 1])
+                    * (c1 * A[i + m + 1] - u * c2 * A[j + m + 1])
                     * iM[m]
                 )
             else:
-                f_Snm_3 = (rho[n + 1] / a) * (-1.0 * u * c2 * A[n + 1, m + 1]) * iM[m]
+                f_Snm_3 = (rho[n + 1] / a) * (-1.0 * u * c2 * A[j + m + 1]) * iM[m]
 
             degIdx = (n + 1) * (n) - (k + 2) * (k + 1)
 
@@ -155,10 +169,11 @@ class SHRegression:
         self.iM = np.zeros((self.N + 2,))
         self.rho = np.zeros((self.N + 3,))
 
-        self.A = np.zeros((self.N + 2, self.N + 2))
-
-        self.n1 = np.zeros((self.N + 2, self.N + 2))
-        self.n2 = np.zeros((self.N + 2, self.N + 2))
+        # packed lower-triangular tables, A[i, m] is stored at i * (i + 1) / 2 + m
+        size = (self.N + 2) * (self.N + 3) // 2
+        self.A = np.zeros((size,))
+        self.n1 = np.zeros((size,))
+        self.n2 = np.zeros((size,))
         self.init_calculations()
         self.count_total_coefficients()
         self.compute_kaula_matrix()
@@ -170,20 +185,21 @@ class SHRegression:
 
     def init_calculations(self):
         for i in range(0, self.N + 2):
+            ii = triangular_index(i, i)
             if i == 0:
-                self.A[i, i] = 1.0
+                self.A[ii] = 1.0
             else:
-                self.A[i, i] = (
+                self.A[ii] = (
                     np.sqrt((2.0 * i + 1.0) * getK(i) / (2.0 * i * getK(i - 1)))
-                    * self.A[i - 1, i - 1]
+                    * self.A[triangular_index(i - 1, i - 1)]
                 )
 
             for m in range(0, i + 1):  # Check the plus one
                 if i >= m + 2:
-                    self.n1[i, m] = np.sqrt(
+                    self.n1[triangular_index(i, m)] = np.sqrt(
                         ((2.0 * i + 1.0) * (2.0 * i - 1.0)) / ((i - m) * (i + m)),
                     )
-                    self.n2[i, m] = np.sqrt(
+                    self.n2[triangular_index(i, m)] = np.sqrt(
                         ((i + m - 1.0) * (2.0 * i + 1.0) * (i - m - 1.0))
                         / ((i + m) * (i - m) * (2.0 * i - 3.0)),
                     )
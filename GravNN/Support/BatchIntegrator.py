@@ -0,0 +1,265 @@
+import dataclasses
+
+import numpy as np
+from scipy.integrate import DOP853, RK45
+
+# step size control of scipy.integrate.solve_ivp
+SAFETY = 0.9
+MIN_FACTOR = 0.2
+MAX_FACTOR = 10.0
+
+
+@dataclasses.dataclass
+class Tableau:
+    """Butcher tableau of an explicit Runge-Kutta method"""
+
+    A: np.ndarray
+    B: np.ndarray
+    C: np.ndarray
+    E: np.ndarray = None  # embedded error estimate (FSAL stage included)
+    E3: np.ndarray = None  # secondary error estimate of DOP853
+    error_estimator_order: int = None
+
+    @property
+    def adaptive(self):
+        return self.E is not None
+
+    @property
+    def n_stages(self):
+        return len(self.B)
+
+
+def get_tableau(method):
+    if method == "RK4":
+        return Tableau(
+            A=np.array(
+                [
+                    [0.0, 0.0, 0.0, 0.0],
+                    [0.5, 0.0, 0.0, 0.0],
+                    [0.0, 0.5, 0.0, 0.0],
+                    [0.0, 0.0, 1.0, 0.0],
+                ],
+            ),
+            B=np.array([1.0, 2.0, 2.0, 1.0]) / 6.0,
+            C=np.array([0.0, 0.5, 0.5, 1.0]),
+        )
+    if method == "RK45":
+        return Tableau(
+            A=RK45.A,
+            B=RK45.B,
+            C=RK45.C,
+            E=RK45.E,
+            error_estimator_order=RK45.error_estimator_order,
+        )
+    if method == "DOP853":
+        return Tableau(
+            A=DOP853.A,
+            B=DOP853.B,
+            C=DOP853.C,
+            E=DOP853.E5,
+            E3=DOP853.E3,
+            error_estimator_order=DOP853.error_estimator_order,
+        )
+    raise ValueError(f"Unknown method {method}")
+
+
+@dataclasses.dataclass
+class BatchSolution:
+    """States of M trajectories at the evaluation times
+
+    Attributes:
+        t (np.array): [T] evaluation times
+        y (np.array): [M x n x T] states, NaN after a trajectory failed
+        status (np.array): [M] 0 if the trajectory reached the final time, -1 if
+            the step size became too small or the state was non-finite
+        nfev (int): number of (vectorized) calls to the right hand side
+        nsteps (np.array): [M] accepted steps of each trajectory
+    """
+
+    t: np.ndarray
+    y: np.ndarray
+    status: np.ndarray
+    nfev: int
+    nsteps: np.ndarray
+
+    @property
+    def success(self):
+        return self.status == 0
+
+
+def rms(x):
+    return np.sqrt(np.mean(x**2, axis=1))
+
+
+def select_initial_step(fun, t0, y0, f0, order, rtol, atol):
+    """Initial step of each trajectory (see scipy.integrate._ivp.common)"""
+    scale = atol + np.abs(y0) * rtol
+    d0 = rms(y0 / scale)
+    d1 = rms(f0 / scale)
+    h0 = np.where((d0 < 1e-5) | (d1 < 1e-5), 1e-6, 0.01 * d0 / np.maximum(d1, 1e-300))
+
+    y1 = y0 + h0[:, None] * f0
+    f1 = fun(t0 + h0, y1)
+    d2 = rms((f1 - f0) / scale) / h0
+
+    d_max = np.maximum(d1, d2)
+    h1 = np.where(
+        d_max <= 1e-15,
+        np.maximum(1e-6, h0 * 1e-3),
+        (0.01 / np.maximum(d_max, 1e-300)) ** (1.0 / (order + 1)),
+    )
+    return np.minimum(100 * h0, h1)
+
+
+def error_norm(tableau, K, h, scale):
+    """Weighted RMS of the local error estimate of each trajectory"""
+    err = np.einsum("s,smn->mn", tableau.E, K) / scale
+    if tableau.E3 is None:
+        return np.abs(h) * rms(err)
+
+    # DOP853 blends the 5th and 3rd order estimates
+    err3 = np.einsum("s,smn->mn", tableau.E3, K) / scale
+    err5_norm_2 = np.sum(err**2, axis=1)
+    err3_norm_2 = np.sum(err3**2, axis=1)
+    denom = err5_norm_2 + 0.01 * err3_norm_2
+    denom = np.where(denom == 0.0, 1.0, denom)
+    return np.abs(h) * err5_norm_2 / np.sqrt(denom * K.shape[-1])
+
+
+def solve_ivp_batch(
+    fun,
+    t_span,
+    y0,
+    method="RK45",
+    t_eval=None,
+    rtol=1e-3,
+    atol=1e-6,
+    first_step=None,
+    max_step=np.inf,
+):
+    """Integrate M initial value problems at once, each with its own step size.
+
+    Every stage of the Runge-Kutta method evaluates the right hand side of all
+    trajectories that haven't finished in a single call, such that the gravity
+    model is evaluated on [M x 3] positions rather than one position per call
+    (as with scipy.integrate.solve_ivp). The adaptive methods accept or reject
+    the step of each trajectory independently, and the steps are shortened to
+    land on the evaluation times.
+
+    Args:
+        fun (callable): right hand side fun(t, y) of the [M] times and [M x n]
+            states, returning the [M x n] derivatives
+        t_span (tuple): initial and final time (t0 < tf)
+        y0 (np.array): [M x n] initial states
+        method (str, optional): "RK45" or "DOP853" (adaptive, see
+            scipy.integrate.solve_ivp) or "RK4" (fixed step of first_step).
+            Defaults to "RK45".
+        t_eval (np.array, optional): times at which the states are stored.
+            Defaults to the initial and final time.
+        rtol (float, optional): relative tolerance. Defaults to 1e-3.
+        atol (float, optional): absolute tolerance. Defaults to 1e-6.
+        first_step (float, optional): initial step, or the step of the fixed
+            step methods. Defaults to None (selected per trajectory).
+        max_step (float, optional): maximum step. Defaults to np.inf.
+
+    Returns:
+        BatchSolution: states at the evaluation times
+    """
+    tableau = get_tableau(method)
+    if not tableau.adaptive and first_step is None:
+        raise ValueError(f"{method} requires a first_step")
+    t0, tf = t_span
+    if tf <= t0:
+        raise ValueError("Only forward integration (t0 < tf) is supported")
+    if t_eval is None:
+        t_eval = np.array([t0, tf])
+    t_eval = np.asarray(t_eval, dtype=np.float64)
+
+    y0 = np.atleast_2d(np.asarray(y0, dtype=np.float64))
+    M, n = y0.shape
+    y_eval = np.full((M, n, len(t_eval)), np.nan)
+    y_eval[:, :, t_eval == t0] = y0[:, :, None]
+    status = np.zeros((M,), dtype=int)
+    nsteps = np.zeros((M,), dtype=int)
+
+    # times on which the steps must land, and their column in y_eval (or -1)
+    stops = np.unique(np.append(t_eval[(t_eval > t0) & (t_eval < tf)], tf))
+    columns = np.searchsorted(t_eval, stops)
+    columns[columns == len(t_eval)] = -1
+    columns = np.where(t_eval[columns] == stops, columns, -1)
+    stop_idx = np.zeros((M,), dtype=int)
+
+    t = np.full((M,), float(t0))
+    y = y0.copy()
+    f = fun(t, y)
+    nfev = 1
+    if first_step is not None:
+        h = np.full((M,), float(first_step))
+    else:
+        order = tableau.error_estimator_order
+        h = select_initial_step(fun, t, y, f, order, rtol, atol)
+        nfev += 1
+    h = np.minimum(h, max_step)
+
+    K = np.empty((tableau.n_stages + 1, M, n))
+    active = np.ones((M,), dtype=bool)
+    while np.any(active):
+        idx = np.nonzero(active)[0]
+        t_i, y_i, f_i, h_prev = t[idx], y[idx], f[idx], h[idx]
+
+        # shorten the step to land on the next evaluation time (or tf)
+        t_next = stops[stop_idx[idx]]
+        h_i = np.minimum(h_prev, t_next - t_i)
+        lands = h_i == t_next - t_i
+
+        K_i = K[:, : len(idx)]
+        K_i[0] = f_i
+        for s in range(1, tableau.n_stages):
+            dy = np.einsum("s,smn->mn", tableau.A[s, :s], K_i[:s]) * h_i[:, None]
+            K_i[s] = fun(t_i + tableau.C[s] * h_i, y_i + dy)
+        dy = np.einsum("s,smn->mn", tableau.B, K_i[: tableau.n_stages])
+        y_new = y_i + h_i[:, None] * dy
+        t_new = np.where(lands, t_next, t_i + h_i)
+        f_new = fun(t_new, y_new)
+        K_i[tableau.n_stages] = f_new
+        nfev += tableau.n_stages
+
+        if tableau.adaptive:
+            scale = atol + np.maximum(np.abs(y_i), np.abs(y_new)) * rtol
+            err = error_norm(tableau, K_i, h_i, scale)
+            accept = err < 1.0
+            with np.errstate(divide="ignore"):
+                factor = SAFETY * err ** (-1.0 / (tableau.error_estimator_order + 1))
+            factor = np.where(
+                accept,
+                np.minimum(MAX_FACTOR, factor),
+                np.clip(factor, MIN_FACTOR, 1.0),
+            )
+            h_new = h_i * factor
+            # a step shortened onto an evaluation time doesn't limit the next
+            h_new = np.where(accept & lands, np.maximum(h_new, h_prev), h_new)
+            h[idx] = np.minimum(h_new, max_step)
+        else:
+            accept = np.ones((len(idx),), dtype=bool)
+
+        finite = np.all(np.isfinite(y_new), axis=1) & np.all(np.isfinite(f_new), axis=1)
+        too_small = h[idx] < 10 * np.finfo(float).eps * np.maximum(np.abs(t_i), 1.0)
+        status[idx[~finite | (~accept & too_small)]] = -1
+        accept &= finite
+
+        acc_idx = idx[accept]
+        t[acc_idx] = t_new[accept]
+        y[acc_idx] = y_new[accept]
+        f[acc_idx] = f_new[accept]
+        nsteps[acc_idx] += 1
+
+        # store the states of the trajectories that landed on an evaluation time
+        landed = acc_idx[lands[accept]]
+        column = columns[stop_idx[landed]]
+        stored = column >= 0
+        y_eval[landed[stored], :, column[stored]] = y[landed[stored]]
+        stop_idx[landed] += 1
+
+        active = (stop_idx < len(stops)) & (status == 0)
+
+    return BatchSolution(t_eval, y_eval, status, nfev, nsteps)
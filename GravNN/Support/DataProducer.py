@@ -0,0 +1,184 @@
+import os
+import queue
+import threading
+
+import numpy as np
+
+from GravNN.Support.storage import array_exists, load_array, save_arrays
+
+
+class DataProducer:
+    def __init__(
+        self,
+        compute_fcn,
+        sample_fcn,
+        chunk_size,
+        workers=1,
+        max_chunks=4,
+        cache_directory=None,
+        seed=None,
+    ):
+        """Generate ground truth data in the background while it is consumed
+        (e.g. by the training of a network).
+
+        Worker threads repeatedly sample chunk_size new positions, evaluate the
+        gravity model on them, and place the chunks in a queue of at most
+        max_chunks chunks, such that the consumer can start as soon as the first
+        chunk is available rather than after all of the data has been computed.
+        Each chunk draws its samples from its own random stream (derived from
+        the seed and the chunk index), so the chunks don't depend on the number
+        of workers.
+
+        If a cache directory is given, a separate thread saves every chunk
+        (x_i, a_i, u_i) within it, and the chunks that were saved by a previous
+        producer are replayed before any new chunks are generated.
+
+        Args:
+            compute_fcn (callable): returns the accelerations [N x 3] and
+                potentials [N] of the [N x 3] positions (e.g. the first two
+                outputs of GravityModelBase.compute_all)
+            sample_fcn (callable): sample_fcn(N, rng) returns up to N positions
+                drawn with the numpy Generator rng
+            chunk_size (int): number of positions sampled per chunk
+            workers (int, optional): number of worker threads. Defaults to 1.
+            max_chunks (int, optional): maximum number of chunks waiting to be
+                consumed. Defaults to 4.
+            cache_directory (str, optional): directory in which the chunks are
+                saved. Defaults to None (not saved).
+            seed (int, optional): seed of the samples. Defaults to None.
+        """
+        self.compute_fcn = compute_fcn
+        self.sample_fcn = sample_fcn
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.cache_directory = cache_directory
+        if cache_directory is not None:
+            self.cache_directory = os.path.join(cache_directory, "")
+        self.seed = np.random.SeedSequence(seed).entropy
+
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._cache_queue = queue.Queue()
+        self._stop = threading.Event()
+        self._replayed = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._writer = None
+        self._error = None
+
+        self.cached_chunks = self.count_cached_chunks()
+        self._next_chunk = self.cached_chunks
+        self.start()
+
+    def count_cached_chunks(self):
+        if self.cache_directory is None:
+            return 0
+        N_chunks = 0
+        while array_exists(self.cache_directory, f"u_{N_chunks}"):
+            N_chunks += 1
+        return N_chunks
+
+    def start(self):
+        for target in [self._replay] + [self._produce] * self.workers:
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.cache_directory is not None:
+            self._writer = threading.Thread(target=self._write, daemon=True)
+            self._writer.start()
+        return self
+
+    def generate_chunk(self, index):
+        rng = np.random.default_rng([self.seed, index])
+        x = self.sample_fcn(self.chunk_size, rng)
+        a, u = self.compute_fcn(x)
+        return x, np.reshape(a, (-1, 3)), np.reshape(u, (-1,))
+
+    def _put(self, chunk):
+        # give up when stopped rather than blocking on a full queue forever
+        while not self._stop.is_set():
+            try:
+                self._queue.put(chunk, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _replay(self):
+        try:
+            for i in range(self.cached_chunks):
+                chunk = tuple(
+                    load_array(self.cache_directory, f"{name}_{i}", mmap_mode=None)
+                    for name in ["x", "a", "u"]
+                )
+                if not self._put(chunk):
+                    return
+        finally:
+            self._replayed.set()
+
+    def _produce(self):
+        self._replayed.wait()
+        try:
+            while not self._stop.is_set():
+                with self._lock:
+                    index = self._next_chunk
+                    self._next_chunk += 1
+                chunk = self.generate_chunk(index)
+                if self.cache_directory is not None:
+                    self._cache_queue.put((index, chunk))
+                if not self._put(chunk):
+                    return
+        except Exception as e:
+            self._error = e
+            self._stop.set()
+
+    def _write(self):
+        while not (self._stop.is_set() and self._cache_queue.empty()):
+            try:
+                index, (x, a, u) = self._cache_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            # the potential is written last, marking the chunk as complete
+            save_arrays(self.cache_directory, {f"x_{index}": x, f"a_{index}": a})
+            save_arrays(self.cache_directory, {f"u_{index}": u})
+
+    def get(self, timeout=None):
+        """Return the next chunk (x, a, u), waiting until one is available
+
+        Raises:
+            RuntimeError: if a worker failed to generate a chunk, or the
+                producer was stopped and no chunks remain
+        """
+        while True:
+            if self._error is not None:
+                raise RuntimeError("Data generation failed") from self._error
+            try:
+                return self._queue.get(timeout=0.1 if timeout is None else timeout)
+            except queue.Empty:
+                if self._error is None and self._stop.is_set():
+                    raise RuntimeError("The producer was stopped")
+                if timeout is not None:
+                    raise
+
+    def chunks(self, N=None):
+        """Yield N chunks (or indefinitely)"""
+        i = 0
+        while N is None or i < N:
+            yield self.get()
+            i += 1
+
+    def stop(self):
+        """Stop generating chunks, and wait for the cached chunks to be saved"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        # only once no more chunks can be queued for the writer
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,237 @@
+import asyncio
+import dataclasses
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+
+@dataclasses.dataclass
+class Request:
+    """Positions awaiting evaluation along with the future of their values"""
+
+    positions: np.ndarray
+    quantity: str
+    future: Future
+
+
+class EvaluationServer:
+    def __init__(self, model, max_batch=4096, max_delay=5e-4, clients=0):
+        """Local evaluation service which coalesces concurrent requests to a
+        gravity model (e.g. one position per call from many propagators) into
+        micro-batches evaluated by a single call to the model's batch kernel or
+        TF graph.
+
+        Requests are submitted from any number of threads (`compute_acceleration`,
+        `compute_potential`), coroutines (`compute_acceleration_async`), or
+        processes connected through `listen` (see `RemoteModel`). A dispatch
+        thread takes the first pending request and gathers further requests until
+        max_batch positions are pending, requests from all expected clients are
+        pending, or max_delay seconds have elapsed. The model is only ever called
+        from the dispatch thread.
+
+        Args:
+            model (GravityModelBase or PINNGravityModel): model providing batched
+                compute_acceleration / compute_potential methods
+            max_batch (int, optional): maximum number of positions per batch.
+                Defaults to 4096.
+            max_delay (float, optional): latency deadline [s] of the first
+                request of a batch. Defaults to 5e-4.
+            clients (int, optional): number of in-process clients, each with at
+                most one pending request (e.g. propagator threads). A batch is
+                dispatched without waiting for the deadline once every client has
+                a pending request. Remote connections are counted automatically.
+                Defaults to 0 (always wait for the deadline or max_batch).
+        """
+        self.model = model
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.clients = clients
+        self.batch_sizes = []
+
+        self._queue = queue.Queue()
+        self._remote_clients = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._listener = None
+        self.start()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, positions, quantity="acceleration"):
+        """Queue an [N x 3] array of positions and return the future of its
+        values (see `compute_acceleration` and `compute_potential`)"""
+        if quantity not in ("acceleration", "potential"):
+            raise ValueError(f"Unknown quantity {quantity}")
+        positions = np.asarray(positions).reshape((-1, 3))
+        future = Future()
+        self._queue.put(Request(positions, quantity, future))
+        return future
+
+    def compute_acceleration(self, positions):
+        return self.submit(positions, "acceleration").result()
+
+    def compute_potential(self, positions):
+        return self.submit(positions, "potential").result()
+
+    async def compute_acceleration_async(self, positions):
+        return await asyncio.wrap_future(self.submit(positions, "acceleration"))
+
+    async def compute_potential_async(self, positions):
+        return await asyncio.wrap_future(self.submit(positions, "potential"))
+
+    def _expected_clients(self):
+        with self._lock:
+            return self.clients + self._remote_clients
+
+    def _dispatch_loop(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            requests = [request]
+            N = len(request.positions)
+            deadline = time.perf_counter() + self.max_delay
+            stop = False
+            while N < self.max_batch and len(requests) != self._expected_clients():
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                requests.append(request)
+                N += len(request.positions)
+            self._evaluate(requests)
+            if stop:
+                return
+
+    def _evaluate(self, requests):
+        """Evaluate each quantity of the pending requests in a single call"""
+        for quantity in ("acceleration", "potential"):
+            batch = [request for request in requests if request.quantity == quantity]
+            if len(batch) == 0:
+                continue
+            positions = np.concatenate([request.positions for request in batch])
+            self.batch_sizes.append(len(positions))
+            try:
+                compute_fcn = getattr(self.model, f"compute_{quantity}")
+                values = np.asarray(compute_fcn(positions))
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            start = 0
+            for request in batch:
+                end = start + len(request.positions)
+                request.future.set_result(values[start:end])
+                start = end
+
+    def listen(self, address):
+        """Accept requests from other processes on a Unix socket (see
+        `RemoteModel`). Each connection is served by its own thread."""
+        if os.path.exists(address):
+            os.remove(address)
+        self._listener = Listener(address, family="AF_UNIX")
+        thread = threading.Thread(target=self._accept_loop, daemon=True)
+        thread.start()
+        return address
+
+    def _accept_loop(self):
+        while True:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                return  # listener closed
+            thread = threading.Thread(
+                target=self._serve_connection,
+                args=(connection,),
+                daemon=True,
+            )
+            thread.start()
+
+    def _serve_connection(self, connection):
+        with self._lock:
+            self._remote_clients += 1
+        try:
+            while True:
+                try:
+                    quantity, positions = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    values = self.submit(positions, quantity).result()
+                    connection.send((True, values))
+                except Exception as e:
+                    connection.send((False, e))
+        finally:
+            with self._lock:
+                self._remote_clients -= 1
+            connection.close()
+
+    def shutdown(self):
+        if self._listener is not None:
+            address = self._listener.address
+            self._listener.close()
+            self._listener = None
+            if os.path.exists(address):
+                os.remove(address)
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+
+class RemoteModel:
+    def __init__(self, address):
+        """Client of an `EvaluationServer` listening on a Unix socket, exposing
+        the compute_acceleration / compute_potential interface of the served
+        model (e.g. for `TrajectoryPropagator` in another process)
+
+        Args:
+            address (str): path of the socket passed to `EvaluationServer.listen`
+        """
+        self.address = address
+        self.connection = Client(address, family="AF_UNIX")
+
+    def request(self, quantity, positions):
+        positions = np.asarray(positions, dtype=np.float64).reshape((-1, 3))
+        self.connection.send((quantity, positions))
+        success, values = self.connection.recv()
+        if not success:
+            raise values
+        return values
+
+    def compute_acceleration(self, positions):
+        return self.request("acceleration", positions)
+
+    def compute_potential(self, positions):
+        return self.request("potential", positions)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,188 @@
+import os
+
+import numpy as np
+
+
+def triangular_size(degree):
+    """Number of (l, m) pairs with 0 <= m <= l <= degree"""
+    return (degree + 1) * (degree + 2) // 2
+
+
+def triangular_index(l, m):  # noqa: E741
+    """Position of the (l, m) coefficient within a packed lower-triangular array"""
+    return l * (l + 1) // 2 + m
+
+
+def triangular_degree(size):
+    """Maximum degree of a packed lower-triangular array of the given size"""
+    return int(np.sqrt(2 * size)) - 1
+
+
+def pack_triangular(dense):
+    """Packed lower triangle (ordered by degree, then order) of a dense [L+1 x L+1]
+    array"""
+    return dense[np.tril_indices(len(dense))]
+
+
+def unpack_triangular(packed, degree):
+    """Dense [L+1 x L+1] array (zero upper triangle) of a packed lower triangle"""
+    dense = np.zeros((degree + 1, degree + 1))
+    dense[np.tril_indices(degree + 1)] = packed[: triangular_size(degree)]
+    return dense
+
+
+def read_sh_text(file, max_degree=None):
+    """Vectorized parser of a csv (or whitespace delimited) file of Stokes
+    coefficients, whose optional first row contains the reference radius and
+    gravitational parameter. Rows are ordered by degree and list l, m, C_lm, S_lm
+    (further columns are ignored).
+
+    Args:
+        file (str): path to the coefficients
+        max_degree (int, optional): stop reading beyond this degree. Defaults to
+            None (entire file).
+
+    Returns:
+        tuple: mu (or None), radius (or None), C_lm, S_lm
+    """
+    mu = None
+    radius = None
+    with open(file, "r") as f:
+        first_row = f.readline()
+        second_row = f.readline()
+
+    delimiter = "," if "," in first_row else None
+    header = first_row.replace(",", " ").split()
+    try:
+        int(header[0])
+        skiprows = 0
+    except ValueError:
+        radius = float(header[0])
+        mu = float(header[1])
+        skiprows = 1
+        delimiter = "," if "," in second_row else None
+
+    max_rows = None
+    if max_degree is not None:
+        # files listing every order start with l = 0, which reaches the first row
+        # beyond max_degree after this many rows (otherwise read further)
+        max_rows = triangular_size(max_degree + 1)
+
+    while True:
+        rows = np.loadtxt(
+            file,
+            delimiter=delimiter,
+            skiprows=skiprows,
+            usecols=(0, 1, 2, 3),
+            max_rows=max_rows,
+            ndmin=2,
+        )
+        if max_rows is None or len(rows) < max_rows or rows[-1, 0] > max_degree:
+            break
+        max_rows *= 2
+
+    l = rows[:, 0].astype(int)  # noqa: E741
+    m = rows[:, 1].astype(int)
+    if max_degree is not None:
+        rows = rows[l <= max_degree]
+        m = m[l <= max_degree]
+        l = l[l <= max_degree]  # noqa: E741
+
+    degree = np.max(l)
+    C_lm = np.zeros((degree + 1, degree + 1))
+    S_lm = np.zeros((degree + 1, degree + 1))
+    C_lm[l, m] = rows[:, 2]
+    S_lm[l, m] = rows[:, 3]
+    return mu, radius, C_lm, S_lm
+
+
+def get_binary_file(file):
+    """Path of the binary counterpart of a text file of Stokes coefficients"""
+    return os.path.splitext(file)[0] + "_coefficients.npy"
+
+
+def write_sh_binary(file, mu, radius, C_lm, S_lm):
+    """Write the binary counterpart of a text file of Stokes coefficients.
+
+    The binary is a [1 + T x 2] float64 .npy array, where T is the number of
+    coefficients up to the maximum degree. The first row holds the radius and mu
+    (NaN if unknown) and the following rows the packed lower-triangular (C_lm,
+    S_lm) pairs (see `triangular_index`), such that the coefficients up to any
+    degree are a contiguous prefix of the memory mapped file.
+    """
+    values = np.zeros((1 + triangular_size(len(C_lm) - 1), 2))
+    values[0] = [
+        np.nan if radius is None else radius,
+        np.nan if mu is None else mu,
+    ]
+    values[1:, 0] = pack_triangular(C_lm)
+    values[1:, 1] = pack_triangular(S_lm)
+
+    binary_file = get_binary_file(file)
+    tmp_file = binary_file + "." + str(os.getpid()) + ".tmp"
+    with open(tmp_file, "wb") as f:
+        np.save(f, values)
+    os.replace(tmp_file, binary_file)
+
+
+def read_sh_binary(file, max_degree=None, packed=False):
+    """Read the coefficients up to max_degree from the (memory mapped) binary
+    counterpart of a text file, see `write_sh_binary`. The coefficients are
+    returned as packed lower-triangular arrays if `packed`, otherwise dense."""
+    values = np.load(get_binary_file(file), mmap_mode="r")
+    degree = triangular_degree(len(values) - 1)
+    if max_degree is not None:
+        degree = min(degree, max_degree)
+    radius, mu = values[0]
+    coefficients = values[1 : 1 + triangular_size(degree)]
+    C_lm = np.ascontiguousarray(coefficients[:, 0])
+    S_lm = np.ascontiguousarray(coefficients[:, 1])
+    if not packed:
+        C_lm = unpack_triangular(C_lm, degree)
+        S_lm = unpack_triangular(S_lm, degree)
+    return (
+        None if np.isnan(mu) else float(mu),
+        None if np.isnan(radius) else float(radius),
+        C_lm,
+        S_lm,
+    )
+
+
+def convert_sh_file(file):
+    """Parse an entire text file of Stokes coefficients and write its binary
+    counterpart"""
+    mu, radius, C_lm, S_lm = read_sh_text(file)
+    write_sh_binary(file, mu, radius, C_lm, S_lm)
+    return mu, radius, C_lm, S_lm
+
+
+def load_sh_file(file, max_degree=None, packed=False):
+    """Read Stokes coefficients up to max_degree from the binary counterpart of
+    the text file. The binary is (re)written from the text file if it is missing
+    or older than the text file. If the location is read-only, the text file is
+    parsed directly.
+
+    Args:
+        file (str): path to the text file of coefficients
+        max_degree (int, optional): maximum degree to read. Defaults to None (all).
+        packed (bool, optional): return packed lower-triangular arrays rather
+            than dense ones. Defaults to False.
+
+    Returns:
+        tuple: mu (or None), radius (or None), C_lm, S_lm
+    """
+    binary_file = get_binary_file(file)
+    if os.path.exists(binary_file) and os.path.getmtime(
+        binary_file,
+    ) >= os.path.getmtime(file):
+        return read_sh_binary(file, max_degree, packed)
+
+    try:
+        convert_sh_file(file)
+    except OSError:
+        mu, radius, C_lm, S_lm = read_sh_text(file, max_degree)
+        if packed:
+            C_lm = pack_triangular(C_lm)
+            S_lm = pack_triangular(S_lm)
+        return mu, radius, C_lm, S_lm
+    return read_sh_binary(file, max_degree, packed)
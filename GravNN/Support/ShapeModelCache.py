@@ -0,0 +1,106 @@
+import hashlib
+import os
+
+import numpy as np
+import trimesh
+
+cache_directory = os.path.splitext(__file__)[0] + "/../../Files/ShapeModels/Cache/"
+
+# OBJ hashes of the current process keyed by (path, modification time, size)
+_obj_hashes = {}
+
+
+def get_obj_hash(obj_file):
+    """SHA256 of the contents of a shape model file"""
+    stat = os.stat(obj_file)
+    key = (os.path.abspath(obj_file), stat.st_mtime_ns, stat.st_size)
+    if key not in _obj_hashes:
+        sha = hashlib.sha256()
+        with open(obj_file, "rb") as f:
+            for block in iter(lambda: f.read(2**20), b""):
+                sha.update(block)
+        _obj_hashes[key] = sha.hexdigest()
+    return _obj_hashes[key]
+
+
+def cached_arrays(obj_file, tag, compute_fcn):
+    """Load the arrays derived from a shape model from the on-disk cache, or
+    compute and store them if they don't exist yet.
+
+    Cache entries are keyed by the content hash of the OBJ file, so renamed
+    or relocated copies of a shape model share the same entry and modified
+    files are never served stale geometry.
+
+    Args:
+        obj_file (str): path to the shape model
+        tag (str): name of the group of arrays (e.g. "mesh", "dyads")
+        compute_fcn (callable): returns a dict of arrays if the entry is missing
+
+    Returns:
+        dict: the cached arrays
+    """
+    file = cache_directory + get_obj_hash(obj_file) + "_" + tag + ".npz"
+    if os.path.exists(file):
+        with np.load(file) as data:
+            return {key: data[key] for key in data.files}
+
+    arrays = compute_fcn()
+    os.makedirs(cache_directory, exist_ok=True)
+
+    # write to a temporary file first such that concurrent readers never
+    # observe a partially written entry
+    tmp_file = file + "." + str(os.getpid()) + ".tmp"
+    with open(tmp_file, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_file, file)
+    return arrays
+
+
+def compute_mesh_arrays(obj_file):
+    _, file_extension = os.path.splitext(obj_file)
+    mesh = trimesh.load_mesh(obj_file, file_type=file_extension[1:])
+    return {
+        "vertices": np.array(mesh.vertices),
+        "faces": np.array(mesh.faces),
+        "edges_unique": np.array(mesh.edges_unique),
+        "face_normals": np.array(mesh.face_normals),
+        "face_adjacency": np.array(mesh.face_adjacency),
+        "face_adjacency_edges": np.array(mesh.face_adjacency_edges),
+        "volume": np.array(mesh.volume),
+    }
+
+
+class ShapeModel:
+    def __init__(self, obj_file):
+        """Geometry of a shape model, loaded through the on-disk cache rather than
+        re-parsing and re-processing the OBJ file every time.
+
+        Args:
+            obj_file (str): path to the shape model
+        """
+        self.obj_file = obj_file
+        arrays = cached_arrays(
+            self.obj_file,
+            "mesh",
+            lambda: compute_mesh_arrays(self.obj_file),
+        )
+        self.vertices = arrays["vertices"]
+        self.faces = arrays["faces"]
+        self.edges_unique = arrays["edges_unique"]
+        self.face_normals = arrays["face_normals"]
+        self.face_adjacency = arrays["face_adjacency"]
+        self.face_adjacency_edges = arrays["face_adjacency_edges"]
+        self.volume = float(arrays["volume"])
+        self._trimesh = None
+
+    @property
+    def trimesh(self):
+        """trimesh object built from the cached (already processed) geometry"""
+        if self._trimesh is None:
+            self._trimesh = trimesh.Trimesh(
+                vertices=self.vertices,
+                faces=self.faces,
+                face_normals=self.face_normals,
+                process=False,
+            )
+        return self._trimesh
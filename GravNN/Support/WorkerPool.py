@@ -0,0 +1,138 @@
+import atexit
+import dataclasses
+import multiprocessing as mp
+import weakref
+from functools import partial
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from GravNN.Support.slurm_utils import get_available_cores
+
+# Arrays attached by the current process, keyed by shared memory name. Worker
+# processes persist for the lifetime of the pool, so each large array is only
+# mapped once per worker rather than pickled with every task.
+_attached_arrays = {}
+
+
+@dataclasses.dataclass(frozen=True)
+class SharedArray:
+    """Lightweight, picklable handle to a read-only array living in shared memory"""
+
+    name: str
+    shape: tuple
+    dtype: str
+
+    def get(self):
+        """Return a numpy view of the shared array, attaching to it on first use"""
+        if self.name not in _attached_arrays:
+            shm = shared_memory.SharedMemory(name=self.name)
+            array = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+            array.flags.writeable = False
+            _attached_arrays[self.name] = (shm, array)
+        return _attached_arrays[self.name][1]
+
+
+def _detach_released(shared_names):
+    """Detach the worker from the arrays which are no longer shared"""
+    for name in list(_attached_arrays):
+        if name not in shared_names:
+            shm, array = _attached_arrays.pop(name)
+            del array
+            shm.close()
+
+
+def _run_task(item, fcn, shared_names):
+    _detach_released(shared_names)
+    return fcn(item)
+
+
+class WorkerPool:
+    def __init__(self, processes=None):
+        """Long-lived process pool shared by the gravity models.
+
+        The underlying multiprocessing pool is only created the first time work
+        is submitted and persists until `shutdown` is called (explicitly, when
+        leaving a `with` block, or at interpreter exit). Large read-only arrays
+        (Stokes coefficients, mesh vertices, dyads) can be placed in shared
+        memory once through `share` and referenced by the tasks via the
+        returned `SharedArray` handles.
+
+        Args:
+            processes (int, optional): number of worker processes. Defaults to
+                the cores available to the job (see `get_available_cores`).
+        """
+        self._processes = processes
+        self._pool = None
+        self._shared = {}
+        atexit.register(self.shutdown)
+
+    @property
+    def processes(self):
+        if self._processes is None:
+            self._processes = get_available_cores()
+        return self._processes
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            # Forking a process that has already started numba's parallel threads
+            # can deadlock, so the workers are started from a clean server process
+            context = mp.get_context("forkserver")
+            self._pool = context.Pool(processes=self.processes)
+        return self._pool
+
+    def share(self, array):
+        """Copy an array into shared memory (once) and return its handle.
+
+        Arrays are keyed by identity, so sharing the same array repeatedly is
+        free. The shared memory is released once the original array is garbage
+        collected (see `release`), and the workers detach from it with their
+        next task."""
+        key = id(array)
+        if key in self._shared:
+            return self._shared[key][1]
+
+        values = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        shared_view = np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)
+        shared_view[...] = values
+        handle = SharedArray(shm.name, values.shape, values.dtype.str)
+
+        # the entry is removed before the id of the array can be reused
+        finalizer = weakref.finalize(array, self.release, key)
+        self._shared[key] = (shm, handle, finalizer)
+        return handle
+
+    def release(self, key):
+        """Unlink the shared memory of the array with the given id"""
+        shm, _, finalizer = self._shared.pop(key)
+        finalizer.detach()
+        shm.close()
+        shm.unlink()
+
+    def map(self, fcn, iterable, chunksize=None):
+        shared_names = frozenset(handle.name for _, handle, _ in self._shared.values())
+        task = partial(_run_task, fcn=fcn, shared_names=shared_names)
+        return self.pool.map(task, iterable, chunksize=chunksize)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+        for key in list(self._shared):
+            self.release(key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+
+def split_positions(positions, processes):
+    """Split an (N, 3) array into contiguous chunks, one or more per process"""
+    N_chunks = min(len(positions), processes * 4)
+    return np.array_split(positions, max(N_chunks, 1))
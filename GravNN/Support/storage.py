@@ -0,0 +1,128 @@
+import hashlib
+import io
+import os
+import pickle
+
+import numpy as np
+
+
+def array_exists(directory, name):
+    """Check if an array was saved as `name.npy` (or as a legacy `name.data`
+    pickle) within the directory"""
+    return os.path.exists(directory + name + ".npy") or os.path.exists(
+        directory + name + ".data",
+    )
+
+
+def save_arrays(directory, arrays):
+    """Save each array of the dict as `name.npy` within the directory.
+
+    Every array is written to a temporary file before any of them is moved into
+    place, so an interrupted save never leaves a partial set of files behind.
+
+    Args:
+        directory (str): directory (ending with a separator)
+        arrays (dict): name -> np.array, entries which are None are skipped
+    """
+    os.makedirs(directory, exist_ok=True)
+    tmp_files = {}
+    for name, values in arrays.items():
+        if values is None:
+            continue
+        tmp_file = directory + name + ".npy.tmp"
+        with open(tmp_file, "wb") as f:
+            np.save(f, np.asarray(values))
+        tmp_files[name] = tmp_file
+
+    for name, tmp_file in tmp_files.items():
+        os.replace(tmp_file, directory + name + ".npy")
+
+
+def _append_npy(file, values):
+    with open(file, "r+b") as f:
+        if np.lib.format.read_magic(f) != (1, 0):
+            return False
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        header_size = f.tell()
+        values = np.ascontiguousarray(values, dtype=dtype)
+        if fortran_order or len(shape) == 0 or values.shape[1:] != shape[1:]:
+            return False
+
+        # the header leaves room for the first axis to grow, see np.lib.format
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(
+            header,
+            {
+                "descr": np.lib.format.dtype_to_descr(dtype),
+                "fortran_order": False,
+                "shape": (shape[0] + len(values),) + shape[1:],
+            },
+        )
+        if len(header.getvalue()) != header_size:
+            return False
+
+        f.seek(header_size + int(np.prod(shape)) * dtype.itemsize)
+        f.write(values.tobytes())
+        f.flush()
+        f.seek(0)
+        f.write(header.getvalue())
+    return True
+
+
+def append_arrays(directory, arrays):
+    """Append rows to the arrays saved through `save_arrays`.
+
+    Only the new rows and the header of each `.npy` file are written. The rows
+    are written before the header, so an interrupted append leaves the previous
+    array intact. Arrays saved in another format are rewritten instead.
+
+    Args:
+        directory (str): directory (ending with a separator)
+        arrays (dict): name -> np.array of the rows to append
+    """
+    for name, values in arrays.items():
+        file = directory + name + ".npy"
+        if os.path.exists(file) and _append_npy(file, values):
+            continue
+        saved = load_array(directory, name, mmap_mode=None)
+        save_arrays(directory, {name: np.concatenate((saved, values))})
+
+
+def hash_array(values, chunk_size=1048576):
+    """SHA-256 digest of the rows of an array (as float64), read in chunks such
+    that memory mapped arrays are never loaded at once"""
+    digest = hashlib.sha256()
+    for i in range(0, len(values), chunk_size):
+        chunk = np.ascontiguousarray(values[i : i + chunk_size], dtype=np.float64)
+        digest.update(chunk.tobytes())
+    return np.frombuffer(digest.digest(), dtype=np.uint8)
+
+
+def load_array(directory, name, N=None, mmap_mode="c"):
+    """Load an array saved through `save_arrays`.
+
+    The `.npy` file is memory mapped, so only the rows that are actually
+    accessed are read from disk and slicing is lazy. The default copy-on-write
+    mode allows in-place modification of the returned array without altering
+    the file. Directories generated before the switch to `.npy` are read from
+    their `name.data` pickle instead, which requires loading the whole array.
+
+    Args:
+        directory (str): directory (ending with a separator)
+        name (str): name of the array
+        N (int, optional): only return the first N rows. Defaults to None (all).
+        mmap_mode (str, optional): numpy memory map mode, or None to read the
+            array into memory. Defaults to "c".
+
+    Returns:
+        np.array: the saved array
+    """
+    if os.path.exists(directory + name + ".npy"):
+        values = np.load(directory + name + ".npy", mmap_mode=mmap_mode)
+    else:
+        with open(directory + name + ".data", "rb") as f:
+            values = pickle.load(f)
+
+    if N is not None:
+        values = values[:N]
+    return values
@@ -4,6 +4,7 @@ import numpy as np
 import trimesh
 
 from GravNN.Support.PathTransformations import make_windows_path_posix
+from GravNN.Support.ShapeModelCache import ShapeModel
 from GravNN.Trajectories.TrajectoryBase import TrajectoryBase
 
 
@@ -15,6 +16,13 @@ class RandomDist(TrajectoryBase):
             celestial_body (Celestial Body): Planet about which samples should be taken
             radius_bounds (list): range of radii from which the sample can be drawn
             points (int): number of samples
+
+        Keyword Args:
+            uniform_volume (bool, optional): sample uniformly in volume rather than
+                in radius. Defaults to False.
+            dist_seed (int, optional): seed of the distribution, see
+                `TrajectoryBase`. Seeded distributions are saved independently of
+                the number of points. Defaults to None.
         """
         self.radius_bounds = radius_bounds
         self.points = int(points[0])
@@ -55,12 +63,8 @@ class RandomDist(TrajectoryBase):
         # If the file was saved on windows but we are running on mac, load the mac path.
         self.obj_file = make_windows_path_posix(self.obj_file)
 
-        _, file_extension = os.path.splitext(self.obj_file)
         self.filename = os.path.basename(self.obj_file)
-        self.obj_mesh = trimesh.load_mesh(
-            self.obj_file,
-            file_type=file_extension[1:],
-        )
+        self.obj_mesh = ShapeModel(self.obj_file).trimesh
 
     def generate_full_file_directory(self):
         directory_name = os.path.splitext(os.path.basename(__file__))[0]
@@ -73,7 +77,13 @@ class RandomDist(TrajectoryBase):
         N_points = int(self.points)
         rad_bounds = self.radius_bounds
         uniform_vol = self.uniform_volume
-        self.trajectory_name = f"{directory_name}/{body}_{model_name}_N_{N_points}"
+        if self.seed is None:
+            self.trajectory_name = f"{directory_name}/{body}_{model_name}_N_{N_points}"
+        else:
+            # the first N samples of a seeded distribution don't depend on N_points
+            self.trajectory_name = (
+                f"{directory_name}/{body}_{model_name}_Seed_{self.seed}"
+            )
 
         # If the first value is 0, then make sure it's saved as 0.0
         # to allow for proper loading
@@ -84,16 +94,15 @@ class RandomDist(TrajectoryBase):
         self.trajectory_name += f"_RadBounds{bounds_str}_UVol_{uniform_vol}"
         self.file_directory += self.trajectory_name + "/"
 
-    def sample_volume(self, points):
-        X = []
-        Y = []
-        Z = []
-        X.extend(np.zeros((points,)).tolist())
-        Y.extend(np.zeros((points,)).tolist())
-        Z.extend(np.zeros((points,)).tolist())
+    def sample_volume(self, points, rng=None):
+        if rng is None:
+            samples = np.random.random_sample((3, points))
+        else:
+            # one row per point such that a larger sample begins with a smaller one
+            samples = rng.random((points, 3)).T
 
-        theta = np.random.uniform(0, 2 * np.pi, size=(points,))
-        cosphi = np.random.uniform(-1, 1, size=(points,))
+        theta = 2 * np.pi * samples[0]
+        cosphi = -1 + 2 * samples[1]
         R_min = self.radius_bounds[0]
         R_max = self.radius_bounds[1]
 
@@ -103,12 +112,12 @@ class RandomDist(TrajectoryBase):
             u_max = 1.0
 
             # want distribution to be uniform across volume the sphere
-            u = np.random.uniform(u_min, u_max, size=(points,))
+            u = u_min + (u_max - u_min) * samples[2]
 
             # convert the uniform volume length into physical radius
             r = R_max * u ** (1.0 / 3.0)
         else:
-            r = np.random.uniform(R_min, R_max, size=(points,))
+            r = R_min + (R_max - R_min) * samples[2]
         phi = np.arccos(cosphi)
 
         X = r * np.sin(phi) * np.cos(theta)
@@ -161,11 +170,32 @@ class RandomDist(TrajectoryBase):
         Returns:
             np.array: cartesian positions of the samples
         """
-        positions = self.sample_volume(self.points)
-        positions = self.recursively_remove_interior_points(positions)
+        if self.seed is None:
+            positions = self.sample_volume(self.points)
+            positions = self.recursively_remove_interior_points(positions)
+        else:
+            positions = self.sample_stream(self.points)
         self.positions = positions
         return positions.copy()
 
+    def sample_stream(self, points):
+        """Draw the first `points` exterior samples of the seeded stream. Interior
+        samples are discarded in order, so the result for N points is a prefix of
+        the result for any larger number of points."""
+        rng = np.random.default_rng(self.seed)
+        positions = np.zeros((0, 3))
+        while len(positions) < points:
+            samples = self.sample_exterior(points - len(positions), rng)
+            positions = np.concatenate((positions, samples))
+        return positions
+
+    def sample_exterior(self, points, rng=None):
+        """Draw `points` samples and discard those interior to the shape model"""
+        samples = self.sample_volume(points, rng)
+        if not self.assess_skip_condition():
+            samples = samples[~self.identify_interior_points(samples)]
+        return samples
+
 
 if __name__ == "__main__":
     from GravNN.CelestialBodies.Planets import Earth
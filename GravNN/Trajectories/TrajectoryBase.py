@@ -2,10 +2,23 @@ import os
 import pickle
 from abc import ABC, abstractmethod
 
+from GravNN.Support.storage import load_array, save_arrays
+
 
 class TrajectoryBase(ABC):
     def __init__(self, **kwargs):
-        """Base class for all trajectories and distributions used in GravNN"""
+        """Base class for all trajectories and distributions used in GravNN
+
+        Keyword Args:
+            dist_seed (int, optional): seed of the distribution. Seeded
+                distributions draw their samples from a deterministic stream such
+                that the first N samples of a larger distribution are identical to
+                a distribution of N samples. Their saved positions (and the gravity
+                data computed for them) are extended rather than regenerated when
+                more points are requested. Defaults to None (unseeded).
+        """
+        self.seed = kwargs.get("dist_seed", [None])[0]
+
         # positions
         self.file_directory = (
             os.path.splitext(__file__)[0] + "/../../Files/Trajectories/"
@@ -16,14 +29,12 @@ class TrajectoryBase(ABC):
 
     def save(self):
         """Save the distribution positions in the directory generated by `generate_full_file_directory`."""
-        if not os.path.exists(self.file_directory):
-            os.makedirs(self.file_directory, exist_ok=True)
-        with open(self.file_directory + "trajectory.data", "wb") as f:
-            pickle.dump(self.positions, f)
-            try:
-                pickle.dump(self.times, f)
-            except:
-                pass
+        times = getattr(self, "times", None)
+        save_arrays(self.file_directory, {"trajectory": self.positions, "times": times})
+
+        # don't pair regenerated positions with the times of a previous trajectory
+        if times is None and os.path.exists(self.file_directory + "times.npy"):
+            os.remove(self.file_directory + "times.npy")
         return
 
     def load(self, override=False):
@@ -36,7 +47,23 @@ class TrajectoryBase(ABC):
             np.array: cartesian position vectors of distribution
         """
         # Check if the file exists and either load the positions or generate the position
-        if os.path.exists(self.file_directory + "trajectory.data") and not override:
+        if os.path.exists(self.file_directory + "trajectory.npy") and not override:
+            positions = load_array(self.file_directory, "trajectory")
+            if self.is_prefix_stable():
+                # only the prefix of a larger seeded distribution is needed, while
+                # smaller ones are regenerated (cheap) to append the new samples
+                if len(positions) < self.points:
+                    self.generate()
+                    self.save()
+                    return self.positions
+                positions = positions[: self.points]
+            self.positions = positions
+            if os.path.exists(self.file_directory + "times.npy"):
+                self.times = load_array(self.file_directory, "times")
+            return self.positions
+
+        # Trajectories saved prior to the .npy format
+        elif os.path.exists(self.file_directory + "trajectory.data") and not override:
             with open(self.file_directory + "trajectory.data", "rb") as f:
                 self.positions = pickle.load(f)
                 try:
@@ -50,6 +77,16 @@ class TrajectoryBase(ABC):
             self.save()
             return self.positions
 
+    def is_prefix_stable(self):
+        """Whether the distribution is seeded and draws its `points` samples from a
+        stream (see `RandomDist.sample_stream`), such that smaller distributions
+        are a prefix of larger ones"""
+        return (
+            self.seed is not None
+            and hasattr(self, "points")
+            and callable(getattr(self, "sample_stream", None))
+        )
+
     @abstractmethod
     def generate_full_file_directory(self):
         """Generate the file directory path in which the distribution will be saved"""
@@ -0,0 +1,23 @@
+"""Helpers shared by the tests"""
+import numpy as np
+
+
+class Body:
+    """Stand-in celestial body for the gravity models, which only read its name,
+    gravitational parameter, and radius (those of Eros unless overridden)"""
+
+    body_name = "body"
+    mu = 4.46275472e05
+    radius = 16000.0
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def random_positions(N, r_min, r_max, seed=1):
+    """N positions in random directions at radii uniformly drawn from
+    [r_min, r_max]"""
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=(N, 3))
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    return x * rng.uniform(r_min, r_max, size=(N, 1))
@@ -0,0 +1,92 @@
+import numpy as np
+from conftest import Body
+from scipy.integrate import solve_ivp
+
+from GravNN.GravityModels.PointMass import PointMass
+from GravNN.Support.BatchIntegrator import solve_ivp_batch
+
+
+def get_initial_states(M, seed=1):
+    # inclined, slightly eccentric orbits between 2 and 4 radii
+    rng = np.random.default_rng(seed)
+    r = rng.uniform(2.0, 4.0, size=M) * Body.radius
+    v = np.sqrt(Body.mu / r) * rng.uniform(0.9, 1.1, size=M)
+    inclination = rng.uniform(0.0, np.pi, size=M)
+    states = np.zeros((M, 6))
+    states[:, 0] = r
+    states[:, 4] = v * np.cos(inclination)
+    states[:, 5] = v * np.sin(inclination)
+    return states
+
+
+def get_rhs(model, calls):
+    def fun(t, y):
+        calls.append(len(y))
+        a = model.compute_acceleration(y[:, 0:3])
+        return np.hstack((y[:, 3:6], a))
+
+    return fun
+
+
+def test_adaptive_matches_solve_ivp():
+    model = PointMass(Body())
+    states = get_initial_states(50)
+    period = 2 * np.pi * np.sqrt((4.0 * Body.radius) ** 3 / Body.mu)
+    t_eval = np.linspace(0, period, 20)
+
+    for method in ["RK45", "DOP853"]:
+        calls = []
+        fun = get_rhs(model, calls)
+        sol = solve_ivp_batch(
+            fun,
+            [0, period],
+            states,
+            method=method,
+            t_eval=t_eval,
+            rtol=1e-10,
+            atol=1e-10,
+        )
+        assert np.all(sol.success)
+        assert sol.nfev == len(calls)
+        # every stage is a single call on all unfinished trajectories
+        assert calls[0] == len(states)
+
+        for i in range(0, len(states), 10):
+            ref = solve_ivp(
+                lambda t, y: fun(np.array([t]), y.reshape((1, 6)))[0],
+                [0, period],
+                states[i],
+                method=method,
+                t_eval=t_eval,
+                rtol=1e-10,
+                atol=1e-10,
+            )
+            scale = np.max(np.abs(ref.y), axis=1, keepdims=True)
+            assert np.allclose(sol.y[i], ref.y, rtol=0.0, atol=1e-7 * scale.max())
+            # comparable number of steps to a single trajectory integration
+            assert sol.nsteps[i] < 2 * (ref.nfev / ref.y.shape[0])
+
+
+def test_fixed_step_and_failure():
+    model = PointMass(Body())
+    states = get_initial_states(20)
+    t_eval = np.linspace(0, 3600.0, 7)
+
+    fun = get_rhs(model, [])
+    ref = solve_ivp_batch(fun, [0, 3600.0], states, "DOP853", t_eval, 1e-12, 1e-12)
+    sol = solve_ivp_batch(fun, [0, 3600.0], states, "RK4", t_eval, first_step=1.0)
+    assert np.allclose(sol.y, ref.y, rtol=1e-9)
+    assert np.all(sol.nsteps == 3600)
+
+    # a trajectory through the center of mass fails without stopping the rest
+    states[0, 3:6] = 0.0
+    states[0, 0] = 1e-3
+    sol = solve_ivp_batch(fun, [0, 3600.0], states, "RK45", t_eval, 1e-10, 1e-10)
+    assert sol.status[0] == -1 and np.all(sol.success[1:])
+    assert np.allclose(sol.y[1:], ref.y[1:], rtol=1e-6)
+
+
+if __name__ == "__main__":
+    test_adaptive_matches_solve_ivp()
+    test_fixed_step_and_failure()
+    print("Passed!")
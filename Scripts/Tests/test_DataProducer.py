@@ -0,0 +1,91 @@
+import tempfile
+
+import numpy as np
+import pytest
+from conftest import Body
+
+from GravNN.GravityModels.PointMass import PointMass
+from GravNN.Support.DataProducer import DataProducer
+
+
+def sample_fcn(N, rng):
+    return rng.uniform(1.0, 2.0, size=(N, 3)) * Body.radius
+
+
+def get_compute_fcn():
+    model = PointMass(Body())
+
+    def compute_fcn(x):
+        return model.compute_all(x)[0:2]
+
+    return compute_fcn
+
+
+def test_chunks():
+    compute_fcn = get_compute_fcn()
+    with DataProducer(compute_fcn, sample_fcn, 100, max_chunks=2, seed=0) as producer:
+        chunks = list(producer.chunks(5))
+    for x, a, u in chunks:
+        assert x.shape == (100, 3) and a.shape == (100, 3) and u.shape == (100,)
+        a_true, u_true = compute_fcn(x)
+        assert np.allclose(a, a_true) and np.allclose(u, u_true)
+
+    # each chunk is drawn from its own stream, independently of the workers
+    with DataProducer(compute_fcn, sample_fcn, 100, workers=3, seed=0) as producer:
+        parallel_chunks = list(producer.chunks(5))
+        # at most 4 queued and 3 in progress chunks beyond the 5 consumed
+        expected = [producer.generate_chunk(i)[0] for i in range(12)]
+    assert all(np.array_equal(x, x_i) for (x, _, _), x_i in zip(chunks, expected))
+    indices = [
+        [np.array_equal(x, x_i) for x_i in expected].index(True)
+        for x, _, _ in parallel_chunks
+    ]
+    assert len(set(indices)) == 5
+
+
+def test_cache_replay():
+    compute_fcn = get_compute_fcn()
+    with tempfile.TemporaryDirectory() as directory:
+        producer = DataProducer(compute_fcn, sample_fcn, 50, cache_directory=directory)
+        chunks = list(producer.chunks(3))
+        producer.stop()
+        assert producer.count_cached_chunks() >= 3
+
+        # cached chunks are replayed (in order) before new chunks are generated
+        producer = DataProducer(compute_fcn, sample_fcn, 50, cache_directory=directory)
+        N_cached = producer.cached_chunks
+        replayed = list(producer.chunks(N_cached + 1))
+        producer.stop()
+        for (x, a, u), (x_r, a_r, u_r) in zip(chunks, replayed):
+            assert np.array_equal(x, x_r) and np.array_equal(a, a_r)
+            assert np.array_equal(u, u_r)
+        assert producer.count_cached_chunks() > N_cached
+
+
+def test_failure():
+    def compute_fcn(x):
+        raise ValueError("model failed")
+
+    producer = DataProducer(compute_fcn, sample_fcn, 10)
+    with pytest.raises(RuntimeError):
+        producer.get()
+    producer.stop()
+
+
+def test_stop():
+    producer = DataProducer(get_compute_fcn(), sample_fcn, 10, max_chunks=2)
+    producer.get()
+    producer.stop()
+
+    # only the queued chunks remain once stopped
+    with pytest.raises(RuntimeError):
+        for _ in range(3):
+            producer.get()
+
+
+if __name__ == "__main__":
+    test_chunks()
+    test_cache_replay()
+    test_failure()
+    test_stop()
+    print("Passed!")
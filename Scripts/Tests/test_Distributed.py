@@ -0,0 +1,41 @@
+import json
+import os
+
+import pytest
+
+from GravNN.Networks.Distributed import launch_workers
+
+
+def get_worker_info(offset):
+    tf_config = json.loads(os.environ["TF_CONFIG"])
+    return {
+        "index": tf_config["task"]["index"] + offset,
+        "workers": tf_config["cluster"]["worker"],
+        "threads": int(os.environ["TF_NUM_INTRAOP_THREADS"]),
+    }
+
+
+def fail(index):
+    if json.loads(os.environ["TF_CONFIG"])["task"]["index"] == index:
+        raise ValueError("worker failed")
+    return index
+
+
+def test_launch_workers():
+    info = launch_workers(get_worker_info, (10,), workers=3, threads=2)
+    # the result is returned by the chief
+    assert info["index"] == 10
+    assert info["threads"] == 2
+    assert len(set(info["workers"])) == 3
+    assert all(worker.startswith("localhost:") for worker in info["workers"])
+
+
+def test_worker_failure():
+    with pytest.raises(RuntimeError):
+        launch_workers(fail, (1,), workers=2, threads=1)
+
+
+if __name__ == "__main__":
+    test_launch_workers()
+    test_worker_failure()
+    print("Passed!")
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import tempfile
+import threading
+
+import numpy as np
+from conftest import Body, random_positions
+
+from GravNN.GravityModels.PointMass import PointMass
+from GravNN.Support.EvaluationServer import EvaluationServer, RemoteModel
+
+
+def propagate(server, positions, results, i):
+    results[i] = [server.compute_acceleration(x.reshape((1, 3))) for x in positions]
+
+
+def test_threads_are_batched():
+    model = PointMass(Body())
+    positions = random_positions(8 * 50, Body.radius, 3 * Body.radius)
+    positions = positions.reshape((8, 50, 3))
+    results = [None] * 8
+    with EvaluationServer(model, clients=8, max_delay=1.0) as server:
+        threads = [
+            threading.Thread(target=propagate, args=(server, positions[i], results, i))
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # one batch per step of the lock-stepped propagators
+        assert server.batch_sizes == [8] * 50
+
+        potential = server.compute_potential(positions[0])
+
+    for i in range(8):
+        acc = np.concatenate(results[i])
+        assert np.allclose(acc, model.compute_acceleration(positions[i]), rtol=1e-14)
+    assert np.allclose(potential, model.compute_potential(positions[0]), rtol=1e-14)
+
+
+def test_async_requests():
+    model = PointMass(Body())
+    positions = random_positions(64, Body.radius, 3 * Body.radius)
+
+    async def gather(server):
+        tasks = [server.compute_acceleration_async(x) for x in positions]
+        return await asyncio.gather(*tasks)
+
+    with EvaluationServer(model, max_delay=0.1) as server:
+        results = asyncio.run(gather(server))
+        assert server.batch_sizes == [64]
+    acc = np.concatenate(results)
+    assert np.allclose(acc, model.compute_acceleration(positions), rtol=1e-14)
+
+
+def test_remote_model():
+    model = PointMass(Body())
+    positions = random_positions(20, Body.radius, 3 * Body.radius)
+    with tempfile.TemporaryDirectory() as directory:
+        address = os.path.join(directory, "server.sock")
+        with EvaluationServer(model) as server:
+            server.listen(address)
+            with RemoteModel(address) as remote:
+                acc = np.concatenate(
+                    [remote.compute_acceleration(x) for x in positions],
+                )
+                pot = remote.compute_potential(positions)
+                try:
+                    remote.request("gradient", positions)
+                    raise AssertionError("Expected a ValueError")
+                except ValueError:
+                    pass
+    assert np.allclose(acc, model.compute_acceleration(positions), rtol=1e-14)
+    assert np.allclose(pot, model.compute_potential(positions), rtol=1e-14)
+
+
+if __name__ == "__main__":
+    test_threads_are_batched()
+    test_async_requests()
+    test_remote_model()
+    print("Passed!")
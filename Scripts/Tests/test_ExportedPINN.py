@@ -0,0 +1,130 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+from conftest import random_positions
+
+from GravNN.GravityModels.ExportedPINN import ExportedPINN
+
+x_scale = 1e-4  # normalized radius of 1 at 10 km
+
+
+def write_network(file, spec, shapes, seed=0):
+    """Exported network with random weights (see `Networks.Export`)"""
+    rng = np.random.default_rng(seed)
+    weights = {
+        "x_min": np.zeros((1,)),
+        "x_scale": np.array([x_scale]),
+        "u_min": np.zeros((1,)),
+        "u_scale": np.ones((1,)),
+        "a_min": np.zeros((1,)),
+        # consistent with the potential, i.e. a = -dU/dx
+        "a_scale": np.array([1.0 / x_scale]),
+    }
+    for i, (n_in, n_out) in enumerate(shapes):
+        weights[f"dense_{i}/kernel"] = rng.normal(size=(n_in, n_out)) / np.sqrt(n_in)
+        weights[f"dense_{i}/bias"] = rng.normal(size=(n_out,)) * 0.1
+    for i in range(3):
+        weights[f"preprocessing_1/freq_{i}"] = rng.normal(size=(1, 4))
+        weights[f"preprocessing_1/phase_{i}"] = rng.normal(size=(4,))
+    weights["analytic/k_external"] = np.array([0.5])
+    weights["analytic/r_external"] = np.array([0.0])
+    spec["dense_layers"] = len(shapes)
+    np.savez(file, spec=np.array(json.dumps(spec)), **weights)
+
+
+def check_derivatives(model, positions):
+    acc, pot, gradient = model.compute_all(positions, gradient=True)
+    assert np.allclose(pot, model.compute_potential(positions), rtol=1e-14)
+    assert np.allclose(acc, model.compute_acceleration(positions), rtol=1e-14)
+
+    # central differences of the potential and acceleration
+    dx = 1e-3 / x_scale
+    acc_fd = np.zeros_like(acc)
+    gradient_fd = np.zeros_like(gradient)
+    for j in range(3):
+        step = np.zeros((1, 3))
+        step[0, j] = dx
+        u_plus = model.compute_potential(positions + step)
+        u_minus = model.compute_potential(positions - step)
+        acc_fd[:, j] = -(u_plus - u_minus) / (2 * dx)
+        a_plus = model.compute_acceleration(positions + step)
+        a_minus = model.compute_acceleration(positions - step)
+        gradient_fd[:, :, j] = (a_plus - a_minus) / (2 * dx)
+
+    assert np.allclose(acc, acc_fd, rtol=1e-5, atol=1e-6 * np.max(np.abs(acc)))
+    atol = 1e-6 * np.max(np.abs(gradient))
+    assert np.allclose(gradient, gradient_fd, rtol=1e-4, atol=atol)
+    assert np.allclose(gradient, np.swapaxes(gradient, 1, 2), rtol=1e-12)
+
+
+def test_traditional_network():
+    spec = {"network_arch": "traditional", "activation": "tanh", "preprocessing": []}
+    shapes = [(3, 16), (16, 16), (16, 1)]
+    with tempfile.TemporaryDirectory() as directory:
+        file = os.path.join(directory, "network.npz")
+        write_network(file, spec, shapes)
+        model = ExportedPINN(file)
+        with np.load(file) as data:
+            weights = dict(data)
+
+    positions = random_positions(50, 1.2 / x_scale, 3.0 / x_scale)
+    x = positions * x_scale
+    for i in range(len(shapes)):
+        x = x @ weights[f"dense_{i}/kernel"] + weights[f"dense_{i}/bias"]
+        if i < len(shapes) - 1:
+            x = np.tanh(x)
+    assert np.allclose(model.compute_potential(positions), x[:, 0], rtol=1e-14)
+    check_derivatives(model, positions)
+
+
+def test_fourier_analytic_network():
+    spec = {
+        "network_arch": "transformer",
+        "activation": "gelu",
+        "encoding_layers": 2,
+        "preprocessing": [
+            {"type": "pines"},
+            {"type": "fourier", "freq_decay": True, "sine_and_cosine": True},
+        ],
+        "analytic": {
+            "mu": 1.0,
+            "a": 1.0,
+            "C20": -1e-3,
+            "c1": np.sqrt(15.0 / 4.0) * np.sqrt(3.0),
+            "c2": np.sqrt(5.0 / 4.0),
+        },
+        "scale_potential": True,
+        "power": 4.0,
+        "fuse": 1.0,
+        "enforce_bc": False,
+    }
+    # encoders, hidden, and output layers of the transformer network_arch
+    features = 4 + 2 * 3 * 4
+    shapes = [(features, 16)] * 3 + [(16, 16), (16, 1)]
+    with tempfile.TemporaryDirectory() as directory:
+        file = os.path.join(directory, "network.npz")
+        write_network(file, spec, shapes)
+        model = ExportedPINN(file)
+        analytic = ExportedPINN(file)
+
+    # without the output of the network, only the analytic model remains
+    analytic.weights["dense_4/kernel"][:] = 0.0
+    analytic.weights["dense_4/bias"][:] = 0.0
+    x = random_positions(50, 1.2 / x_scale, 3.0 / x_scale) * x_scale
+    r = np.linalg.norm(x, axis=1)
+    u = x[:, 2] / r
+    c1, c2 = spec["analytic"]["c1"], spec["analytic"]["c2"]
+    u_C20 = (1.0 / r) ** 3 * (u**2 * c1 - c2) * spec["analytic"]["C20"]
+    u_analytic = -(1.0 / r + u_C20) * (0.5 + 0.5 * np.tanh(0.5 * r))
+    assert np.allclose(analytic.compute_potential(x / x_scale), u_analytic)
+
+    positions = random_positions(50, 1.2 / x_scale, 3.0 / x_scale)
+    check_derivatives(model, positions)
+
+
+if __name__ == "__main__":
+    test_traditional_network()
+    test_fourier_analytic_network()
+    print("Passed!")
@@ -0,0 +1,90 @@
+import os
+import tempfile
+
+import numpy as np
+from conftest import Body, random_positions
+
+from GravNN.GravityModels.Mascons import Mascons
+from GravNN.GravityModels.PointMass import PointMass
+
+
+def write_masses(file, N_masses, seed=0):
+    rng = np.random.default_rng(seed)
+    mu = rng.uniform(0.0, 1.0, size=(N_masses, 1)) * Body.mu / N_masses
+    r = rng.uniform(-0.5, 0.5, size=(N_masses, 3)) * Body.radius
+    np.savetxt(file, np.append(mu, r, axis=1), delimiter=",", header="mu,x,y,z")
+
+
+def test_mascons_match_values():
+    with tempfile.TemporaryDirectory() as directory:
+        mass_csv = os.path.join(directory, "masses.csv")
+        write_masses(mass_csv, 2500)
+        model = Mascons(Body(), mass_csv)
+
+    positions = random_positions(300, Body.radius, 3 * Body.radius)
+    acc, pot = model.compute_all(positions)
+    for i, position in enumerate(positions):
+        acc_i = model.compute_acceleration_value(position)
+        pot_i = model.compute_potential_value(position)
+        assert np.allclose(acc[i], acc_i, rtol=1e-12, atol=0.0)
+        assert np.isclose(pot[i], pot_i, rtol=1e-12, atol=0.0)
+
+    # single point path
+    acc_0 = model.compute_acceleration(positions[0:1])
+    pot_0 = model.compute_potential(positions[0:1])
+    assert np.allclose(acc_0, acc[0:1], rtol=1e-14, atol=0.0)
+    assert np.allclose(pot_0, pot[0:1], rtol=1e-14, atol=0.0)
+
+
+def test_mascons_float32():
+    with tempfile.TemporaryDirectory() as directory:
+        mass_csv = os.path.join(directory, "masses.csv")
+        write_masses(mass_csv, 2500)
+        model = Mascons(Body(), mass_csv)
+        model_32 = Mascons(Body(), mass_csv, dtype=np.float32)
+
+    positions = random_positions(300, Body.radius, 3 * Body.radius)
+    acc, pot = model.compute_all(positions)
+    acc_32, pot_32 = model_32.compute_all(positions)
+    assert acc_32.dtype == np.float32 and pot_32.dtype == np.float32
+
+    a_error = np.linalg.norm(acc_32 - acc, axis=1) / np.linalg.norm(acc, axis=1)
+    assert np.max(a_error) < 1e-5
+    assert np.max(np.abs(pot_32 - pot) / np.abs(pot)) < 1e-5
+
+
+def test_mascons_gradient():
+    with tempfile.TemporaryDirectory() as directory:
+        mass_csv = os.path.join(directory, "masses.csv")
+        write_masses(mass_csv, 50)
+        model = Mascons(Body(), mass_csv)
+
+    # the sum of the gradients of each mass
+    positions = random_positions(100, Body.radius, 3 * Body.radius)
+    acc, _, dU_dxdx = model.compute_all(positions, gradient=True)
+    expected = np.zeros((len(positions), 3, 3))
+    for mu, position in zip(model.masses_mu[:, 0], model.masses_position):
+        expected += PointMass(Body(mu=mu)).compute_dU_dxdx(positions - position)
+    assert np.allclose(dU_dxdx, expected, rtol=1e-12, atol=0.0)
+    assert np.array_equal(acc, model.compute_acceleration(positions))
+
+    # single point path
+    assert np.allclose(model.compute_dU_dxdx(positions[0:1]), expected[0:1])
+
+
+def test_point_mass_matches_values():
+    model = PointMass(Body())
+    positions = random_positions(100, Body.radius, 3 * Body.radius)
+    acc = model.compute_acceleration(positions)
+    pot = model.compute_potential(positions)
+    for i, position in enumerate(positions):
+        assert np.allclose(acc[i], model.compute_acceleration_value(position))
+        assert np.isclose(pot[i], model.compute_potential_value(position))
+
+
+if __name__ == "__main__":
+    test_mascons_match_values()
+    test_mascons_float32()
+    test_mascons_gradient()
+    test_point_mass_matches_values()
+    print("Passed!")
@@ -0,0 +1,177 @@
+import numpy as np
+from conftest import random_positions
+
+from GravNN.GravityModels.PinesAlgorithm import (
+    compute_acc,
+    compute_acc_thread,
+    compute_acceleration,
+    compute_n_matrices,
+    compute_n_packed,
+)
+from GravNN.Support.SHFiles import pack_triangular
+
+
+def random_coefficients(degree, seed=0):
+    rng = np.random.default_rng(seed)
+    C_lm = np.zeros((degree + 3, degree + 3))
+    S_lm = np.zeros((degree + 3, degree + 3))
+    for l in range(degree + 3):  # noqa: E741
+        for m in range(l + 1):
+            C_lm[l, m] = rng.normal() * 1e-6 / (l + 1) ** 2
+            if m > 0:
+                S_lm[l, m] = rng.normal() * 1e-6 / (l + 1) ** 2
+    C_lm[0, 0] = 1.0
+    return C_lm, S_lm
+
+
+def test_batch_matches_thread():
+    degree = 20
+    mu, radius = 0.3986004415e15, 6378136.6
+    C_lm, S_lm = random_coefficients(degree)
+    n1, n2, n1q, n2q = compute_n_matrices(degree)
+    positions = random_positions(257, radius, 2 * radius)
+
+    acc, pot = compute_acc(
+        positions.reshape((-1,)),
+        degree,
+        mu,
+        radius,
+        n1,
+        n2,
+        n1q,
+        n2q,
+        C_lm,
+        S_lm,
+    )
+    acc = acc.reshape((-1, 3))
+
+    for i, position in enumerate(positions):
+        acc_i, pot_i = compute_acc_thread(
+            position,
+            degree,
+            mu,
+            radius,
+            n1,
+            n2,
+            n1q,
+            n2q,
+            C_lm,
+            S_lm,
+        )
+        assert np.allclose(acc[i], acc_i, rtol=1e-12, atol=0.0)
+        assert np.isclose(pot[i], pot_i, rtol=1e-12, atol=0.0)
+
+    # single point path
+    acc_0, pot_0 = compute_acc(
+        positions[0],
+        degree,
+        mu,
+        radius,
+        n1,
+        n2,
+        n1q,
+        n2q,
+        C_lm,
+        S_lm,
+    )
+    assert np.allclose(acc_0, acc[0], rtol=1e-12, atol=0.0)
+    assert np.isclose(pot_0[0], pot[0], rtol=1e-12, atol=0.0)
+
+
+def test_packed_matches_dense():
+    degree = 15
+    mu, radius = 0.3986004415e15, 6378136.6
+    C_lm, S_lm = random_coefficients(degree)
+    n_dense = compute_n_matrices(degree)
+    n_packed = compute_n_packed(degree)
+    for dense, packed in zip(n_dense, n_packed):
+        assert np.array_equal(pack_triangular(dense), packed, equal_nan=True)
+
+    positions = random_positions(17, radius, 2 * radius)
+    acc, _ = compute_acc(
+        positions.reshape((-1,)),
+        degree,
+        mu,
+        radius,
+        *n_packed,
+        pack_triangular(C_lm),
+        pack_triangular(S_lm),
+    )
+
+    # reference implementation on the dense arrays
+    acc_dense = compute_acceleration(
+        positions.reshape((-1,)),
+        degree,
+        mu,
+        radius,
+        *n_dense,
+        C_lm,
+        S_lm,
+    )
+    assert np.allclose(acc, acc_dense, rtol=1e-12, atol=0.0)
+
+
+def test_gradient_matches_finite_differences():
+    degree = 12
+    mu, radius = 0.3986004415e15, 6378136.6
+    C_lm, S_lm = random_coefficients(degree)
+    C_lm *= 1e3  # emphasize the non-spherical terms
+    S_lm *= 1e3
+    C_lm[0, 0] = 1.0
+    n_packed = compute_n_packed(degree)
+    cbar, sbar = pack_triangular(C_lm), pack_triangular(S_lm)
+    args = (degree, mu, radius, *n_packed, cbar, sbar)
+
+    positions = random_positions(9, radius, 2 * radius)
+    positions[0] = [0.0, 0.0, 1.5 * radius]  # pole
+    acc, _, dU_dxdx = compute_acc(positions.reshape((-1,)), *args, gradient=True)
+    assert dU_dxdx.shape == (len(positions), 3, 3)
+
+    # the acceleration is unchanged by the gradient computation
+    acc_no_grad, _ = compute_acc(positions.reshape((-1,)), *args)
+    assert np.array_equal(acc, acc_no_grad)
+
+    h = 1.0
+    for position, hessian in zip(positions, dU_dxdx):
+        dadx = np.zeros((3, 3))
+        for j in range(3):
+            dx = np.zeros((3,))
+            dx[j] = h
+            a_plus, _ = compute_acc(position + dx, *args)
+            a_minus, _ = compute_acc(position - dx, *args)
+            dadx[:, j] = (a_plus - a_minus) / (2 * h)
+        scale = np.max(np.abs(hessian))
+        assert np.allclose(hessian, dadx, rtol=0.0, atol=1e-7 * scale)
+        assert np.allclose(hessian, hessian.T, rtol=0.0, atol=1e-12 * scale)
+        assert np.abs(np.trace(hessian)) < 1e-12 * scale  # Laplace
+
+
+def test_float32_matches_float64():
+    degree = 30
+    mu, radius = 0.3986004415e15, 6378136.6
+    C_lm, S_lm = random_coefficients(degree)
+    n_packed = compute_n_packed(degree)
+    cbar, sbar = pack_triangular(C_lm), pack_triangular(S_lm)
+    args = (degree, mu, radius, *n_packed, cbar, sbar)
+
+    positions = random_positions(100, radius, 2 * radius)
+    acc, pot = compute_acc(positions.reshape((-1,)), *args)
+    acc_32, pot_32 = compute_acc(positions.reshape((-1,)), *args, dtype=np.float32)
+    assert acc_32.dtype == np.float32 and pot_32.dtype == np.float32
+
+    acc, acc_32 = acc.reshape((-1, 3)), acc_32.reshape((-1, 3))
+    a_error = np.linalg.norm(acc_32 - acc, axis=1) / np.linalg.norm(acc, axis=1)
+    assert np.max(a_error) < 1e-5
+    assert np.max(np.abs(pot_32 - pot) / np.abs(pot)) < 1e-5
+
+    # single point path
+    acc_0, pot_0 = compute_acc(positions[0], *args, dtype=np.float32)
+    assert np.array_equal(acc_0, acc_32[0])
+
+
+if __name__ == "__main__":
+    test_batch_matches_thread()
+    test_packed_matches_dense()
+    test_gradient_matches_finite_differences()
+    test_float32_matches_float64()
+    print("Passed!")
@@ -0,0 +1,229 @@
+import os
+
+import numpy as np
+import trimesh
+from conftest import random_positions
+
+import GravNN
+from GravNN.GravityModels.Polyhedral import (
+    Polyhedral,
+    compute_edge_dyads,
+    compute_facet_dyads,
+    edge_acc_loop,
+    facet_acc_loop,
+)
+from GravNN.GravityModels.Polyhedral_2 import Polyhedral_2
+from GravNN.Support.ShapeModelCache import ShapeModel
+
+
+class SphericalBody:
+    """Stand-in celestial body for the shape model shipped with the package"""
+
+    body_name = "sphere"
+    mu = 4.9028e12
+    radius = 1738.1e3
+    density = 3340.0
+
+
+def get_obj_file():
+    return os.path.join(
+        os.path.dirname(GravNN.__file__),
+        "Files/ShapeModels/Moon/Moon.obj",
+    )
+
+
+def get_model(**kwargs):
+    return Polyhedral(SphericalBody(), get_obj_file(), **kwargs)
+
+
+def exact_values(model, positions):
+    """Reference values from the per-point facet / edge loops"""
+    G = 6.67430 * 10**-11
+    accelerations = np.zeros((len(positions), 3))
+    potentials = np.zeros((len(positions),))
+    for i, position in enumerate(positions):
+        point_scaled = position / model.scaleFactor
+        acc_f, pot_f = facet_acc_loop(
+            point_scaled,
+            model.mesh.vertices,
+            model.mesh.faces,
+            model.facet_dyads,
+        )
+        acc_e, pot_e = edge_acc_loop(
+            point_scaled,
+            model.mesh.vertices,
+            model.mesh.edges_unique,
+            model.edge_dyads,
+        )
+        accelerations[i] = (acc_f + acc_e) * G * model.density * model.scaleFactor
+        potentials[i] = (
+            -(pot_f + pot_e) * 0.5 * G * model.density * model.scaleFactor**2
+        )
+    return accelerations, potentials
+
+
+def test_batch_matches_loops():
+    model = get_model()
+    R = SphericalBody.radius
+    positions = random_positions(100, R, 3 * R, seed=0)
+
+    acc_true, pot_true = exact_values(model, positions)
+    acc, pot = model.compute_all(positions)
+
+    assert np.allclose(acc, acc_true, rtol=1e-10, atol=0.0)
+    assert np.allclose(pot, pot_true, rtol=1e-10, atol=0.0)
+
+    # single point path
+    acc_0 = model.compute_acceleration(positions[0:1])
+    assert np.allclose(acc_0, acc_true[0:1], rtol=1e-10, atol=0.0)
+
+
+def test_geometry_cache():
+    mesh = trimesh.load_mesh(get_obj_file())
+    get_model()  # populates the cache if necessary
+    shape_model = ShapeModel(get_obj_file())
+
+    assert np.array_equal(shape_model.vertices, mesh.vertices)
+    assert np.array_equal(shape_model.faces, mesh.faces)
+    assert np.array_equal(shape_model.edges_unique, mesh.edges_unique)
+    assert np.array_equal(shape_model.face_normals, mesh.face_normals)
+    assert np.isclose(shape_model.volume, mesh.volume, rtol=1e-14)
+
+    model = get_model()
+    assert np.array_equal(model.facet_dyads, compute_facet_dyads(mesh.face_normals))
+    edge_dyads = compute_edge_dyads(
+        mesh.vertices,
+        mesh.faces,
+        mesh.edges_unique,
+        mesh.face_adjacency_edges,
+        mesh.face_normals,
+        mesh.face_adjacency,
+    )
+    assert np.array_equal(model.edge_dyads, edge_dyads)
+
+
+def test_tree_matches_exact():
+    model = get_model()
+    R = SphericalBody.radius
+    positions = np.vstack(
+        (random_positions(50, R, 1.1 * R, seed=0), random_positions(50, 2 * R, 10 * R)),
+    )
+    acc_true, pot_true = model.compute_all(positions)
+
+    for tolerance in [1e-3, 1e-6]:
+        tree_model = get_model(tolerance=tolerance)
+        acc, pot = tree_model.compute_all(positions)
+
+        acc_error = np.linalg.norm(acc - acc_true, axis=1) / np.linalg.norm(
+            acc_true,
+            axis=1,
+        )
+        pot_error = np.abs(pot - pot_true) / np.abs(pot_true)
+        assert np.max(acc_error) < tolerance
+        assert np.max(pot_error) < tolerance
+
+    # without any accepted clusters the tree reduces to the exact facet sums
+    tree_model.tree.theta = 0.0
+    acc, pot = tree_model.compute_all(positions)
+    assert np.allclose(acc, acc_true, rtol=1e-10, atol=0.0)
+    assert np.allclose(pot, pot_true, rtol=1e-10, atol=0.0)
+
+
+def test_surrogate_matches_exact():
+    model = get_model()
+    R = SphericalBody.radius
+    positions = np.vstack(
+        (
+            random_positions(100, 1.5 * R, 3 * R, seed=0),
+            random_positions(10, 3 * R, 4 * R),
+        ),
+    )
+    acc_true, pot_true = model.compute_all(positions)
+
+    error_bound = 1e-5
+    exact_directory = model.file_directory
+    surrogate = model.build_surrogate(3 * R, r_min=1.5 * R, error_bound=error_bound)
+    assert surrogate.error <= error_bound
+    # interpolated values are never saved as (or loaded in place of) exact ones
+    assert model.file_directory != exact_directory
+    acc, pot = model.compute_all(positions)
+
+    acc_error = np.linalg.norm(acc - acc_true, axis=1) / np.linalg.norm(
+        acc_true,
+        axis=1,
+    )
+    pot_error = np.abs(pot - pot_true) / np.abs(pot_true)
+    assert np.max(acc_error) < error_bound
+    assert np.max(pot_error) < error_bound
+
+    # positions outside of the grid fall back to the exact kernel
+    assert np.all(acc_error[100:] == 0.0)
+    assert np.all(pot_error[100:] == 0.0)
+
+    # single point path
+    acc_0 = model.compute_acceleration(positions[0:1])
+    assert np.allclose(acc_0, acc[0:1], rtol=1e-12, atol=0.0)
+
+
+def test_gradient_matches_finite_differences():
+    model = get_model()
+    R = SphericalBody.radius
+    positions = random_positions(8, 1.2 * R, 2 * R, seed=0)
+
+    acc, _, dU_dxdx = model.compute_all(positions, gradient=True)
+    assert dU_dxdx.shape == (len(positions), 3, 3)
+    assert np.array_equal(acc, model.compute_values_exact(positions)[0])
+
+    h = 10.0
+    for position, hessian in zip(positions, dU_dxdx):
+        dadx = np.zeros((3, 3))
+        for j in range(3):
+            dx = np.zeros((3,))
+            dx[j] = h
+            a_plus, _ = model.compute_values_exact((position + dx).reshape((1, 3)))
+            a_minus, _ = model.compute_values_exact((position - dx).reshape((1, 3)))
+            dadx[:, j] = (a_plus[0] - a_minus[0]) / (2 * h)
+        scale = np.max(np.abs(hessian))
+        assert np.allclose(hessian, dadx, rtol=0.0, atol=1e-6 * scale)
+        assert np.allclose(hessian, hessian.T, rtol=0.0, atol=1e-10 * scale)
+        assert np.abs(np.trace(hessian)) < 1e-8 * scale  # Laplace (exterior)
+
+
+def test_polyhedral_2_gradient():
+    model = Polyhedral_2(SphericalBody(), get_obj_file())
+    R = SphericalBody.radius
+    positions = random_positions(4, 1.2 * R, 2 * R, seed=0)
+
+    # one position at a time, which doesn't fork a process pool
+    dU_dxdx = np.concatenate([model.compute_dU_dxdx(x[None]) for x in positions])
+    expected = get_model().compute_dU_dxdx(positions)
+    scale = np.max(np.abs(expected))
+    assert np.allclose(dU_dxdx, expected, rtol=0.0, atol=1e-10 * scale)
+
+
+def test_float32_matches_float64():
+    model = get_model()
+    model_32 = get_model(dtype=np.float32)
+    assert model_32.file_directory != model.file_directory
+    assert model_32.id != model.id
+
+    R = SphericalBody.radius
+    positions = random_positions(100, R, 3 * R, seed=0)
+    acc, pot = model.compute_all(positions)
+    acc_32, pot_32 = model_32.compute_all(positions)
+    assert acc_32.dtype == np.float32 and pot_32.dtype == np.float32
+
+    a_error = np.linalg.norm(acc_32 - acc, axis=1) / np.linalg.norm(acc, axis=1)
+    assert np.max(a_error) < 1e-4
+    assert np.max(np.abs(pot_32 - pot) / np.abs(pot)) < 1e-4
+
+
+if __name__ == "__main__":
+    test_batch_matches_loops()
+    test_geometry_cache()
+    test_tree_matches_exact()
+    test_surrogate_matches_exact()
+    test_gradient_matches_finite_differences()
+    test_polyhedral_2_gradient()
+    test_float32_matches_float64()
+    print("Passed!")
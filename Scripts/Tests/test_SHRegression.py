@@ -0,0 +1,65 @@
+import numpy as np
+from conftest import random_positions
+
+from GravNN.GravityModels.PinesAlgorithm import compute_acc, compute_n_packed
+from GravNN.Regression.SHRegression import SHRegression
+from GravNN.Regression.utils import format_coefficients, populate_H_singular
+from GravNN.Support.SHFiles import pack_triangular, unpack_triangular
+
+mu, radius = 0.3986004415e15, 6378136.6
+
+
+def test_packed_partials_match_dense():
+    N, remove_deg = 12, 1
+    regressor = SHRegression(N, remove_deg, radius, mu)
+    A = unpack_triangular(regressor.A, N + 1)
+    n1 = unpack_triangular(regressor.n1, N + 1)
+    n2 = unpack_triangular(regressor.n2, N + 1)
+
+    positions = random_positions(20, radius, 2 * radius)
+    M = regressor.populate_M(positions.reshape((-1,)))
+    for p, position in enumerate(positions):
+        H = populate_H_singular(position, A, n1, n2, N, radius, mu, remove_deg)
+        assert np.allclose(M[3 * p : 3 * p + 3], H[:3], rtol=1e-12, atol=0.0)
+
+
+def test_regression_recovers_coefficients():
+    N = 6
+    rng = np.random.default_rng(0)
+    C_lm = np.tril(rng.normal(size=(N + 3, N + 3))) * 1e-6
+    S_lm = np.tril(rng.normal(size=(N + 3, N + 3))) * 1e-6
+    C_lm[N + 1 :] = 0.0
+    S_lm[N + 1 :] = 0.0
+    S_lm[:, 0] = 0.0
+    C_lm[0, 0] = 1.0
+    C_lm[1] = 0.0
+    S_lm[1] = 0.0
+
+    positions = random_positions(200, radius, 2 * radius)
+
+    def compute_acc_degree(degree):
+        acc, _ = compute_acc(
+            positions.reshape((-1,)),
+            degree,
+            mu,
+            radius,
+            *compute_n_packed(degree),
+            pack_triangular(C_lm),
+            pack_triangular(S_lm),
+        )
+        return acc.reshape((-1, 3))
+
+    # regress the degrees beyond the point mass, whose S_l0 partials vanish such
+    # that a negligible ridge is needed to keep the system invertible
+    acc = compute_acc_degree(N) - compute_acc_degree(1)
+    regressor = SHRegression(N, 1, radius, mu, kaula_factor=1e-12)
+    results = regressor.update(positions, acc)
+    C_lm_hat, S_lm_hat = format_coefficients(results, N, 1)
+    assert np.allclose(C_lm_hat[2:], C_lm[2 : N + 1, : N + 1], rtol=0.0, atol=1e-12)
+    assert np.allclose(S_lm_hat[2:], S_lm[2 : N + 1, : N + 1], rtol=0.0, atol=1e-12)
+
+
+if __name__ == "__main__":
+    test_packed_partials_match_dense()
+    test_regression_recovers_coefficients()
+    print("Passed!")
@@ -0,0 +1,112 @@
+import math
+import os
+import tempfile
+
+import numpy as np
+
+from GravNN.GravityModels.SphericalHarmonics import (
+    SphericalHarmonics,
+    get_normalization,
+)
+from GravNN.Support.SHFiles import (
+    get_binary_file,
+    pack_triangular,
+    read_sh_binary,
+    read_sh_text,
+    triangular_index,
+    unpack_triangular,
+)
+
+
+def write_coefficients(file, degree, seed=0, header=True):
+    rng = np.random.default_rng(seed)
+    C_lm = np.zeros((degree + 1, degree + 1))
+    S_lm = np.zeros((degree + 1, degree + 1))
+    with open(file, "w") as f:
+        if header:
+            f.write("6378136.3,3.986004415e14,0.0,0.0\n")
+        for l in range(degree + 1):  # noqa: E741
+            for m in range(l + 1):
+                C_lm[l, m] = rng.normal() * 1e-6
+                S_lm[l, m] = rng.normal() * 1e-6 if m > 0 else 0.0
+                f.write(f"{l},{m},{C_lm[l, m]:.15e},{S_lm[l, m]:.15e}\n")
+    return C_lm, S_lm
+
+
+def test_coefficient_cache():
+    with tempfile.TemporaryDirectory() as directory:
+        file = os.path.join(directory, "field.csv")
+        C_lm, S_lm = write_coefficients(file, 20)
+
+        model = SphericalHarmonics(file, 10)
+        assert model.mu == 3.986004415e14 and model.radEquator == 6378136.3
+        assert np.allclose(model.C_lm, C_lm[:13, :13], rtol=1e-14, atol=0.0)
+        assert np.allclose(model.S_lm, S_lm[:13, :13], rtol=1e-14, atol=0.0)
+        assert os.path.exists(get_binary_file(file))
+
+        # models of the same field and degree share their coefficients
+        other_model = SphericalHarmonics(file, 10)
+        assert other_model.cbar is model.cbar
+        assert other_model.n1 is model.n1
+        assert not model.C_lm.flags.writeable
+
+        # the full file (but the last two degrees) if no degree is given
+        full_model = SphericalHarmonics(file, None)
+        assert full_model.degree == 18
+        assert np.allclose(full_model.C_lm, C_lm, rtol=1e-14, atol=0.0)
+
+        # modified files are never served stale coefficients
+        C_lm, _ = write_coefficients(file, 20, seed=1)
+        stat = os.stat(file)
+        os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        model = SphericalHarmonics(file, 10)
+        assert np.allclose(model.C_lm, C_lm[:13, :13], rtol=1e-14, atol=0.0)
+
+
+def test_coefficient_files():
+    with tempfile.TemporaryDirectory() as directory:
+        file = os.path.join(directory, "field.txt")
+        C_lm, S_lm = write_coefficients(file, 30)
+
+        # whitespace delimited files with trailing columns
+        ws_file = os.path.join(directory, "field_ws.txt")
+        with open(file, "r") as f, open(ws_file, "w") as f_ws:
+            f_ws.write("6378136.3 3.986004415e14\n")
+            for line in f.readlines()[1:]:
+                f_ws.write("  " + line.strip().replace(",", "   ") + "  0.0  0.0\n")
+
+        for text_file in [file, ws_file]:
+            mu, radius, C_text, S_text = read_sh_text(text_file, max_degree=12)
+            assert mu == 3.986004415e14 and radius == 6378136.3
+            assert np.allclose(C_text, C_lm[:13, :13], rtol=1e-14, atol=0.0)
+            assert np.allclose(S_text, S_lm[:13, :13], rtol=1e-14, atol=0.0)
+
+        model = SphericalHarmonics(file, 5)
+        _, _, C_binary, S_binary = read_sh_binary(file)
+        assert np.array_equal(C_binary, read_sh_text(file)[2])
+        assert np.array_equal(S_binary, read_sh_text(file)[3])
+        assert np.array_equal(model.C_lm, C_binary[:8, :8])
+
+    packed = pack_triangular(C_lm)
+    assert packed[triangular_index(7, 3)] == C_lm[7, 3]
+    assert np.array_equal(unpack_triangular(packed, 30), C_lm)
+
+
+def test_normalization():
+    l = 30  # noqa: E741
+    N = get_normalization(l, l)
+    for i in range(l + 1):
+        assert np.isclose(N[i, 0], np.sqrt(2.0 * i + 1), rtol=1e-14, atol=0.0)
+        for j in range(1, i + 1):
+            expected = np.sqrt(
+                2 * (2 * i + 1) * math.factorial(i - j) / math.factorial(i + j),
+            )
+            assert np.isclose(N[i, j], expected, rtol=1e-13, atol=0.0)
+    assert np.all(N[np.triu_indices(l + 1, 1)] == 0.0)
+
+
+if __name__ == "__main__":
+    test_coefficient_cache()
+    test_coefficient_files()
+    test_normalization()
+    print("Passed!")
@@ -0,0 +1,166 @@
+import os
+import pickle
+import tempfile
+
+import numpy as np
+from conftest import Body
+
+from GravNN.GravityModels.PointMass import PointMass
+from GravNN.Support.storage import (
+    append_arrays,
+    array_exists,
+    load_array,
+    save_arrays,
+)
+from GravNN.Trajectories.TrajectoryBase import TrajectoryBase
+
+
+class FixedDist(TrajectoryBase):
+    def __init__(self, directory, positions, **kwargs):
+        self.directory = directory
+        self.points = positions
+        self.celestial_body = Body()
+        super().__init__(**kwargs)
+
+    def generate_full_file_directory(self):
+        self.file_directory = self.directory + "/"
+
+    def generate(self):
+        self.positions = self.points
+        return self.positions
+
+
+def test_npy_round_trip():
+    values = np.random.default_rng(0).normal(size=(1000, 3))
+    with tempfile.TemporaryDirectory() as directory:
+        directory += "/"
+        save_arrays(directory, {"acceleration": values, "potential": None})
+        assert array_exists(directory, "acceleration")
+        assert not array_exists(directory, "potential")
+
+        loaded = load_array(directory, "acceleration")
+        assert isinstance(loaded, np.memmap)
+        assert np.array_equal(loaded, values)
+        assert np.array_equal(load_array(directory, "acceleration", N=10), values[:10])
+
+        # copy-on-write: in-place modifications never reach the file
+        loaded += 1.0
+        del loaded
+        assert np.array_equal(load_array(directory, "acceleration"), values)
+
+
+def test_legacy_pickle():
+    values = np.random.default_rng(1).normal(size=(100,))
+    with tempfile.TemporaryDirectory() as directory:
+        directory += "/"
+        with open(directory + "potential.data", "wb") as f:
+            pickle.dump(values, f)
+        assert array_exists(directory, "potential")
+        assert np.array_equal(load_array(directory, "potential"), values)
+        assert np.array_equal(load_array(directory, "potential", N=5), values[:5])
+
+
+def test_gravity_model_cache():
+    positions = np.random.default_rng(2).normal(size=(50, 3)) * Body.radius
+    with tempfile.TemporaryDirectory() as directory:
+        trajectory = FixedDist(directory, positions)
+        assert os.path.exists(directory + "/trajectory.npy")
+        assert np.array_equal(FixedDist(directory, None).positions, positions)
+
+        model = PointMass(Body(), trajectory=trajectory).load()
+        assert os.path.exists(model.file_directory + "acceleration.npy")
+        assert os.path.exists(model.file_directory + "potential.npy")
+
+        cached_model = PointMass(Body(), trajectory=trajectory).load()
+        assert np.array_equal(cached_model.accelerations, model.accelerations)
+        assert np.array_equal(cached_model.potentials, model.potentials)
+
+
+def test_append_arrays():
+    values = np.random.default_rng(4).normal(size=(100, 3))
+    with tempfile.TemporaryDirectory() as directory:
+        directory += "/"
+        save_arrays(directory, {"acceleration": values[:30]})
+        append_arrays(directory, {"acceleration": values[30:]})
+        assert np.array_equal(load_array(directory, "acceleration"), values)
+
+        # legacy pickles are rewritten as .npy files
+        with open(directory + "potential.data", "wb") as f:
+            pickle.dump(values[:30, 0], f)
+        append_arrays(directory, {"potential": values[30:, 0]})
+        assert np.array_equal(load_array(directory, "potential"), values[:, 0])
+
+
+class SeededDist(FixedDist):
+    """Prefix-stable distribution, whose first N points don't depend on N"""
+
+    def generate(self):
+        self.positions = self.sample_stream(self.points)
+        return self.positions
+
+    def sample_stream(self, points):
+        rng = np.random.default_rng(self.seed)
+        return rng.normal(size=(points, 3)) * Body.radius
+
+
+class CountingPointMass(PointMass):
+    def compute_all(self, positions=None, gradient=False):
+        self.N_evaluated = len(positions if positions is not None else self.positions)
+        return super().compute_all(positions, gradient)
+
+
+def test_extend_cache():
+    with tempfile.TemporaryDirectory() as directory:
+        trajectory = SeededDist(directory, 40, dist_seed=[3])
+        model = CountingPointMass(Body(), trajectory=trajectory).load()
+        assert model.N_evaluated == 40
+
+        # growing the distribution only evaluates the new points
+        trajectory = SeededDist(directory, 100, dist_seed=[3])
+        assert np.array_equal(
+            load_array(directory + "/", "trajectory"),
+            trajectory.positions,
+        )
+        model = CountingPointMass(Body(), trajectory=trajectory).load()
+        assert model.N_evaluated == 60
+        acc, pot = PointMass(Body()).compute_all(trajectory.positions)
+        assert np.allclose(model.accelerations, acc, rtol=1e-14, atol=0.0)
+        assert np.allclose(model.potentials, pot, rtol=1e-14, atol=0.0)
+
+        # smaller distributions are a prefix of the saved values
+        trajectory = SeededDist(directory, 10, dist_seed=[3])
+        model = CountingPointMass(Body(), trajectory=trajectory).load()
+        assert not hasattr(model, "N_evaluated")
+        assert len(model.accelerations) == 10
+        assert np.array_equal(model.accelerations, acc[:10])
+        assert np.array_equal(model.potentials, pot[:10])
+
+
+def test_extend_mismatch():
+    with tempfile.TemporaryDirectory() as directory:
+        trajectory = SeededDist(directory, 40, dist_seed=[3])
+        CountingPointMass(Body(), trajectory=trajectory).load()
+
+        # values of other positions (e.g. another seed) are never reused
+        trajectory = SeededDist(directory, 60, dist_seed=[4], override=[True])
+        model = CountingPointMass(Body(), trajectory=trajectory).load()
+        assert model.N_evaluated == 60
+        acc, pot = PointMass(Body()).compute_all(trajectory.positions)
+        assert np.allclose(model.accelerations, acc, rtol=1e-14, atol=0.0)
+        assert np.allclose(model.potentials, pot, rtol=1e-14, atol=0.0)
+
+        # distributions without a sample stream ignore the seed
+        positions = np.random.default_rng(5).normal(size=(20, 3))
+        FixedDist(directory + "/fixed", positions, dist_seed=[3])
+        trajectory = FixedDist(directory + "/fixed", None, dist_seed=[3])
+        assert np.array_equal(trajectory.positions, positions)
+
+
+if __name__ == "__main__":
+    test_npy_round_trip()
+    test_legacy_pickle()
+    test_gravity_model_cache()
+    test_append_arrays()
+    test_extend_cache()
+    test_extend_mismatch()
+    print("Passed!")
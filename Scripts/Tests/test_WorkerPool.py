@@ -0,0 +1,39 @@
+import gc
+from functools import partial
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from GravNN.Support.WorkerPool import WorkerPool
+
+
+def sum_shared(scale, handle):
+    return scale * np.sum(handle.get())
+
+
+def test_share_and_release():
+    with WorkerPool(processes=2) as pool:
+        values = np.arange(100.0)
+        handle = pool.share(values)
+        assert pool.share(values) is handle
+
+        results = pool.map(partial(sum_shared, handle=handle), [1.0, 2.0, 3.0])
+        assert results == [np.sum(values) * i for i in [1.0, 2.0, 3.0]]
+
+        # the shared memory is released with the array
+        del values
+        gc.collect()
+        assert len(pool._shared) == 0
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=handle.name)
+
+        # and the workers detach from it with their next task
+        other = np.ones(10)
+        other_handle = pool.share(other)
+        assert pool.map(partial(sum_shared, handle=other_handle), [1.0]) == [10.0]
+
+
+if __name__ == "__main__":
+    test_share_and_release()
+    print("Passed!")